@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 import secrets
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -38,6 +42,23 @@ pwd_context = CryptContext(
 )
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# bcrypt takes ~250ms of CPU per call. It runs in a small thread pool (the
+# bcrypt library releases the GIL), so the event loop keeps serving other
+# requests during login bursts. 0 workers hashes inline on the event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Password operations allowed to wait for a worker before new ones get a 503
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+# Authenticated principals are reused for this many seconds without reading
+# the users table. Changes made through this worker invalidate them at once;
+# changes made through other workers are picked up when the entry expires.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Seconds between reloads of the user id -> token_version map. Revocations
+# made through this worker apply at once; ones made through other workers
+# apply after the next reload.
+TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "5"))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Truncate to 72 bytes for bcrypt compatibility
@@ -51,6 +72,104 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password_bytes)
 
 
+class PasswordHasher:
+    """Bounded thread pool for password hashing, with latency metrics."""
+
+    def __init__(self, workers: int, queue_limit: int, samples: int = 1000):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0  # Queued or running
+        self.completed = 0
+        self.failed = 0  # Raised while hashing
+        self.rejected = 0  # Turned away because the queue was full
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Recent durations in seconds: bcrypt itself, and queue wait + bcrypt
+        self._hash_times = deque(maxlen=samples)
+        self._total_times = deque(maxlen=samples)
+
+    def _timed(self, func: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._hash_times.append(time.perf_counter() - started)
+
+    async def run(self, func: Callable, *args):
+        if self.workers <= 0:
+            started = time.perf_counter()
+            try:
+                result = self._timed(func, *args)
+            except Exception:
+                self.failed += 1
+                raise
+            self._total_times.append(time.perf_counter() - started)
+            self.completed += 1
+            return result
+
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-ins in progress, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+        started = time.perf_counter()
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self._total_times.append(time.perf_counter() - started)
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def _percentile_ms(samples, fraction: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 1)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "queue_depth": max(0, self.pending - self.workers),
+            "in_progress": min(self.pending, self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "hash_ms_p50": self._percentile_ms(self._hash_times, 0.5),
+            "hash_ms_p99": self._percentile_ms(self._hash_times, 0.99),
+            "total_ms_p50": self._percentile_ms(self._total_times, 0.5),
+            "total_ms_p99": self._percentile_ms(self._total_times, 0.99),
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password off the event loop (raises 503 when the queue is full)."""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash off the event loop (raises 503 when the queue is full)."""
+    return await password_hasher.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -62,10 +181,98 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def access_token_claims(user: User) -> dict:
+    """Claims of a user's access token; the version lets it be revoked."""
+    return {"sub": user.username, "uid": user.id, "adm": user.is_admin, "ver": user.token_version}
+
+
+class TokenVersions:
+    """
+    In-memory map of user id -> token_version, so versioned access tokens are
+    checked without a users lookup. Versions only ever increase.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def set(self, user_id: int, version: int):
+        """Record a version committed by this worker."""
+        self._versions[user_id] = max(version, self._versions.get(user_id, version))
+
+    def forget(self, user_id: int):
+        """Drop a deleted user, revoking their tokens."""
+        self._versions.pop(user_id, None)
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    async def _reload(self, db: AsyncSession):
+        result = await db.execute(select(User.id, User.token_version))
+        loaded = dict(result.all())
+        # A version set while the query ran may be newer than the one read
+        for user_id, version in loaded.items():
+            if self._versions.get(user_id, version) > version:
+                loaded[user_id] = self._versions[user_id]
+        self._versions = loaded
+        self._loaded_at = time.monotonic()
+
+    async def get(self, user_id: int, db: AsyncSession) -> Optional[int]:
+        """Current token_version of a user, None for unknown users."""
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    await self._reload(db)
+        version = self._versions.get(user_id)
+        if version is None:
+            # Registered since the last reload
+            version = await db.scalar(select(User.token_version).where(User.id == user_id))
+            if version is not None:
+                self.set(user_id, version)
+        return version
+
+
+token_versions = TokenVersions(TOKEN_VERSION_REFRESH_SECONDS)
+
+
+def revoke_tokens(user: User):
+    """
+    Invalidate every token issued to user so far. Takes effect once the
+    session commits; record it with token_versions.set afterwards.
+    """
+    user.token_version = (user.token_version or 0) + 1
+
+
+class Principal:
+    """
+    The fields of an authenticated user that authorization needs; handlers
+    receive it in place of the User row.
+    """
+
+    __slots__ = ("id", "username", "is_active", "is_admin")
+
+    def __init__(self, id: int, username: str, is_active: bool, is_admin: bool):
+        self.id = id
+        self.username = username
+        self.is_active = is_active
+        self.is_admin = is_admin
+
+
+# Token subject (username) -> (expiry on the monotonic clock, principal)
+_principal_cache: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+
+
+def invalidate_principal(username: str):
+    """Drop the cached principal of a user whose account changed."""
+    _principal_cache.pop(username, None)
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -79,23 +286,64 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
-    if user is None:
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if user_id is not None and version is not None:
+        # Versioned token: only deactivation, deletion or a role change
+        # would make its claims stale, and each of them bumps the version
+        if await token_versions.get(user_id, db) != version:
+            raise credentials_exception
+        return Principal(user_id, username, True, bool(payload.get("adm")))
+
+    # Tokens issued before claims were versioned
+    now = time.monotonic()
+    cached = _principal_cache.get(username)
+    if cached is not None and cached[0] > now:
+        _principal_cache.move_to_end(username)
+        return cached[1]
+
+    result = await db.execute(
+        select(User.id, User.username, User.is_active, User.is_admin).where(User.username == username)
+    )
+    row = result.one_or_none()
+    if row is None:
+        _principal_cache.pop(username, None)
         raise credentials_exception
+
+    principal = Principal(row.id, row.username, row.is_active, row.is_admin)
+    _principal_cache[username] = (now + PRINCIPAL_CACHE_TTL, principal)
+    _principal_cache.move_to_end(username)
+    while len(_principal_cache) > PRINCIPAL_CACHE_SIZE:
+        _principal_cache.popitem(last=False)
+    return principal
+
+
+async def get_current_user_record(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """The full users row of the authenticated user, for endpoints that change the account."""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        invalidate_principal(current_user.username)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
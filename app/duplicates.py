@@ -0,0 +1,327 @@
+"""
+Duplicate-person detection within a family tree.
+
+Comparing every pair of members is quadratic, so candidates are generated
+by blocking and sorted-neighbourhood matching instead:
+
+- Members are blocked on their normalized surname; only members of the
+  same block are ever compared.
+- Within a block, two sorted-neighbourhood passes pair each member with the
+  next DUPLICATE_WINDOW members in the sort order. The first pass sorts by
+  birth-year bucket and given name, the second by given name and birth year,
+  which also pairs members without a birth date and catches pairs on either
+  side of a bucket boundary.
+
+Candidate pairs are scored on name similarity, birth and death dates,
+birth place and shared parents, and pairs scoring at least
+DUPLICATE_MIN_SCORE are stored as suggestions. After the first scan of a
+tree, scans are incremental: only pairs involving members updated since the
+previous scan started are rescored.
+
+Candidate generation and scoring are CPU-bound and run in a worker process
+(see find_duplicates); only the database reads and writes stay on the event
+loop.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import unicodedata
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import select, update, insert, delete, func, text
+from app.database import async_session_maker
+from app.models import FamilyMember, DuplicateScanJob, DuplicateSuggestion
+
+# Members each member is compared with per sorted-neighbourhood pass
+DUPLICATE_WINDOW = int(os.getenv("DUPLICATE_WINDOW", "10"))
+# Lowest score stored as a suggestion (0..1)
+DUPLICATE_MIN_SCORE = float(os.getenv("DUPLICATE_MIN_SCORE", "0.75"))
+DUPLICATE_SCAN_WORKERS = int(os.getenv("DUPLICATE_SCAN_WORKERS", "1"))
+
+BIRTH_YEAR_BUCKET = 5
+# Known birth (or death) years further apart than this rule a pair out
+MAX_YEAR_GAP = 2
+# Lowest given-name similarity worth scoring
+MIN_FIRST_NAME_SIMILARITY = 0.8
+# Score factor for pairs that only agree on names
+NAME_ONLY_FACTOR = 0.8
+SUGGESTION_BATCH_SIZE = 1000
+
+# Member fields sent to the scan worker process
+_MemberRow = namedtuple("_MemberRow", (
+    "id", "first_name", "middle_name", "last_name", "birth_date", "death_date",
+    "birth_place", "father_id", "mother_id",
+))
+
+# Fields a pair can agree on, in score_pair order. The scan worker sends
+# them back as a bitmask.
+_REASON_FIELDS = (
+    "last_name", "first_name", "middle_name", "birth_date", "death_date", "birth_place", "parents",
+)
+# Member rows read per round trip when loading a tree for a scan
+SCAN_FETCH_SIZE = 5000
+
+_scan_pool: Optional[ProcessPoolExecutor] = None
+
+# Suggestions involving members changed since :since or moved out of the tree
+_DELETE_STALE_SUGGESTIONS = text("""
+    DELETE FROM duplicate_suggestions ds
+    USING family_members fm
+    WHERE ds.tree_id = :tree_id
+      AND fm.id IN (ds.member_id, ds.duplicate_id)
+      AND (fm.tree_id IS DISTINCT FROM :tree_id OR fm.updated_at > :since)
+""")
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Lower-case letters of a name with accents removed ("Müller-Lüdenscheidt" -> "mullerludenscheidt")."""
+    if not value:
+        return ""
+    folded = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return "".join(char for char in folded.lower() if char.isalpha())
+
+
+class _Person:
+    """Normalized comparison fields of one member."""
+
+    __slots__ = ("id", "first", "middle", "last", "birth", "death", "place", "father_id", "mother_id")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.first = normalize_name(row.first_name)
+        self.middle = normalize_name(row.middle_name)
+        self.last = normalize_name(row.last_name)
+        self.birth: Optional[date] = row.birth_date
+        self.death: Optional[date] = row.death_date
+        self.place = (row.birth_place or "").strip().lower()
+        self.father_id = row.father_id
+        self.mother_id = row.mother_id
+
+
+def _bucket_key(person: _Person):
+    year = person.birth.year if person.birth else None
+    return (year is None, (year or 0) // BIRTH_YEAR_BUCKET, person.first, person.id)
+
+
+def _name_key(person: _Person):
+    return (person.first, person.birth.year if person.birth else 0, person.id)
+
+
+def candidate_pairs(
+    people: List[_Person],
+    window: int = DUPLICATE_WINDOW,
+    changed: Optional[Set[int]] = None
+) -> Iterator[Tuple[_Person, _Person]]:
+    """
+    Pairs to compare, each once. With changed, only pairs involving at least
+    one of those member ids.
+    """
+    blocks: Dict[str, List[_Person]] = {}
+    for person in people:
+        if person.last:
+            blocks.setdefault(person.last, []).append(person)
+
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        if changed is not None and not any(person.id in changed for person in block):
+            continue
+        seen = set()
+        for key in (_bucket_key, _name_key):
+            ordered = sorted(block, key=key)
+            for index, person in enumerate(ordered):
+                for other in ordered[index + 1:index + 1 + window]:
+                    if changed is not None and person.id not in changed and other.id not in changed:
+                        continue
+                    pair = (person.id, other.id) if person.id < other.id else (other.id, person.id)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    yield person, other
+
+
+@lru_cache(maxsize=65536)
+def _similarity(a: str, b: str) -> float:
+    """Similarity of two normalized strings; cached, since names repeat a lot."""
+    if a == b:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b)
+    # quick_ratio is a cheap upper bound of ratio
+    if matcher.quick_ratio() < MIN_FIRST_NAME_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+
+def _date_similarity(a: date, b: date) -> float:
+    if a == b:
+        return 1.0
+    # Partial dates are stored as the first of the month or year
+    if a.year == b.year:
+        return 0.8
+    if abs(a.year - b.year) <= MAX_YEAR_GAP:
+        return 0.4
+    return 0.0
+
+
+def score_pair(a: _Person, b: _Person) -> Tuple[float, List[str]]:
+    """Likelihood (0..1) that a and b are the same person, and the fields that agree."""
+    if a.id in (b.father_id, b.mother_id) or b.id in (a.father_id, a.mother_id):
+        return 0.0, []
+    if a.birth and b.birth and abs(a.birth.year - b.birth.year) > MAX_YEAR_GAP:
+        return 0.0, []
+    if a.death and b.death and abs(a.death.year - b.death.year) > MAX_YEAR_GAP:
+        return 0.0, []
+    first_name = _similarity(a.first, b.first)
+    if first_name < MIN_FIRST_NAME_SIMILARITY:
+        return 0.0, []
+
+    # (weight, similarity, field) of every field both members have
+    weighted = [(3, first_name, "first_name")]
+    if a.middle and b.middle:
+        weighted.append((1, _similarity(a.middle, b.middle), "middle_name"))
+    names_only = len(weighted)
+    if a.birth and b.birth:
+        weighted.append((3, _date_similarity(a.birth, b.birth), "birth_date"))
+    if a.death and b.death:
+        weighted.append((2, _date_similarity(a.death, b.death), "death_date"))
+    if a.place and b.place:
+        weighted.append((1, _similarity(a.place, b.place), "birth_place"))
+    if (a.father_id or a.mother_id) and (b.father_id or b.mother_id):
+        shared = (a.father_id and a.father_id == b.father_id) or (a.mother_id and a.mother_id == b.mother_id)
+        weighted.append((2, 1.0 if shared else 0.0, "parents"))
+
+    total = weights = 0.0
+    for weight, value, _ in weighted:
+        total += weight * value
+        weights += weight
+    score = total / weights
+    if len(weighted) == names_only:
+        score *= NAME_ONLY_FACTOR
+    if score < DUPLICATE_MIN_SCORE:
+        return score, []
+    return round(score, 4), ["last_name"] + [field for _, value, field in weighted if value >= 0.8]
+
+
+def find_duplicates(
+    rows: List[tuple],
+    window: int,
+    changed: Optional[Set[int]]
+) -> Tuple[int, array, array, array]:
+    """
+    Score the candidate pairs of a tree's members (runs in a worker
+    process). rows are _MemberRow fields.
+
+    Returns the number of pairs compared, and the pairs scoring at least
+    DUPLICATE_MIN_SCORE as flat arrays: (member_id, duplicate_id) pairs,
+    scores and _REASON_FIELDS bitmasks. Arrays pickle as plain bytes, so
+    receiving them does not hold up the event loop.
+    """
+    people = [_Person(_MemberRow(*row)) for row in rows]
+    compared = 0
+    pair_ids, scores, reason_masks = array("q"), array("d"), array("B")
+    for a, b in candidate_pairs(people, window, changed):
+        compared += 1
+        score, reasons = score_pair(a, b)
+        if score >= DUPLICATE_MIN_SCORE:
+            pair_ids.extend((min(a.id, b.id), max(a.id, b.id)))
+            scores.append(score)
+            reason_masks.append(sum(1 << _REASON_FIELDS.index(field) for field in reasons))
+    return compared, pair_ids, scores, reason_masks
+
+
+def get_scan_pool() -> ProcessPoolExecutor:
+    """Worker processes for duplicate scoring, created on first use."""
+    global _scan_pool
+    if _scan_pool is None:
+        # spawn: never fork the server process with its event loop and sockets
+        _scan_pool = ProcessPoolExecutor(
+            max_workers=DUPLICATE_SCAN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _scan_pool
+
+
+def shutdown_scan_pool():
+    global _scan_pool
+    if _scan_pool is not None:
+        _scan_pool.shutdown(wait=False, cancel_futures=True)
+        _scan_pool = None
+
+
+async def _update_job(job_id: int, **values):
+    async with async_session_maker() as session:
+        await session.execute(update(DuplicateScanJob).where(DuplicateScanJob.id == job_id).values(**values))
+        await session.commit()
+
+
+async def run_duplicate_scan(job_id: int, tree_id: int, full: bool):
+    """Scan a tree for duplicates and replace the affected suggestions."""
+    started_at = datetime.utcnow()
+    try:
+        await _update_job(job_id, status="running", started_at=started_at)
+
+        async with async_session_maker() as db:
+            since = None
+            if not full:
+                # The previous scan saw every change made before it started
+                since = await db.scalar(
+                    select(func.max(DuplicateScanJob.started_at)).where(
+                        DuplicateScanJob.tree_id == tree_id,
+                        DuplicateScanJob.status == "completed"
+                    )
+                )
+
+            # Streamed in chunks, so converting rows does not block the loop for long
+            rows = []
+            result = await db.stream(
+                select(FamilyMember.updated_at, *(getattr(FamilyMember, name) for name in _MemberRow._fields))
+                .where(FamilyMember.tree_id == tree_id)
+                .execution_options(yield_per=SCAN_FETCH_SIZE)
+            )
+            async for partition in result.partitions():
+                rows.extend(partition)
+
+        changed = None
+        if since is not None:
+            changed = {row.id for row in rows if row.updated_at is None or row.updated_at > since}
+        # Scoring runs in the scan pool; no transaction is held meanwhile
+        compared, pair_ids, scores, reason_masks = await asyncio.get_running_loop().run_in_executor(
+            get_scan_pool(), find_duplicates, [tuple(row[1:]) for row in rows], DUPLICATE_WINDOW, changed
+        )
+
+        async with async_session_maker() as db:
+            if changed is None:
+                await db.execute(delete(DuplicateSuggestion).where(DuplicateSuggestion.tree_id == tree_id))
+            else:
+                await db.execute(_DELETE_STALE_SUGGESTIONS, {"tree_id": tree_id, "since": since})
+            for start in range(0, len(scores), SUGGESTION_BATCH_SIZE):
+                await db.execute(insert(DuplicateSuggestion), [
+                    {
+                        "tree_id": tree_id,
+                        "member_id": pair_ids[2 * index],
+                        "duplicate_id": pair_ids[2 * index + 1],
+                        "score": scores[index],
+                        "reasons": [
+                            field for bit, field in enumerate(_REASON_FIELDS) if reason_masks[index] >> bit & 1
+                        ],
+                    }
+                    for index in range(start, min(start + SUGGESTION_BATCH_SIZE, len(scores)))
+                ])
+            await db.commit()
+
+        await _update_job(
+            job_id,
+            status="completed",
+            members_scanned=len(rows) if changed is None else len(changed),
+            pairs_compared=compared,
+            suggestions_found=len(scores),
+            finished_at=datetime.utcnow()
+        )
+    except Exception as e:
+        await _update_job(job_id, status="failed", error=str(e)[:1000], finished_at=datetime.utcnow())
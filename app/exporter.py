@@ -0,0 +1,183 @@
+"""
+Streamed export of one family tree as GEDCOM or JSON.
+
+Members are read through a server-side cursor and written out chunk by
+chunk, so memory use does not grow with the size of the tree. Data that is
+only needed for the members of one chunk (photo bytes, spouse families) is
+fetched per chunk.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import aliased
+from app.database import async_session_maker
+from app.gedcom import header_lines, individual_lines, family_lines, family_xref
+from app.models import FamilyMember, FamilyTree, PhotoBlob
+from app.photos import photo_url
+
+# Members read per round trip (and photos fetched per query)
+EXPORT_CHUNK_SIZE = 500
+
+# Columns written to JSON exports
+EXPORT_FIELDS = [
+    "id", "first_name", "middle_name", "last_name", "nickname", "gender",
+    "birth_date", "death_date", "birth_place", "location", "country",
+    "occupation", "bio", "social_media", "previous_partners",
+    "father_id", "mother_id", "photo_hash", "created_at", "updated_at",
+]
+
+
+async def _open_snapshot():
+    """Session on one REPEATABLE READ snapshot, so all passes see the same tree."""
+    session = async_session_maker()
+    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    return session
+
+
+def _members_query(tree_id: int):
+    """
+    Member rows of a tree in id order, with parent ids limited to parents in
+    the same tree (links to other trees would dangle in the export). Plain
+    rows rather than ORM objects, so nothing accumulates in the session.
+    """
+    father = aliased(FamilyMember)
+    mother = aliased(FamilyMember)
+    columns = [
+        getattr(FamilyMember, field) for field in EXPORT_FIELDS
+        if field not in ("father_id", "mother_id")
+    ]
+    return (
+        select(*columns, father.id.label("father_id"), mother.id.label("mother_id"))
+        .outerjoin(father, and_(father.id == FamilyMember.father_id, father.tree_id == tree_id))
+        .outerjoin(mother, and_(mother.id == FamilyMember.mother_id, mother.tree_id == tree_id))
+        .where(FamilyMember.tree_id == tree_id)
+        .order_by(FamilyMember.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+
+
+async def _load_photos(db, photo_hashes) -> Dict[str, Tuple[bytes, str]]:
+    photo_hashes = {photo_hash for photo_hash in photo_hashes if photo_hash}
+    if not photo_hashes:
+        return {}
+    result = await db.execute(
+        select(PhotoBlob.sha256, PhotoBlob.data, PhotoBlob.mime_type)
+        .where(PhotoBlob.sha256.in_(photo_hashes))
+    )
+    return {sha256: (data, mime_type) for sha256, data, mime_type in result.all()}
+
+
+async def _spouse_families(db, tree_id: int, member_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Family xrefs each of the given members is a parent in."""
+    member_ids = set(member_ids)
+    father = aliased(FamilyMember)
+    mother = aliased(FamilyMember)
+    result = await db.execute(
+        select(father.id, mother.id).distinct()
+        .select_from(FamilyMember)
+        .outerjoin(father, and_(father.id == FamilyMember.father_id, father.tree_id == tree_id))
+        .outerjoin(mother, and_(mother.id == FamilyMember.mother_id, mother.tree_id == tree_id))
+        .where(
+            FamilyMember.tree_id == tree_id,
+            or_(FamilyMember.father_id.in_(member_ids), FamilyMember.mother_id.in_(member_ids))
+        )
+    )
+    families: Dict[int, List[str]] = {}
+    for father_id, mother_id in result.all():
+        for parent_id in (father_id, mother_id):
+            if parent_id in member_ids:
+                families.setdefault(parent_id, []).append(family_xref(father_id, mother_id))
+    return families
+
+
+async def export_gedcom(tree: FamilyTree, include_photos: bool) -> AsyncIterator[bytes]:
+    """
+    The tree as GEDCOM 5.5.1. Families are derived from shared parents.
+    With include_photos, members get an OBJE record linking their photo
+    URL (GEDCOM has no standard way to embed image data).
+    """
+    yield ("\n".join(header_lines("FamilyTree")) + "\n").encode("utf-8")
+
+    db = await _open_snapshot()
+    try:
+        result = await db.stream(_members_query(tree.id))
+        async for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+            spouse_families = await _spouse_families(db, tree.id, [member.id for member in chunk])
+            lines = []
+            for member in chunk:
+                lines += individual_lines(
+                    member,
+                    spouse_families.get(member.id, []),
+                    photo_url(member.id, member.photo_hash) if include_photos and member.photo_hash else None
+                )
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+        # Families: children grouped by parent couple, streamed in couple order
+        father = aliased(FamilyMember)
+        mother = aliased(FamilyMember)
+        result = await db.stream(
+            select(FamilyMember.id, father.id, mother.id)
+            .outerjoin(father, and_(father.id == FamilyMember.father_id, father.tree_id == tree.id))
+            .outerjoin(mother, and_(mother.id == FamilyMember.mother_id, mother.tree_id == tree.id))
+            .where(FamilyMember.tree_id == tree.id, or_(father.id.isnot(None), mother.id.isnot(None)))
+            .order_by(father.id, mother.id, FamilyMember.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        couple: Optional[Tuple[Optional[int], Optional[int]]] = None
+        children: List[int] = []
+        async for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+            lines = []
+            for child_id, father_id, mother_id in chunk:
+                if (father_id, mother_id) != couple:
+                    if couple is not None:
+                        lines += family_lines(*couple, children)
+                    couple, children = (father_id, mother_id), []
+                children.append(child_id)
+            yield ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+        if couple is not None:
+            yield ("\n".join(family_lines(*couple, children)) + "\n").encode("utf-8")
+    finally:
+        await db.close()
+
+    yield b"0 TRLR\n"
+
+
+async def export_json(tree: FamilyTree, include_photos: bool) -> AsyncIterator[bytes]:
+    """
+    The tree as one JSON document: {"tree": {...}, "members": [...]}. With
+    include_photos, each member carries its photo as base64.
+    """
+    header = {
+        "format": "familytree-export",
+        "version": 1,
+        "exported_at": datetime.utcnow(),
+        "tree": {"id": tree.id, "name": tree.name, "description": tree.description},
+    }
+    yield json.dumps(jsonable_encoder(header))[:-1].encode("utf-8") + b', "members": ['
+
+    db = await _open_snapshot()
+    first = True
+    try:
+        result = await db.stream(_members_query(tree.id))
+        async for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+            photos = await _load_photos(db, [member.photo_hash for member in chunk]) if include_photos else {}
+            parts = []
+            for member in chunk:
+                record = {field: getattr(member, field) for field in EXPORT_FIELDS}
+                if member.photo_hash in photos:
+                    data, mime_type = photos[member.photo_hash]
+                    record["photo"] = {
+                        "mime_type": mime_type,
+                        "data": base64.b64encode(data).decode("utf-8"),
+                    }
+                parts.append(json.dumps(jsonable_encoder(record)))
+            yield (("" if first else ",") + ",".join(parts)).encode("utf-8")
+            first = False
+    finally:
+        await db.close()
+
+    yield b"]}"
@@ -0,0 +1,282 @@
+"""
+GEDCOM 5.5.1 reading and writing.
+
+Parses a GEDCOM file line by line into level-0 records (individuals,
+families, ...) without holding the whole file in memory, and maps
+individual records onto FamilyMember columns. The writer produces the
+records for one member or family at a time, for streamed exports.
+"""
+
+import re
+from datetime import date
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+_LINE_RE = re.compile(r"^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$")
+_NAME_RE = re.compile(r"^(?P<given>[^/]*)(?:/(?P<surname>[^/]*)/?)?(?P<suffix>.*)$")
+
+_MONTHS = {
+    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
+}
+_DATE_QUALIFIERS = {"ABT", "CAL", "EST", "BEF", "AFT", "FROM", "TO", "BET", "INT"}
+
+_GENDERS = {"M": "Male", "F": "Female"}
+_SEX_CODES = {"Male": "M", "Female": "F"}
+
+# GEDCOM caps lines at 255 characters; longer values continue in CONC lines
+_MAX_VALUE_LENGTH = 200
+
+
+class GedcomNode:
+    """One GEDCOM line with its nested sub-lines."""
+
+    __slots__ = ("level", "xref", "tag", "value", "children")
+
+    def __init__(self, level: int, xref: Optional[str], tag: str, value: str):
+        self.level = level
+        self.xref = xref
+        self.tag = tag
+        self.value = value
+        self.children: List["GedcomNode"] = []
+
+    def first(self, tag: str) -> Optional["GedcomNode"]:
+        for child in self.children:
+            if child.tag == tag:
+                return child
+        return None
+
+    def all(self, tag: str) -> List["GedcomNode"]:
+        return [child for child in self.children if child.tag == tag]
+
+    def path(self, *tags: str) -> Optional["GedcomNode"]:
+        node = self
+        for tag in tags:
+            node = node.first(tag)
+            if node is None:
+                return None
+        return node
+
+    def text(self) -> str:
+        """Value with CONT (new line) and CONC (continuation) lines joined."""
+        parts = [self.value]
+        for child in self.children:
+            if child.tag == "CONT":
+                parts.append("\n" + child.value)
+            elif child.tag == "CONC":
+                parts.append(child.value)
+        return "".join(parts)
+
+
+def iter_records(stream: BinaryIO, progress: Optional[List[int]] = None) -> Iterator[GedcomNode]:
+    """
+    Yield level-0 records one at a time while reading the file. If given,
+    progress[0] is kept at the number of bytes consumed so far.
+    """
+    record: Optional[GedcomNode] = None
+    stack: List[GedcomNode] = []
+    consumed = 0
+
+    for raw in stream:
+        consumed += len(raw)
+        if progress is not None:
+            progress[0] = consumed
+        line = raw.decode("utf-8-sig" if consumed == len(raw) else "utf-8", errors="replace")
+        match = _LINE_RE.match(line.rstrip("\r\n"))
+        if not match:
+            continue
+        level, xref, tag, value = int(match.group(1)), match.group(2), match.group(3), match.group(4) or ""
+        node = GedcomNode(level, xref, tag.upper(), value)
+
+        if level == 0:
+            if record is not None:
+                yield record
+            record = node
+            stack = [node]
+            continue
+        if record is None:
+            continue
+
+        while len(stack) > level:
+            stack.pop()
+        stack[-1].children.append(node)
+        stack.append(node)
+
+    if record is not None:
+        yield record
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """
+    Best-effort GEDCOM date: qualifiers (ABT, BEF, BET ... AND ...) are
+    dropped and partial dates fall on the first day of the month or year.
+    """
+    if not value:
+        return None
+    tokens = value.upper().replace("(", " ").replace(")", " ").split()
+    while tokens and tokens[0] in _DATE_QUALIFIERS:
+        tokens.pop(0)
+    if "AND" in tokens:
+        tokens = tokens[:tokens.index("AND")]
+    if "TO" in tokens:
+        tokens = tokens[:tokens.index("TO")]
+
+    day, month, year = 1, 1, None
+    try:
+        if len(tokens) >= 3 and tokens[1] in _MONTHS:
+            day, month, year = int(tokens[0]), _MONTHS[tokens[1]], int(tokens[2].split("/")[0])
+        elif len(tokens) >= 2 and tokens[0] in _MONTHS:
+            month, year = _MONTHS[tokens[0]], int(tokens[1].split("/")[0])
+        elif tokens:
+            year = int(tokens[0].split("/")[0])
+        if year is None or year < 1:
+            return None
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_name(record: GedcomNode) -> Tuple[str, Optional[str], str, Optional[str]]:
+    """(first, middle, last, nickname) from an individual's first NAME."""
+    name = record.first("NAME")
+    if name is None:
+        return "Unknown", None, "", None
+
+    match = _NAME_RE.match(name.value.strip())
+    given = (name.first("GIVN").value if name.first("GIVN") else match.group("given")).split()
+    surname = name.first("SURN").value if name.first("SURN") else (match.group("surname") or "")
+    nickname = name.first("NICK").value if name.first("NICK") else None
+
+    first_name = given[0] if given else "Unknown"
+    middle_name = " ".join(given[1:]) or None
+    return first_name, middle_name, surname.strip(), nickname
+
+
+def individual_to_member(record: GedcomNode) -> Dict[str, Optional[object]]:
+    """FamilyMember column values for an INDI record (parents are linked later)."""
+    first_name, middle_name, last_name, nickname = parse_name(record)
+    birth = record.first("BIRT")
+    death = record.first("DEAT")
+    residence = record.path("RESI", "PLAC")
+    occupation = record.first("OCCU")
+    notes = [note.text() for note in record.all("NOTE") if not note.value.startswith("@")]
+    sex = record.first("SEX")
+
+    return {
+        "first_name": first_name,
+        "middle_name": middle_name,
+        "last_name": last_name,
+        "nickname": nickname,
+        "gender": _GENDERS.get(sex.value.strip().upper()[:1], "Other") if sex and sex.value.strip() else None,
+        "birth_date": parse_date(birth.path("DATE").value) if birth and birth.path("DATE") else None,
+        "death_date": parse_date(death.path("DATE").value) if death and death.path("DATE") else None,
+        "birth_place": birth.path("PLAC").value if birth and birth.path("PLAC") else None,
+        "location": residence.value if residence else None,
+        "occupation": occupation.text() if occupation else None,
+        "bio": "\n\n".join(notes) or None,
+    }
+
+
+def family_links(record: GedcomNode) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """(husband xref, wife xref, child xrefs) of a FAM record."""
+    husband = record.first("HUSB")
+    wife = record.first("WIFE")
+    return (
+        husband.value.strip() if husband else None,
+        wife.value.strip() if wife else None,
+        [child.value.strip() for child in record.all("CHIL")],
+    )
+
+
+def individual_xref(member_id: int) -> str:
+    return f"@I{member_id}@"
+
+
+def family_xref(father_id: Optional[int], mother_id: Optional[int]) -> str:
+    """Families are not stored; a couple's xref is derived from its parent ids."""
+    return f"@F{father_id or 0}_{mother_id or 0}@"
+
+
+def format_date(value: Optional[date]) -> Optional[str]:
+    if value is None:
+        return None
+    month = next(name for name, number in _MONTHS.items() if number == value.month)
+    return f"{value.day} {month} {value.year}"
+
+
+def _text_lines(level: int, tag: str, value: str) -> List[str]:
+    """A possibly multi-line value as tag + CONT/CONC continuation lines."""
+    lines = []
+    for index, paragraph in enumerate(value.replace("\r\n", "\n").split("\n")):
+        chunks = [paragraph[i:i + _MAX_VALUE_LENGTH] for i in range(0, len(paragraph), _MAX_VALUE_LENGTH)] or [""]
+        for chunk_index, chunk in enumerate(chunks):
+            if index == 0 and chunk_index == 0:
+                prefix = f"{level} {tag}"
+            elif chunk_index == 0:
+                prefix = f"{level + 1} CONT"
+            else:
+                prefix = f"{level + 1} CONC"
+            lines.append(f"{prefix} {chunk}" if chunk else prefix)
+    return lines
+
+
+def header_lines(source: str) -> List[str]:
+    return [
+        "0 HEAD",
+        f"1 SOUR {source}",
+        "1 GEDC",
+        "2 VERS 5.5.1",
+        "2 FORM LINEAGE-LINKED",
+        "1 CHAR UTF-8",
+    ]
+
+
+def individual_lines(
+    member,
+    spouse_families: List[str],
+    photo_file: Optional[str] = None
+) -> List[str]:
+    """INDI record of a member (any object with FamilyMember attributes)."""
+    given = " ".join(part for part in (member.first_name, member.middle_name) if part)
+    lines = [
+        f"0 {individual_xref(member.id)} INDI",
+        f"1 NAME {given} /{member.last_name or ''}/",
+    ]
+    if given:
+        lines.append(f"2 GIVN {given}")
+    if member.last_name:
+        lines.append(f"2 SURN {member.last_name}")
+    if member.nickname:
+        lines.append(f"2 NICK {member.nickname}")
+    if member.gender:
+        lines.append(f"1 SEX {_SEX_CODES.get(member.gender, 'U')}")
+    if member.birth_date or member.birth_place:
+        lines.append("1 BIRT")
+        if member.birth_date:
+            lines.append(f"2 DATE {format_date(member.birth_date)}")
+        if member.birth_place:
+            lines.append(f"2 PLAC {member.birth_place}")
+    if member.death_date:
+        lines += ["1 DEAT", f"2 DATE {format_date(member.death_date)}"]
+    if member.location:
+        lines += ["1 RESI", f"2 PLAC {member.location}"]
+    if member.occupation:
+        lines.append(f"1 OCCU {member.occupation}")
+    if member.bio:
+        lines += _text_lines(1, "NOTE", member.bio)
+    if photo_file:
+        lines += ["1 OBJE", f"2 FILE {photo_file}", "3 FORM webp"]
+    if member.father_id or member.mother_id:
+        lines.append(f"1 FAMC {family_xref(member.father_id, member.mother_id)}")
+    for xref in spouse_families:
+        lines.append(f"1 FAMS {xref}")
+    return lines
+
+
+def family_lines(father_id: Optional[int], mother_id: Optional[int], child_ids: List[int]) -> List[str]:
+    lines = [f"0 {family_xref(father_id, mother_id)} FAM"]
+    if father_id:
+        lines.append(f"1 HUSB {individual_xref(father_id)}")
+    if mother_id:
+        lines.append(f"1 WIFE {individual_xref(mother_id)}")
+    lines += [f"1 CHIL {individual_xref(child_id)}" for child_id in child_ids]
+    return lines
@@ -0,0 +1,211 @@
+"""
+Background GEDCOM import into a family tree.
+
+The uploaded file is parsed record by record in a worker thread, off the
+event loop. Individuals are handed to the event loop in batches through a
+small bounded queue and inserted as multi-row INSERTs while parsing goes
+on, so memory stays flat however large the file is; only the xref ->
+member id map and the parent links are kept. Parent links from family
+records are collected as xrefs and applied afterwards by set-based UPDATEs,
+since a family record may come before or after the people it links.
+
+All member rows are written in one transaction, so a failed import leaves
+the tree untouched. The tree revision is bumped (which locks the tree row)
+only just before that transaction commits, so other writes to the tree are
+not held up by the import. Progress is committed to import_jobs through a
+separate session, so it can be polled from any worker."""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert, update, text
+from app.database import async_session_maker
+from app.gedcom import iter_records, individual_to_member, family_links
+from app.models import FamilyMember, ImportJob
+from app.phonetic import phonetic_keys
+from app.revisions import bump_tree_revision, get_tree_revision
+from app.tree_cache import invalidate_tree_responses
+
+# Members inserted per INSERT statement, and parent links per UPDATE
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+LINK_BATCH_SIZE = 5000
+# Parsed batches waiting to be inserted
+IMPORT_QUEUE_SIZE = 2
+# Seconds between progress updates while no batch arrives
+IMPORT_PROGRESS_INTERVAL = 1.0
+
+_LINK_PARENTS = text("""
+    UPDATE family_members AS fm
+    SET father_id = links.father_id, mother_id = links.mother_id
+    FROM unnest(
+        CAST(:ids AS integer[]), CAST(:father_ids AS integer[]), CAST(:mother_ids AS integer[])
+    ) AS links(id, father_id, mother_id)
+    WHERE fm.id = links.id
+""")
+
+# Imported ids come from one sequence, so they lie between the first and
+# the last; a member added to the tree meanwhile is merely stamped again
+_STAMP_IMPORTED = text("""
+    UPDATE family_members SET revision = :revision
+    WHERE tree_id = :tree_id AND id BETWEEN :first_id AND :last_id
+""")
+
+
+def _truncate(row: Dict[str, object]) -> Dict[str, object]:
+    """Clip text values to their column length (GEDCOM fields are unbounded)."""
+    for name, value in row.items():
+        length = getattr(FamilyMember.__table__.c[name].type, "length", None)
+        if length and isinstance(value, str) and len(value) > length:
+            row[name] = value[:length]
+    return row
+
+
+def _parse_gedcom(
+    path: str,
+    progress: List[int],
+    loop: asyncio.AbstractEventLoop,
+    batches: asyncio.Queue,
+    stop: threading.Event
+) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """
+    Put (member rows, xrefs) batches of the individuals in a GEDCOM file on
+    batches, then None, and return child xref -> (father xref, mother xref)
+    from its family records (first family wins). Runs in a worker thread;
+    progress[0] tracks bytes read and stop ends it early.
+    """
+    def put(item):
+        # Blocks while the queue is full, so parsing keeps pace with inserting
+        asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+
+    rows: List[Dict[str, object]] = []
+    xrefs: List[Optional[str]] = []
+    parents_of: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    try:
+        with open(path, "rb") as stream:
+            for record in iter_records(stream, progress):
+                if stop.is_set():
+                    break
+                if record.tag == "INDI":
+                    row = _truncate(individual_to_member(record))
+                    row.update(phonetic_keys(row["first_name"], row["last_name"]))
+                    rows.append(row)
+                    xrefs.append(record.xref)
+                    if len(rows) == IMPORT_BATCH_SIZE:
+                        put((rows, xrefs))
+                        rows, xrefs = [], []
+                elif record.tag == "FAM":
+                    husband, wife, children = family_links(record)
+                    for child in children:
+                        parents_of.setdefault(child, (husband, wife))
+        if rows and not stop.is_set():
+            put((rows, xrefs))
+    finally:
+        put(None)
+    return parents_of
+
+
+async def _update_job(job_id: int, **values):
+    async with async_session_maker() as session:
+        await session.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+        await session.commit()
+
+
+async def run_gedcom_import(job_id: int, path: str, tree_id: int, user_id: int):
+    """Import the GEDCOM file at path into tree_id, then delete the file."""
+    progress = [0]
+    imported = 0
+    try:
+        await _update_job(job_id, status="running")
+
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue(IMPORT_QUEUE_SIZE)
+        stop = threading.Event()
+        parse = loop.run_in_executor(None, _parse_gedcom, path, progress, loop, batches, stop)
+
+        async with async_session_maker() as db:
+            xref_ids: Dict[str, int] = {}
+            first_id = last_id = None
+            try:
+                while True:
+                    try:
+                        batch = await asyncio.wait_for(batches.get(), IMPORT_PROGRESS_INTERVAL)
+                    except asyncio.TimeoutError:
+                        await _update_job(job_id, processed_bytes=progress[0])
+                        continue
+                    if batch is None:
+                        break
+                    rows, xrefs = batch
+                    for row in rows:
+                        row.update(user_id=user_id, tree_id=tree_id)
+                    result = await db.execute(
+                        insert(FamilyMember).returning(FamilyMember.id, sort_by_parameter_order=True),
+                        rows
+                    )
+                    batch_ids = result.scalars().all()
+                    for xref, member_id in zip(xrefs, batch_ids):
+                        if xref:
+                            xref_ids[xref] = member_id
+                    first_id = batch_ids[0] if first_id is None else first_id
+                    last_id = batch_ids[-1]
+                    imported += len(rows)
+                    await _update_job(job_id, processed_bytes=progress[0], members_imported=imported)
+            finally:
+                # On a failed insert, unblock the parser and let it finish
+                stop.set()
+                while not parse.done():
+                    while not batches.empty():
+                        batches.get_nowait()
+                    await asyncio.wait([parse], timeout=0.1)
+            parents_of = parse.result()
+
+            # Second pass: resolve parent xrefs to the new ids, set-based
+            links = []
+            for child, (husband, wife) in parents_of.items():
+                member_id = xref_ids.get(child)
+                father_id = xref_ids.get(husband)
+                mother_id = xref_ids.get(wife)
+                if member_id and (father_id or mother_id):
+                    links.append((member_id, father_id, mother_id))
+            for start in range(0, len(links), LINK_BATCH_SIZE):
+                chunk = links[start:start + LINK_BATCH_SIZE]
+                await db.execute(_LINK_PARENTS, {
+                    "ids": [link[0] for link in chunk],
+                    "father_ids": [link[1] for link in chunk],
+                    "mother_ids": [link[2] for link in chunk],
+                })
+
+            # Imported members carry the new revision, so change feeds pick
+            # them up. Bumping locks the tree row until the commit.
+            await bump_tree_revision(db, tree_id)
+            revision = await get_tree_revision(db, tree_id)
+            if first_id is not None:
+                await db.execute(_STAMP_IMPORTED, {
+                    "revision": revision, "tree_id": tree_id, "first_id": first_id, "last_id": last_id
+                })
+            await db.commit()
+
+        invalidate_tree_responses(user_id, tree_id)
+        await _update_job(
+            job_id,
+            status="completed",
+            processed_bytes=progress[0],
+            members_imported=imported,
+            members_linked=len(links),
+            finished_at=datetime.utcnow()
+        )
+    except Exception as e:
+        # Nothing was committed, so report no imported members
+        await _update_job(
+            job_id,
+            status="failed",
+            members_imported=0,
+            error=str(e)[:1000],
+            finished_at=datetime.utcnow()
+        )
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,272 @@
+"""
+Server-side family tree layout.
+
+Computes a generation level and x/y coordinates for every member so clients
+can draw the tree without running their own layout. Spacing matches the
+constants the client-side layout in static/app.js uses.
+
+Layouts are cached per tree and version. When a tree changes, only the
+subtrees whose structure changed are laid out again; unchanged subtrees are
+reused and packed side by side with the new ones.
+"""
+
+import os
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Layout geometry (px), mirrored from renderFamilyTree in static/app.js
+GENERATION_GAP = 180
+TOP_MARGIN = 80
+LEFT_MARGIN = 200
+SIBLING_SPACING = 200
+PARTNER_SPACING = 150
+GROUP_SPACING = 250
+
+# Number of tree layouts kept in memory
+LAYOUT_CACHE_SIZE = int(os.getenv("LAYOUT_CACHE_SIZE", "128"))
+
+# member id -> (father_id, mother_id)
+ParentMap = Dict[int, Tuple[Optional[int], Optional[int]]]
+# member id -> (generation, x, y)
+Positions = Dict[int, Tuple[int, float, float]]
+
+
+def compute_generations(parents: ParentMap) -> Dict[int, int]:
+    """
+    Generation level of every member: 0 without known parents, otherwise one
+    below the deepest parent. Iterative (Kahn's algorithm), so deep trees do
+    not hit the recursion limit; members caught in a parent cycle keep the
+    level reached before the cycle.
+    """
+    children: Dict[int, List[int]] = {member_id: [] for member_id in parents}
+    pending: Dict[int, int] = {}
+    for member_id, member_parents in parents.items():
+        known = {p for p in member_parents if p in parents and p != member_id}
+        pending[member_id] = len(known)
+        for parent_id in known:
+            children[parent_id].append(member_id)
+
+    generations = {member_id: 0 for member_id in parents}
+    queue = deque(member_id for member_id, count in pending.items() if count == 0)
+    while queue:
+        member_id = queue.popleft()
+        for child_id in children[member_id]:
+            generations[child_id] = max(generations[child_id], generations[member_id] + 1)
+            pending[child_id] -= 1
+            if pending[child_id] == 0:
+                queue.append(child_id)
+    return generations
+
+
+class _Forest:
+    """
+    Layout forest: every member hangs below one layout parent, and parentless
+    partners (married-in spouses, founding couples) ride along next to the
+    person they had children with instead of starting a subtree of their own.
+    """
+
+    def __init__(self, parents: ParentMap):
+        self.generations = compute_generations(parents)
+        self.spouses: Dict[int, List[int]] = {member_id: [] for member_id in parents}
+        self.children: Dict[int, List[int]] = {member_id: [] for member_id in parents}
+        anchor_of: Dict[int, int] = {}
+
+        member_ids = sorted(parents)
+        children_of: Dict[int, List[int]] = {member_id: [] for member_id in parents}
+        for member_id in member_ids:
+            for parent_id in set(parents[member_id]):
+                if parent_id in parents:
+                    children_of[parent_id].append(member_id)
+
+        def married_in(partner: int, anchor: int) -> bool:
+            # No parents in the tree, and every child is shared with anchor
+            return (
+                not any(p in parents for p in parents[partner])
+                and not self.spouses[partner]
+                and all(anchor in parents[child] for child in children_of[partner])
+            )
+
+        for member_id in member_ids:
+            father_id, mother_id = parents[member_id]
+            if father_id not in parents or mother_id not in parents or father_id == mother_id:
+                continue
+            if father_id in anchor_of or mother_id in anchor_of:
+                continue
+            for anchor, partner in ((father_id, mother_id), (mother_id, father_id)):
+                if married_in(partner, anchor):
+                    anchor_of[partner] = anchor
+                    self.spouses[anchor].append(partner)
+                    break
+
+        for member_id in member_ids:
+            father_id, mother_id = parents[member_id]
+            layout_parent = father_id if father_id in parents else mother_id
+            layout_parent = anchor_of.get(layout_parent, layout_parent)
+            if layout_parent in parents and layout_parent != member_id and member_id not in anchor_of:
+                self.children[layout_parent].append(member_id)
+
+        # Spouses are drawn on their partner's row
+        for partner, anchor in anchor_of.items():
+            self.generations[partner] = self.generations[anchor]
+
+        # Roots: members nobody lays out below them. Anything left unvisited
+        # afterwards sits in a parent cycle and becomes a root of its own.
+        self.roots: List[int] = []
+        self.subtree_order: Dict[int, List[int]] = {}
+        has_layout_parent = {c for kids in self.children.values() for c in kids}
+        visited = set(anchor_of)
+        candidates = [m for m in member_ids if m not in has_layout_parent and m not in anchor_of]
+        candidates += member_ids
+        for member_id in candidates:
+            if member_id not in visited:
+                self.roots.append(member_id)
+                self.subtree_order[member_id] = self._post_order(member_id, visited)
+
+    def _post_order(self, root_id: int, visited: set) -> List[int]:
+        order = []
+        visited.add(root_id)
+        stack = [(root_id, False)]
+        while stack:
+            member_id, expanded = stack.pop()
+            if expanded:
+                order.append(member_id)
+                continue
+            stack.append((member_id, True))
+            kids = [c for c in self.children[member_id] if c not in visited]
+            self.children[member_id] = kids
+            visited.update(kids)
+            for child_id in reversed(kids):
+                stack.append((child_id, False))
+        return order
+
+    def signature(self, root_id: int) -> int:
+        """Hash of everything the layout of a subtree depends on."""
+        return hash(tuple(
+            (m, tuple(self.children[m]), tuple(self.spouses[m]), self.generations[m])
+            for m in self.subtree_order[root_id]
+        ))
+
+
+class _Subtree:
+    """Relative x positions of one root's subtree, starting at x = 0."""
+
+    def __init__(self, signature: int, x: Dict[int, float], width: float):
+        self.signature = signature
+        self.x = x
+        self.width = width
+
+
+def _layout_subtree(forest: _Forest, root_id: int, signature: int) -> _Subtree:
+    """
+    Tidy layout of one subtree: leaves are placed left to right, parents are
+    centred over their children, and each row keeps a right-hand frontier so
+    nodes never overlap (a subtree that would collide is shifted right).
+    """
+    order = forest.subtree_order[root_id]
+    generations = forest.generations
+    x: Dict[int, float] = {}
+    frontier: Dict[int, float] = {}
+    start: Dict[int, int] = {}
+
+    def unit_width(member_id: int) -> float:
+        return PARTNER_SPACING * len(forest.spouses[member_id])
+
+    for index, member_id in enumerate(order):
+        kids = forest.children[member_id]
+        start[member_id] = start[kids[0]] if kids else index
+        generation = generations[member_id]
+        width = unit_width(member_id)
+
+        if kids:
+            last = kids[-1]
+            desired = (x[kids[0]] + x[last] + unit_width(last)) / 2 - width / 2
+        else:
+            desired = frontier.get(generation, 0.0)
+
+        required = frontier.get(generation)
+        if required is not None and desired < required:
+            shift = required - desired
+            desired = required
+            for descendant in order[start[member_id]:index]:
+                x[descendant] += shift
+                row = generations[descendant]
+                frontier[row] = max(
+                    frontier.get(row, 0.0),
+                    x[descendant] + unit_width(descendant) + SIBLING_SPACING
+                )
+
+        x[member_id] = desired
+        frontier[generation] = desired + width + SIBLING_SPACING
+
+    for member_id in order:
+        for i, spouse_id in enumerate(forest.spouses[member_id], start=1):
+            x[spouse_id] = x[member_id] + PARTNER_SPACING * i
+
+    min_x = min(x.values())
+    max_x = max(x.values())
+    return _Subtree(
+        signature,
+        {member_id: value - min_x for member_id, value in x.items()},
+        max_x - min_x
+    )
+
+
+class TreeLayout:
+    """Layout of one tree at one version, with its reusable subtrees."""
+
+    def __init__(self, version: Hashable, subtrees: Dict[int, _Subtree], positions: Positions):
+        self.version = version
+        self.subtrees = subtrees
+        self.positions = positions
+
+
+def compute_layout(
+    parents: ParentMap,
+    version: Hashable = None,
+    previous: Optional[TreeLayout] = None
+) -> TreeLayout:
+    """
+    Lay out a whole tree. Subtrees whose structure is unchanged since
+    previous are reused rather than laid out again.
+    """
+    forest = _Forest(parents)
+    reusable = previous.subtrees if previous else {}
+    subtrees: Dict[int, _Subtree] = {}
+    positions: Positions = {}
+    offset = float(LEFT_MARGIN)
+
+    for root_id in forest.roots:
+        signature = forest.signature(root_id)
+        subtree = reusable.get(root_id)
+        if subtree is None or subtree.signature != signature:
+            subtree = _layout_subtree(forest, root_id, signature)
+        subtrees[root_id] = subtree
+
+        for member_id, rel_x in subtree.x.items():
+            generation = forest.generations[member_id]
+            positions[member_id] = (
+                generation,
+                offset + rel_x,
+                float(TOP_MARGIN + generation * GENERATION_GAP)
+            )
+        offset += subtree.width + GROUP_SPACING
+
+    return TreeLayout(version, subtrees, positions)
+
+
+_layout_cache: "OrderedDict[Hashable, TreeLayout]" = OrderedDict()
+
+
+def get_tree_layout(cache_key: Hashable, version: Hashable, parents: ParentMap) -> Positions:
+    """
+    Positions for a tree, served from the cache when version is unchanged.
+    A stale cached layout is used as the starting point for recomputation.
+    """
+    cached = _layout_cache.get(cache_key)
+    if cached is None or cached.version != version:
+        cached = compute_layout(parents, version, cached)
+        _layout_cache[cache_key] = cached
+    _layout_cache.move_to_end(cache_key)
+    while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+        _layout_cache.popitem(last=False)
+    return cached.positions
@@ -6,6 +6,10 @@ from fastapi.responses import RedirectResponse
 from contextlib import asynccontextmanager
 import os
 from app.database import init_db
+from app.auth import password_hasher
+from app.duplicates import shutdown_scan_pool
+from app.photos import shutdown_image_pool
+from app.refresh_tokens import rebuild_revocation_filter
 from app.routers import auth, family_tree, tree_views, admin, family_trees
 from app.security import (
     SecurityHeadersMiddleware,
@@ -17,8 +21,9 @@ from app.security import (
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize database
+    # Startup: Initialize database and load revoked refresh tokens
     await init_db()
+    await rebuild_revocation_filter()
     print("=" * 70)
     print("SECURITY CONFIGURATION STATUS")
     print("=" * 70)
@@ -28,7 +33,10 @@ async def lifespan(app: FastAPI):
     print(f"CORS Origins: {os.getenv('CORS_ORIGINS', 'http://localhost:8080,http://127.0.0.1:8080')}")
     print("=" * 70)
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop worker processes and password hashing threads
+    shutdown_image_pool()
+    shutdown_scan_pool()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -57,8 +65,9 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,  # Whitelist only - CRITICAL CHANGE
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Explicit methods
-    allow_headers=["Authorization", "Content-Type", "X-Requested-With"],  # Explicit headers
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],  # Explicit methods
+    allow_headers=["Authorization", "Content-Type", "X-Requested-With", "If-None-Match"],  # Explicit headers
+    expose_headers=["ETag", "X-Next-After-Id", "X-Next-Offset", "X-Tree-Revision"],  # Conditional GETs, cursors
     max_age=600,  # Cache preflight requests for 10 minutes
 )
 
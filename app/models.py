@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Date, JSON, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Date, JSON, Boolean, LargeBinary, Index, Computed, DDL, event, Float, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from app.database import Base
 
@@ -16,6 +17,7 @@ class User(Base):
     permissions = Column(JSON, nullable=True)  # Store user permissions as JSON
     last_login = Column(DateTime, nullable=True)
     onboarding_completed = Column(Boolean, default=False, nullable=False)
+    token_version = Column(Integer, default=0, nullable=False)  # Bumped to revoke issued tokens
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -27,6 +29,25 @@ class User(Base):
 
 class FamilyMember(Base):
     __tablename__ = "family_members"
+    __table_args__ = (
+        # Used to find children (descendant queries, parent cleanup on delete)
+        Index("idx_family_members_father_id", "father_id"),
+        Index("idx_family_members_mother_id", "mother_id"),
+        # Keyset pagination of member listings (WHERE ... AND id > :after ORDER BY id)
+        Index("idx_family_members_user_id_id", "user_id", "id"),
+        Index("idx_family_members_tree_id_id", "tree_id", "id"),
+        # Change feed (WHERE tree_id = :tree AND revision > :since)
+        Index("idx_family_members_tree_id_revision", "tree_id", "revision"),
+        # Phonetic name lookups (search mode=phonetic)
+        Index("idx_family_members_user_id_last_name_soundex", "user_id", "last_name_soundex", "first_name_soundex"),
+        Index("idx_family_members_user_id_first_name_soundex", "user_id", "first_name_soundex"),
+        # Member search: full-text and trigram name matching
+        Index("idx_family_members_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "idx_family_members_search_name", "search_name",
+            postgresql_using="gin", postgresql_ops={"search_name": "gin_trgm_ops"}
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -44,10 +65,30 @@ class FamilyMember(Base):
     occupation = Column(String(100))
     bio = Column(Text)
     photo_url = Column(String(500))  # Deprecated: kept for backward compatibility
-    profile_picture_data = Column(Text, nullable=True)  # Base64-encoded image data
-    profile_picture_mime_type = Column(String(50), nullable=True)  # e.g., 'image/jpeg', 'image/png'
+    photo_hash = Column(String(64), ForeignKey("photo_blobs.sha256"), nullable=True, index=True)  # Profile picture
     social_media = Column(JSON, nullable=True)  # Store as JSON: {facebook: url, instagram: url, etc}
     previous_partners = Column(Text, nullable=True)  # Comma-separated names or free text
+    revision = Column(Integer, default=0, nullable=False)  # Tree revision of the last change
+    first_name_soundex = Column(String(4), nullable=True)  # Phonetic keys (app/phonetic.py)
+    last_name_soundex = Column(String(4), nullable=True)
+
+    # Search columns, maintained by PostgreSQL (see migration 017); deferred
+    # so that loading members does not fetch them
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', "
+        "coalesce(first_name, '') || ' ' || coalesce(middle_name, '') || ' ' || "
+        "coalesce(last_name, '') || ' ' || coalesce(nickname, '')), 'A') || "
+        "setweight(to_tsvector('simple', "
+        "coalesce(birth_place, '') || ' ' || coalesce(location, '') || ' ' || "
+        "coalesce(occupation, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(bio, '')), 'C')",
+        persisted=True
+    ), nullable=True))
+    search_name = deferred(Column(Text, Computed(
+        "lower(coalesce(first_name, '') || ' ' || coalesce(middle_name || ' ', '') || "
+        "coalesce(last_name, '') || coalesce(' ' || nickname, ''))",
+        persisted=True
+    ), nullable=True))
 
     # Parent relationships
     father_id = Column(Integer, ForeignKey("family_members.id"), nullable=True)
@@ -63,6 +104,102 @@ class FamilyMember(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+# The trigram index needs pg_trgm when the table is created by create_all
+event.listen(FamilyMember.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+class PhotoBlob(Base):
+    """Content-addressed image bytes, shared by every member referencing the same picture."""
+    __tablename__ = "photo_blobs"
+
+    sha256 = Column(String(64), primary_key=True)  # Hex digest of data
+    data = Column(LargeBinary, nullable=False)
+    mime_type = Column(String(50), nullable=False)  # e.g., 'image/jpeg', 'image/png'
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PhotoVariant(Base):
+    """Resized rendition of a photo blob, keyed by the original's hash."""
+    __tablename__ = "photo_variants"
+
+    photo_hash = Column(String(64), ForeignKey("photo_blobs.sha256", ondelete="CASCADE"), primary_key=True)
+    size = Column(Integer, primary_key=True)  # Square edge length in px
+    data = Column(LargeBinary, nullable=False)
+    mime_type = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MemberTombstone(Base):
+    """Record of a member removed from a tree, served by the change feed."""
+    __tablename__ = "member_tombstones"
+    __table_args__ = (
+        Index("idx_member_tombstones_tree_id_revision", "tree_id", "revision"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    tree_id = Column(Integer, ForeignKey("family_trees.id", ondelete="CASCADE"), nullable=False)
+    member_id = Column(Integer, nullable=False)  # No FK: the member is usually gone
+    revision = Column(Integer, nullable=False)  # Tree revision of the removal
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ImportJob(Base):
+    """Background import of a file into a family tree, with its progress."""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    tree_id = Column(Integer, ForeignKey("family_trees.id", ondelete="CASCADE"), nullable=False)
+    format = Column(String(20), nullable=False, default="gedcom")
+    filename = Column(String(255))
+    status = Column(String(20), nullable=False, default="pending")  # "pending", "running", "completed", "failed"
+    total_bytes = Column(Integer, nullable=False, default=0)
+    processed_bytes = Column(Integer, nullable=False, default=0)
+    members_imported = Column(Integer, nullable=False, default=0)
+    members_linked = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class DuplicateScanJob(Base):
+    """Background duplicate-person scan of a family tree."""
+    __tablename__ = "duplicate_scan_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    tree_id = Column(Integer, ForeignKey("family_trees.id", ondelete="CASCADE"), nullable=False, index=True)
+    full = Column(Boolean, nullable=False, default=False)  # False: only members changed since the last scan
+    status = Column(String(20), nullable=False, default="pending")  # "pending", "running", "completed", "failed"
+    members_scanned = Column(Integer, nullable=False, default=0)  # Members whose pairs were (re)scored
+    pairs_compared = Column(Integer, nullable=False, default=0)
+    suggestions_found = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)  # Members updated after this are rescanned next time
+    finished_at = Column(DateTime, nullable=True)
+
+
+class DuplicateSuggestion(Base):
+    """Pair of members of a tree that probably describe the same person."""
+    __tablename__ = "duplicate_suggestions"
+    __table_args__ = (
+        UniqueConstraint("member_id", "duplicate_id", name="uq_duplicate_suggestions_pair"),
+        # Ranked listing per tree
+        Index("idx_duplicate_suggestions_tree_id_score", "tree_id", "score"),
+        Index("idx_duplicate_suggestions_duplicate_id", "duplicate_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tree_id = Column(Integer, ForeignKey("family_trees.id", ondelete="CASCADE"), nullable=False)
+    member_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE"), nullable=False)  # Lower id of the pair
+    duplicate_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)  # 0..1
+    reasons = Column(JSON, nullable=True)  # Fields that matched, e.g. ["first_name", "birth_date"]
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class TreeView(Base):
     __tablename__ = "tree_views"
 
@@ -121,6 +258,7 @@ class FamilyTree(Base):
     description = Column(Text, nullable=True)
     is_default = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    revision = Column(Integer, default=0, nullable=False)  # Bumped on every member change
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -130,6 +268,16 @@ class FamilyTree(Base):
     shares = relationship("TreeShare", back_populates="tree", cascade="all, delete-orphan")
 
 
+class TreeStats(Base):
+    """Materialized statistics of a family tree, as of one tree revision."""
+    __tablename__ = "tree_stats"
+
+    tree_id = Column(Integer, ForeignKey("family_trees.id", ondelete="CASCADE"), primary_key=True)
+    revision = Column(Integer, nullable=False)  # Tree revision the statistics describe
+    stats = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
 class TreeShare(Base):
     __tablename__ = "tree_shares"
 
@@ -155,3 +303,20 @@ class AppConfig(Base):
     value = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RefreshToken(Base):
+    """Issued refresh token; the token itself is never stored, only its hash."""
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Revoking every token of a family on reuse
+        Index("idx_refresh_tokens_family_id", "family_id"),
+    )
+
+    id = Column(String(32), primary_key=True)  # The token's jti
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False)  # jti of the login token the chain of rotations started from
+    token_hash = Column(String(64), nullable=False)  # SHA-256 hex digest
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)  # Set when rotated, reused or signed out
@@ -0,0 +1,117 @@
+"""
+Phonetic keys for genealogical name matching.
+
+Spelling variants of a name (Schmidt, Schmitt, Smith) share a Soundex key,
+so looking members up by key finds them all with a plain B-tree index
+lookup. Keys are stored on family_members (first_name_soundex,
+last_name_soundex), kept current by ORM flush hooks (multi-row inserts
+set them explicitly) and filled in for older rows by
+backfill_phonetic_keys().
+"""
+
+import unicodedata
+from typing import Dict, Optional
+from sqlalchemy import select, update, bindparam, event
+from app.database import async_session_maker
+from app.models import FamilyMember
+
+# Members updated per backfill batch
+BACKFILL_BATCH_SIZE = 5000
+
+_SOUNDEX_DIGITS = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+def soundex(name: Optional[str]) -> Optional[str]:
+    """
+    American Soundex code of a name (e.g. "Schmidt" -> "S530"), or None if
+    it has no letters. Accents are dropped first ("Müller" -> "M460").
+    """
+    if not name:
+        return None
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    letters = [char for char in ascii_name.upper() if "A" <= char <= "Z"]
+    if not letters:
+        return None
+
+    code = letters[0]
+    previous = _SOUNDEX_DIGITS.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_DIGITS.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do
+        if letter not in "HW":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_keys(first_name: Optional[str], last_name: Optional[str]) -> Dict[str, Optional[str]]:
+    """Phonetic key column values for a member's names."""
+    return {
+        "first_name_soundex": soundex(first_name),
+        "last_name_soundex": soundex(last_name),
+    }
+
+
+@event.listens_for(FamilyMember, "before_insert")
+@event.listens_for(FamilyMember, "before_update")
+def _set_phonetic_keys(mapper, connection, member):
+    for column, key in phonetic_keys(member.first_name, member.last_name).items():
+        setattr(member, column, key)
+
+
+async def backfill_phonetic_keys(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Compute phonetic keys for every member, in id order and batches of
+    batch_size (one committed UPDATE per batch). Returns the number of
+    members whose keys changed.
+    """
+    updated = 0
+    after_id = 0
+    async with async_session_maker() as db:
+        while True:
+            result = await db.execute(
+                select(
+                    FamilyMember.id, FamilyMember.first_name, FamilyMember.last_name,
+                    FamilyMember.first_name_soundex, FamilyMember.last_name_soundex
+                )
+                .where(FamilyMember.id > after_id)
+                .order_by(FamilyMember.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            after_id = rows[-1].id
+
+            changes = []
+            for row in rows:
+                keys = phonetic_keys(row.first_name, row.last_name)
+                if (keys["first_name_soundex"], keys["last_name_soundex"]) != (
+                    row.first_name_soundex, row.last_name_soundex
+                ):
+                    changes.append({"member_id": row.id, **keys})
+            if changes:
+                # Core UPDATE (not ORM bulk), so updated_at keeps its value
+                await db.execute(
+                    update(FamilyMember.__table__)
+                    .where(FamilyMember.__table__.c.id == bindparam("member_id"))
+                    .values(
+                        first_name_soundex=bindparam("first_name_soundex"),
+                        last_name_soundex=bindparam("last_name_soundex"),
+                        updated_at=FamilyMember.__table__.c.updated_at
+                    ),
+                    changes
+                )
+                await db.commit()
+                updated += len(changes)
+    return updated
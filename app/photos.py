@@ -0,0 +1,195 @@
+"""Content-addressed storage for member profile pictures.
+
+Pictures are stored once per distinct content in the photo_blobs table, keyed
+by the SHA-256 of their bytes. Members (including copies made by copy_tree)
+only reference a blob through FamilyMember.photo_hash.
+
+Uploads are normalized before storage: EXIF orientation is applied, metadata
+is stripped, and the image is re-encoded as WebP together with small square
+variants (see PHOTO_VARIANT_SIZES). Decoding runs in a process pool so it
+never blocks the event loop.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import FamilyMember, PhotoBlob, PhotoVariant
+
+# Photo URLs are versioned by content hash, so responses can be cached forever.
+# "private" keeps shared proxies from serving one user's photos to another.
+PHOTO_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Square variant edge lengths in px; the tree draws avatars from the smallest
+PHOTO_VARIANT_SIZES = (48, 160)
+PHOTO_MIME_TYPE = "image/webp"
+PHOTO_WEBP_QUALITY = int(os.getenv("PHOTO_WEBP_QUALITY", "85"))
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+
+def photo_url(member_id: int, photo_hash: str, size: Optional[int] = None) -> str:
+    """Hash-versioned URL of a member's picture; safe to cache forever."""
+    url = f"/api/family/members/{member_id}/photo?v={photo_hash}"
+    if size:
+        url += f"&size={size}"
+    return url
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Worker processes for image decoding, created on first use."""
+    global _image_pool
+    if _image_pool is None:
+        # spawn: never fork the server process with its event loop and sockets
+        _image_pool = ProcessPoolExecutor(
+            max_workers=PHOTO_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _image_pool
+
+
+def shutdown_image_pool():
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+def _encode_webp(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=PHOTO_WEBP_QUALITY, exif=b"")
+    return buffer.getvalue()
+
+
+def render_photo_variants(content: bytes) -> Tuple[bytes, Dict[int, bytes]]:
+    """
+    Normalize an image and render its variants (runs in a worker process).
+
+    Returns:
+        tuple: (original re-encoded as WebP, {edge_px: square WebP thumbnail})
+    """
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    original = _encode_webp(image)
+    variants = {
+        size: _encode_webp(ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS))
+        for size in PHOTO_VARIANT_SIZES
+    }
+    return original, variants
+
+
+async def process_photo(content: bytes) -> Tuple[bytes, Dict[int, bytes]]:
+    """Run render_photo_variants in the image pool."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_image_pool(), render_photo_variants, content)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Invalid or unsupported image file")
+
+
+async def store_photo(db: AsyncSession, content: bytes, mime_type: str) -> str:
+    """Store image bytes (deduplicated) and return their content hash."""
+    photo_hash = hashlib.sha256(content).hexdigest()
+    await db.execute(
+        insert(PhotoBlob)
+        .values(sha256=photo_hash, data=content, mime_type=mime_type, size=len(content))
+        .on_conflict_do_nothing(index_elements=[PhotoBlob.sha256])
+    )
+    return photo_hash
+
+
+async def store_photo_variants(db: AsyncSession, photo_hash: str, variants: Dict[int, bytes]):
+    await db.execute(
+        insert(PhotoVariant)
+        .values([
+            {"photo_hash": photo_hash, "size": size, "data": data, "mime_type": PHOTO_MIME_TYPE}
+            for size, data in variants.items()
+        ])
+        .on_conflict_do_nothing(index_elements=[PhotoVariant.photo_hash, PhotoVariant.size])
+    )
+
+
+async def store_processed_photo(db: AsyncSession, content: bytes) -> str:
+    """Normalize an upload off the event loop and store it with its variants."""
+    original, variants = await process_photo(content)
+    photo_hash = await store_photo(db, original, PHOTO_MIME_TYPE)
+    await store_photo_variants(db, photo_hash, variants)
+    return photo_hash
+
+
+async def load_photo(db: AsyncSession, photo_hash: str, size: Optional[int] = None) -> Tuple[bytes, str]:
+    """
+    Load a picture's bytes and MIME type, optionally as a square variant.
+
+    Pictures stored before variants existed get them rendered on first request.
+    """
+    if size:
+        result = await db.execute(
+            select(PhotoVariant.data, PhotoVariant.mime_type).where(
+                PhotoVariant.photo_hash == photo_hash,
+                PhotoVariant.size == size
+            )
+        )
+        row = result.one_or_none()
+        if row:
+            return row.data, row.mime_type
+
+    result = await db.execute(
+        select(PhotoBlob.data, PhotoBlob.mime_type).where(PhotoBlob.sha256 == photo_hash)
+    )
+    data, mime_type = result.one()
+    if not size:
+        return data, mime_type
+
+    try:
+        _, variants = await process_photo(data)
+    except HTTPException:
+        # Undecodable legacy picture: serve it as stored
+        return data, mime_type
+    await store_photo_variants(db, photo_hash, variants)
+    await db.commit()
+    return variants[size], PHOTO_MIME_TYPE
+
+
+async def store_base64_photo(db: AsyncSession, data: str) -> str:
+    """Store a picture submitted as base64 (optionally as a data: URL)."""
+    if data.startswith("data:") and "," in data:
+        data = data.split(",", 1)[1]
+    try:
+        content = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 profile picture data")
+    return await store_processed_photo(db, content)
+
+
+async def release_photos(db: AsyncSession, photo_hashes: Iterable[Optional[str]]):
+    """Delete the given blobs if no member references them any more."""
+    photo_hashes = {h for h in photo_hashes if h}
+    if not photo_hashes:
+        return
+    await db.execute(
+        delete(PhotoBlob).where(
+            PhotoBlob.sha256.in_(photo_hashes),
+            ~exists().where(FamilyMember.photo_hash == PhotoBlob.sha256)
+        )
+    )
+
+
+async def purge_orphaned_photos(db: AsyncSession):
+    """Delete every blob no member references (e.g. after an account is removed)."""
+    await db.execute(
+        delete(PhotoBlob).where(~exists().where(FamilyMember.photo_hash == PhotoBlob.sha256))
+    )
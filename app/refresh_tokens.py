@@ -0,0 +1,190 @@
+"""
+Rotating refresh tokens.
+
+A refresh token is a signed JWT (type "refresh") carrying the access token
+claims plus a jti, which is the id of its refresh_tokens row; the row only
+stores a SHA-256 hash of the token. Renewing revokes the presented token
+and issues a new one of the same family. Presenting a revoked token again
+means it was copied (by a thief or by the client whose token was stolen),
+so the whole family is revoked.
+
+Revoked jtis are kept in an in-memory Bloom filter, rebuilt from the table
+at startup. A negative answer is definite; a positive one is confirmed
+against the table. Each worker only learns of its own revocations, so a
+token revoked elsewhere is caught by the conditional UPDATE of rotation.
+"""
+
+import hashlib
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from jose import JWTError, jwt
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth import SECRET_KEY, ALGORITHM, access_token_claims, token_versions
+from app.database import async_session_maker
+from app.models import User, RefreshToken
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# Revoked tokens the filter is sized for at 1% false positives; beyond that
+# the rate rises (each false positive costs one lookup) until a restart
+REFRESH_REVOCATION_CAPACITY = int(os.getenv("REFRESH_REVOCATION_CAPACITY", "100000"))
+REFRESH_REVOCATION_ERROR_RATE = 0.01
+
+# Claims copied from a refresh token into the access tokens it renews
+_ACCESS_CLAIMS = ("sub", "uid", "adm", "ver")
+
+
+class BloomFilter:
+    """Set of strings with false positives but no false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+_revoked = BloomFilter(REFRESH_REVOCATION_CAPACITY, REFRESH_REVOCATION_ERROR_RATE)
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def rebuild_revocation_filter():
+    """Drop expired tokens and load the revoked ones into a new filter."""
+    global _revoked
+    async with async_session_maker() as db:
+        await db.execute(delete(RefreshToken).where(RefreshToken.expires_at < datetime.utcnow()))
+        result = await db.execute(select(RefreshToken.id).where(RefreshToken.revoked_at.isnot(None)))
+        revoked_ids = result.scalars().all()
+        await db.commit()
+
+    revoked = BloomFilter(max(REFRESH_REVOCATION_CAPACITY, 2 * len(revoked_ids)), REFRESH_REVOCATION_ERROR_RATE)
+    for token_id in revoked_ids:
+        revoked.add(token_id)
+    _revoked = revoked
+
+
+def _issue(db: AsyncSession, claims: dict, family_id: Optional[str] = None) -> str:
+    token_id = uuid.uuid4().hex
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    token = jwt.encode(
+        {**claims, "type": "refresh", "jti": token_id, "exp": expires_at},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    db.add(RefreshToken(
+        id=token_id,
+        user_id=claims["uid"],
+        family_id=family_id or token_id,
+        token_hash=_hash_token(token),
+        expires_at=expires_at
+    ))
+    return token
+
+
+def issue_refresh_token(db: AsyncSession, user: User) -> str:
+    """New refresh token (and family) for user; stored when db commits."""
+    return _issue(db, access_token_claims(user))
+
+
+def _decode(token: str) -> Optional[dict]:
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("type") != "refresh" or not claims.get("jti") or claims.get("uid") is None:
+        return None
+    return claims
+
+
+async def _revoke_family(db: AsyncSession, family_id: str):
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.id)
+    )
+    for token_id in result.scalars().all():
+        _revoked.add(token_id)
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[dict, str]]:
+    """
+    (access token claims, new refresh token) for a valid refresh token, and
+    None for an invalid, expired or revoked one. Commits.
+    """
+    claims = _decode(token)
+    if claims is None:
+        return None
+    # Password changes, deactivation and role changes bump the version
+    if await token_versions.get(claims["uid"], db) != claims.get("ver"):
+        return None
+
+    token_id = claims["jti"]
+    if token_id in _revoked:
+        revoked_at = await db.scalar(select(RefreshToken.revoked_at).where(RefreshToken.id == token_id))
+        if revoked_at is not None:
+            await _revoke_family(db, claims.get("fam") or token_id)
+            await db.commit()
+            return None
+
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.id == token_id,
+            RefreshToken.token_hash == _hash_token(token),
+            RefreshToken.revoked_at.is_(None)
+        )
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.family_id)
+    )
+    family_id = result.scalar_one_or_none()
+    if family_id is None:
+        # Unknown, or revoked through another worker: treat as reuse
+        family_id = await db.scalar(select(RefreshToken.family_id).where(RefreshToken.id == token_id))
+        if family_id is not None:
+            await _revoke_family(db, family_id)
+            await db.commit()
+        return None
+    _revoked.add(token_id)
+
+    access_claims = {name: claims.get(name) for name in _ACCESS_CLAIMS}
+    new_token = _issue(db, {**access_claims, "fam": family_id}, family_id)
+    await db.commit()
+    return access_claims, new_token
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    """Sign out: revoke the family of a refresh token. Commits."""
+    claims = _decode(token)
+    if claims is None:
+        return
+    family_id = await db.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.id == claims["jti"],
+            RefreshToken.token_hash == _hash_token(token)
+        )
+    )
+    if family_id is not None:
+        await _revoke_family(db, family_id)
+        await db.commit()
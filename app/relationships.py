@@ -0,0 +1,328 @@
+"""
+Relationship calculator ("how is A related to B").
+
+A per-tree kinship index (parents, children and partners of every member)
+is built once per tree version and cached. Queries on it:
+
+- Blood relationships come from the closest common ancestors. A family tree
+  is a DAG (two parents, pedigree collapse), not a rooted tree, so instead
+  of a single-parent LCA table both members' ancestries are searched
+  upwards together, generation by generation, stopping as soon as no
+  closer common ancestor is possible. This touches only the ancestors
+  between the two members and their nearest common ancestors.
+- Relationships by marriage come from a bidirectional BFS over parent,
+  child and partner links, which finds the shortest connecting path.
+
+The result names what A is to B ("A is B's second cousin once removed")
+and lists the connecting path.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Number of tree indexes kept in memory
+RELATIONSHIP_CACHE_SIZE = int(os.getenv("RELATIONSHIP_CACHE_SIZE", "64"))
+
+# member id -> (father_id, mother_id, gender)
+MemberRows = Iterable[Tuple[int, Optional[int], Optional[int], Optional[str]]]
+# (member id, how it links to the previous step: "parent", "child", "partner")
+Path = List[Tuple[int, Optional[str]]]
+
+_ORDINALS = [
+    "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+]
+_REMOVALS = {1: "once", 2: "twice", 3: "three times"}
+
+
+class KinshipIndex:
+    """Parent, child and partner links of one tree at one version."""
+
+    def __init__(self, version: Hashable, rows: MemberRows):
+        self.version = version
+        self.parents: Dict[int, Tuple[int, ...]] = {}
+        self.gender: Dict[int, Optional[str]] = {}
+        for member_id, father_id, mother_id, gender in rows:
+            self.parents[member_id] = tuple(
+                parent_id for parent_id in dict.fromkeys((father_id, mother_id))
+                if parent_id is not None and parent_id != member_id
+            )
+            self.gender[member_id] = gender
+
+        self.children: Dict[int, List[int]] = {member_id: [] for member_id in self.parents}
+        self.partners: Dict[int, Set[int]] = {member_id: set() for member_id in self.parents}
+        for member_id, parents in self.parents.items():
+            parents = tuple(p for p in parents if p in self.parents)
+            self.parents[member_id] = parents
+            for parent_id in parents:
+                self.children[parent_id].append(member_id)
+            if len(parents) == 2:
+                # Partners are the parents of a shared child
+                self.partners[parents[0]].add(parents[1])
+                self.partners[parents[1]].add(parents[0])
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.parents
+
+    def common_ancestors(self, a: int, b: int) -> Tuple[Optional[int], List[int], Dict[int, int], Dict[int, int], Dict[int, int], Dict[int, int]]:
+        """
+        Closest common ancestors of a and b (a member counts as its own
+        ancestor at distance 0). Returns (best total distance, ancestors at
+        that distance, distances and BFS predecessors from a and from b).
+        """
+        dist = ({a: 0}, {b: 0})
+        came_from: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        frontier = ([a], [b])
+        level = [0, 0]
+        best: Optional[int] = 0 if a == b else None
+
+        while frontier[0] or frontier[1]:
+            # An ancestor one side has not reached yet is more than that
+            # side's level away; once that exceeds the best total, every
+            # closest common ancestor has been found
+            bound = min(level[side] + 1 for side in (0, 1) if frontier[side])
+            if best is not None and best < bound:
+                break
+            # Expand the side that is fewer generations up
+            side = min((s for s in (0, 1) if frontier[s]), key=lambda s: (level[s], len(frontier[s])))
+            other = 1 - side
+            level[side] += 1
+            next_frontier = []
+            for member_id in frontier[side]:
+                for parent_id in self.parents[member_id]:
+                    if parent_id in dist[side]:
+                        continue
+                    dist[side][parent_id] = level[side]
+                    came_from[side][parent_id] = member_id
+                    next_frontier.append(parent_id)
+                    if parent_id in dist[other]:
+                        total = level[side] + dist[other][parent_id]
+                        if best is None or total < best:
+                            best = total
+            frontier = (next_frontier, frontier[1]) if side == 0 else (frontier[0], next_frontier)
+
+        if best is None:
+            return None, [], dist[0], dist[1], came_from[0], came_from[1]
+        ancestors = sorted(
+            member_id for member_id, distance in dist[0].items()
+            if member_id in dist[1] and distance + dist[1][member_id] == best
+        )
+        return best, ancestors, dist[0], dist[1], came_from[0], came_from[1]
+
+    def _neighbours(self, member_id: int):
+        for parent_id in self.parents[member_id]:
+            yield parent_id, "parent"
+        for child_id in self.children[member_id]:
+            yield child_id, "child"
+        for partner_id in self.partners[member_id]:
+            yield partner_id, "partner"
+
+    def shortest_path(self, a: int, b: int) -> Optional[Path]:
+        """Bidirectional BFS over parent, child and partner links."""
+        if a == b:
+            return [(a, None)]
+        # member -> (previous member, link from previous to member)
+        came_from = ({a: None}, {b: None})
+        frontier = ([a], [b])
+        while frontier[0] and frontier[1]:
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            other = 1 - side
+            next_frontier = []
+            for member_id in frontier[side]:
+                for neighbour_id, link in self._neighbours(member_id):
+                    if neighbour_id in came_from[side]:
+                        continue
+                    came_from[side][neighbour_id] = (member_id, link)
+                    if neighbour_id in came_from[other]:
+                        return self._join_paths(neighbour_id, came_from[0], came_from[1])
+                    next_frontier.append(neighbour_id)
+            frontier = (next_frontier, frontier[1]) if side == 0 else (frontier[0], next_frontier)
+        return None
+
+    @staticmethod
+    def _join_paths(meeting: int, from_a: dict, from_b: dict) -> Path:
+        forward: Path = []
+        member_id, step = meeting, from_a[meeting]
+        while step is not None:
+            forward.append((member_id, step[1]))
+            member_id, step = step[0], from_a[step[0]]
+        forward.append((member_id, None))
+        forward.reverse()
+
+        # Walking back towards b, each link is seen from the other side
+        inverse = {"parent": "child", "child": "parent", "partner": "partner"}
+        member_id, step = meeting, from_b[meeting]
+        while step is not None:
+            forward.append((step[0], inverse[step[1]]))
+            member_id, step = step[0], from_b[step[0]]
+        return forward
+
+
+def _gendered(gender: Optional[str], male: str, female: str, neutral: str) -> str:
+    if gender == "Male":
+        return male
+    if gender == "Female":
+        return female
+    return neutral
+
+
+def _greats(count: int) -> str:
+    if count <= 0:
+        return ""
+    if count <= 2:
+        return "great-" * count
+    return f"{count}x great-"
+
+
+def kinship_name(up_a: int, up_b: int, gender: Optional[str], half: bool = False) -> str:
+    """
+    Name of what A is to B, where A is up_a generations and B up_b
+    generations below their closest common ancestor.
+    """
+    if up_a == 0 and up_b == 0:
+        return "self"
+    if up_a == 0:
+        base = _gendered(gender, "father", "mother", "parent")
+        if up_b == 1:
+            return base
+        return _greats(up_b - 2) + "grand" + base
+    if up_b == 0:
+        base = _gendered(gender, "son", "daughter", "child")
+        if up_a == 1:
+            return base
+        return _greats(up_a - 2) + "grand" + base
+
+    prefix = "half-" if half else ""
+    if up_a == 1 and up_b == 1:
+        return prefix + _gendered(gender, "brother", "sister", "sibling")
+    if up_a == 1:
+        return _greats(up_b - 2) + prefix + _gendered(gender, "uncle", "aunt", "aunt/uncle")
+    if up_b == 1:
+        return _greats(up_a - 2) + prefix + _gendered(gender, "nephew", "niece", "niece/nephew")
+
+    degree = min(up_a, up_b) - 1
+    removed = abs(up_a - up_b)
+    ordinal = _ORDINALS[degree - 1] if degree <= len(_ORDINALS) else f"{degree}th"
+    name = f"{ordinal} {prefix}cousin"
+    if removed:
+        name += f" {_REMOVALS.get(removed, f'{removed} times')} removed"
+    return name
+
+
+def _blood_path(ancestor: int, from_a: Dict[int, int], from_b: Dict[int, int], a: int, b: int) -> Path:
+    """a up to the common ancestor, then down to b."""
+    up = [ancestor]
+    while up[-1] != a:
+        up.append(from_a[up[-1]])
+    up.reverse()
+    path: Path = [(up[0], None)] + [(member_id, "parent") for member_id in up[1:]]
+    member_id = ancestor
+    while member_id != b:
+        member_id = from_b[member_id]
+        path.append((member_id, "child"))
+    return path
+
+
+def _other_parents_differ(index: KinshipIndex, ancestor: int, child_a: int, child_b: int) -> bool:
+    """
+    Whether two children of ancestor have known, different other parents.
+    With an unknown other parent they may still be full siblings.
+    """
+    others = []
+    for child in (child_a, child_b):
+        other = [parent_id for parent_id in index.parents[child] if parent_id != ancestor]
+        if not other:
+            return False
+        others.append(other[0])
+    return others[0] != others[1]
+
+
+def find_relationship(index: KinshipIndex, a: int, b: int) -> Optional[dict]:
+    """
+    Relationship of a to b: {"relationship", "blood", "common_ancestors",
+    "path"}, or None if the two are not connected at all.
+    """
+    best, ancestors, dist_a, dist_b, from_a, from_b = index.common_ancestors(a, b)
+    if best is not None:
+        ancestor = ancestors[0]
+        up_a, up_b = dist_a[ancestor], dist_b[ancestor]
+        # Full siblings/cousins share two closest ancestors (a couple)
+        half = up_a > 0 and up_b > 0 and len(ancestors) == 1 and _other_parents_differ(
+            index, ancestor, from_a[ancestor], from_b[ancestor]
+        )
+        return {
+            "relationship": kinship_name(up_a, up_b, index.gender.get(a), half),
+            "blood": True,
+            "common_ancestors": ancestors,
+            "path": _blood_path(ancestor, from_a, from_b, a, b),
+        }
+
+    path = index.shortest_path(a, b)
+    if path is None:
+        return None
+    return {
+        "relationship": _marriage_name(index, path),
+        "blood": False,
+        "common_ancestors": [],
+        "path": path,
+    }
+
+
+def _marriage_name(index: KinshipIndex, path: Path) -> str:
+    """Name an in-law path, which has at least one partner link."""
+    partner_steps = [i for i, (_, link) in enumerate(path) if link == "partner"]
+    a, b = path[0][0], path[-1][0]
+    gender = index.gender.get(a)
+    if len(partner_steps) != 1:
+        return "relative by marriage"
+    step = partner_steps[0]
+    before, after = path[step - 1][0], path[step][0]
+
+    if len(path) == 2:
+        return _gendered(gender, "husband", "wife", "partner")
+    if before == a:
+        # a is the partner of one of b's blood relatives
+        best, ancestors, dist_a, dist_b, _, _ = index.common_ancestors(after, b)
+        if best is not None:
+            ancestor = ancestors[0]
+            relation = kinship_name(dist_a[ancestor], dist_b[ancestor], index.gender.get(after))
+            if dist_b[ancestor] == 0 and dist_a[ancestor] == 1:
+                return _gendered(gender, "son-in-law", "daughter-in-law", "child-in-law")
+            if dist_a[ancestor] == 1 and dist_b[ancestor] == 1:
+                return _gendered(gender, "brother-in-law", "sister-in-law", "sibling-in-law")
+            if dist_a[ancestor] == 0 and dist_b[ancestor] == 1:
+                return _gendered(gender, "stepfather", "stepmother", "stepparent")
+            return f"partner of {relation}"
+    if after == b:
+        # a is a blood relative of b's partner
+        best, ancestors, dist_a, dist_b, _, _ = index.common_ancestors(a, before)
+        if best is not None:
+            ancestor = ancestors[0]
+            relation = kinship_name(dist_a[ancestor], dist_b[ancestor], gender)
+            if dist_a[ancestor] == 0 and dist_b[ancestor] == 1:
+                return _gendered(gender, "father-in-law", "mother-in-law", "parent-in-law")
+            if dist_a[ancestor] == 1 and dist_b[ancestor] == 1:
+                return _gendered(gender, "brother-in-law", "sister-in-law", "sibling-in-law")
+            if dist_a[ancestor] == 1 and dist_b[ancestor] == 0:
+                return _gendered(gender, "stepson", "stepdaughter", "stepchild")
+            return f"{relation} of partner"
+    return "relative by marriage"
+
+
+_index_cache: "OrderedDict[Hashable, KinshipIndex]" = OrderedDict()
+
+
+def get_kinship_index(cache_key: Hashable, version: Hashable) -> Optional[KinshipIndex]:
+    """Cached index for a tree at this version, or None if it must be rebuilt."""
+    index = _index_cache.get(cache_key)
+    if index is None or index.version != version:
+        return None
+    _index_cache.move_to_end(cache_key)
+    return index
+
+
+def store_kinship_index(cache_key: Hashable, index: KinshipIndex):
+    _index_cache[cache_key] = index
+    _index_cache.move_to_end(cache_key)
+    while len(_index_cache) > RELATIONSHIP_CACHE_SIZE:
+        _index_cache.popitem(last=False)
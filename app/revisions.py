@@ -0,0 +1,163 @@
+"""Tree revision counters used to version cached and derived tree data.
+
+Every write that changes a tree's members bumps FamilyTree.revision, so any
+data computed from a tree (layouts, cached responses, ETags) can be keyed by
+the revision instead of being compared against the members themselves.
+
+Changed members are stamped with the new revision and removed members leave
+a tombstone, which lets the change feed return only what changed since a
+revision.
+
+The ETag helpers let GET endpoints answer If-None-Match with 304 Not
+Modified, so clients that revalidate do not download unchanged data again.
+"""
+
+import hashlib
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import FamilyMember, FamilyTree, MemberTombstone
+
+
+async def bump_tree_revision(db: AsyncSession, *tree_ids: Optional[int]):
+    """Increment the revision of each given tree (None entries are ignored)."""
+    tree_ids = {tree_id for tree_id in tree_ids if tree_id is not None}
+    if not tree_ids:
+        return
+    await db.execute(
+        update(FamilyTree)
+        .where(FamilyTree.id.in_(tree_ids))
+        .values(revision=FamilyTree.revision + 1)
+    )
+
+
+async def stamp_members(db: AsyncSession, member_ids: Iterable[Optional[int]]):
+    """
+    Mark members as changed at their tree's current revision. Call after
+    bump_tree_revision, for the written members and for every parent whose
+    children changed.
+    """
+    member_ids = {member_id for member_id in member_ids if member_id is not None}
+    if not member_ids:
+        return
+    await db.execute(
+        update(FamilyMember)
+        .where(FamilyMember.id.in_(member_ids), FamilyMember.tree_id == FamilyTree.id)
+        # Keep updated_at: touched parents were not edited themselves
+        .values(revision=FamilyTree.revision, updated_at=FamilyMember.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_children(db: AsyncSession, member_ids: Iterable[int]) -> List[Tuple[int, Optional[int]]]:
+    """
+    (member_id, tree_id) of the children of members. Deleting or moving a
+    parent changes its children's nodes, so they need stamping as well.
+    """
+    member_ids = set(member_ids)
+    if not member_ids:
+        return []
+    result = await db.execute(
+        select(FamilyMember.id, FamilyMember.tree_id).where(
+            FamilyMember.father_id.in_(member_ids) | FamilyMember.mother_id.in_(member_ids)
+        )
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def add_tombstones(db: AsyncSession, removed: Iterable[Tuple[Optional[int], int]]):
+    """
+    Record that members left trees (deleted or moved), given as
+    (tree_id, member_id) pairs, at each tree's current revision.
+    """
+    removed = [(tree_id, member_id) for tree_id, member_id in removed if tree_id is not None]
+    if not removed:
+        return
+    result = await db.execute(
+        select(FamilyTree.id, FamilyTree.revision)
+        .where(FamilyTree.id.in_({tree_id for tree_id, _ in removed}))
+    )
+    revisions = dict(result.all())
+    await db.execute(
+        insert(MemberTombstone),
+        [
+            {"tree_id": tree_id, "member_id": member_id, "revision": revisions[tree_id]}
+            for tree_id, member_id in removed if tree_id in revisions
+        ]
+    )
+
+
+async def get_tree_revision(db: AsyncSession, tree_id: int) -> int:
+    result = await db.execute(
+        select(FamilyTree.revision).where(FamilyTree.id == tree_id)
+    )
+    return result.scalar() or 0
+
+
+def tree_version(tree_id: int, revision: int) -> str:
+    return f"t{tree_id}.r{revision}"
+
+
+async def get_tree_version(db: AsyncSession, user_id: int, tree_id: Optional[int] = None) -> str:
+    """
+    Cheap version token for the members a tree request would return.
+
+    For a single tree this is its revision. Requests spanning all of a user's
+    members combine the revisions of their trees with the member count and
+    latest update, which also covers members not assigned to any tree.
+    """
+    if tree_id:
+        return tree_version(tree_id, await get_tree_revision(db, tree_id))
+
+    result = await db.execute(
+        select(func.coalesce(func.sum(FamilyTree.revision), 0)).where(FamilyTree.user_id == user_id)
+    )
+    revision_sum = result.scalar()
+    result = await db.execute(
+        select(func.count(FamilyMember.id), func.max(FamilyMember.updated_at))
+        .where(FamilyMember.user_id == user_id)
+    )
+    member_count, last_update = result.one()
+    last_update = last_update.timestamp() if last_update else 0
+    return f"u{user_id}.r{revision_sum}.n{member_count}.{last_update}"
+
+
+# Responses are per user and must be revalidated before each reuse
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag derived from version parts (user, tree version, variant)."""
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def content_etag(content: Any) -> str:
+    """Strong ETag of a response body, for small lists without a revision."""
+    body = json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":"))
+    return make_etag(body)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response repeating the validator and caching policy."""
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    )
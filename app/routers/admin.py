@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, BackgroundTasks
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text
@@ -14,17 +14,21 @@ from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
-from app.database import get_db
+from app.database import get_db, async_session_maker
 from app.models import User, SystemLog, Backup, FamilyMember, TreeView, FamilyTree, TreeShare, AppConfig
 from app.schemas import (
     AdminUserCreate, AdminUserUpdate, AdminUserResponse,
     SystemLogResponse, BackupCreate, BackupResponse,
-    DashboardStats, AdminSetup
+    DashboardStats, AdminSetup, CacheStats, HashStats
 )
 from app.auth import (
-    get_current_admin_user, get_password_hash, check_first_run
+    get_current_admin_user, get_password_hash_async, check_first_run, password_hasher,
+    invalidate_principal, revoke_tokens, token_versions, Principal
 )
 from app.config import backup_settings
+from app.photos import purge_orphaned_photos
+from app.tree_cache import tree_response_cache
+from app.phonetic import backfill_phonetic_keys
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -131,7 +135,7 @@ async def setup_admin(
         db.add(app_config)
 
     # Create admin user
-    hashed_password = get_password_hash(admin_data.password)
+    hashed_password = await get_password_hash_async(admin_data.password)
     new_admin = User(
         username=admin_data.username,
         email=admin_data.email,
@@ -158,7 +162,7 @@ async def setup_admin(
 # Dashboard Stats
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get dashboard statistics"""
@@ -262,12 +266,48 @@ async def get_dashboard_stats(
     )
 
 
+@router.get("/cache-stats", response_model=CacheStats)
+async def get_cache_stats(
+    current_admin: Principal = Depends(get_current_admin_user)
+):
+    """Get hit/miss/eviction counters of the tree response cache (this worker)"""
+    return CacheStats(**tree_response_cache.stats())
+
+
+@router.get("/hash-stats", response_model=HashStats)
+async def get_hash_stats(
+    current_admin: Principal = Depends(get_current_admin_user)
+):
+    """Get queue depth and latency of the password hashing pool (this worker)"""
+    return HashStats(**password_hasher.stats())
+
+
+async def _run_phonetic_backfill(admin_id: int):
+    updated = await backfill_phonetic_keys()
+    async with async_session_maker() as db:
+        await log_action(
+            db, "INFO", f"Phonetic name keys backfilled for {updated} members",
+            user_id=admin_id, action="phonetic_backfill",
+            details={"updated": updated}
+        )
+
+
+@router.post("/phonetic-backfill", status_code=status.HTTP_202_ACCEPTED)
+async def start_phonetic_backfill(
+    background_tasks: BackgroundTasks,
+    current_admin: Principal = Depends(get_current_admin_user)
+):
+    """Compute phonetic name keys of existing members in the background (logged when done)"""
+    background_tasks.add_task(_run_phonetic_backfill, current_admin.id)
+    return {"message": "Phonetic key backfill started"}
+
+
 # User Management
 @router.get("/users", response_model=List[AdminUserResponse])
 async def list_users(
     skip: int = 0,
     limit: int = 100,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """List all users"""
@@ -282,7 +322,7 @@ async def list_users(
 async def create_user(
     user_data: AdminUserCreate,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new user"""
@@ -302,7 +342,7 @@ async def create_user(
             detail="Email already registered"
         )
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -332,7 +372,7 @@ async def update_user(
     user_id: int,
     user_data: AdminUserUpdate,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user details"""
@@ -365,6 +405,11 @@ async def update_user(
             )
         user.email = user_data.email
 
+    # Tokens carry the admin flag and are only issued to active users
+    if (user_data.is_admin is not None and user_data.is_admin != user.is_admin) or \
+            (user_data.is_active is False and user.is_active):
+        revoke_tokens(user)
+
     if user_data.is_admin is not None:
         user.is_admin = user_data.is_admin
 
@@ -377,6 +422,8 @@ async def update_user(
     user.updated_at = datetime.utcnow()
     await db.commit()
     await db.refresh(user)
+    invalidate_principal(user.username)
+    token_versions.set(user.id, user.token_version)
 
     # Log the action
     await log_action(
@@ -393,7 +440,7 @@ async def update_user(
 async def delete_user(
     user_id: int,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a user"""
@@ -414,7 +461,11 @@ async def delete_user(
 
     username = user.username
     await db.delete(user)
+    await db.flush()
+    await purge_orphaned_photos(db)
     await db.commit()
+    invalidate_principal(username)
+    token_versions.forget(user_id)
 
     # Log the action
     await log_action(
@@ -433,7 +484,7 @@ async def get_logs(
     skip: int = 0,
     limit: int = 100,
     level: str = None,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get system logs"""
@@ -452,7 +503,7 @@ async def get_logs(
 # Backups
 @router.get("/backups", response_model=List[BackupResponse])
 async def list_backups(
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """List all backups"""
@@ -465,7 +516,7 @@ async def list_backups(
 
 @router.get("/backup-config")
 async def get_backup_config(
-    current_admin: User = Depends(get_current_admin_user)
+    current_admin: Principal = Depends(get_current_admin_user)
 ):
     """Get backup configuration status including enabled destinations"""
     return {
@@ -497,7 +548,7 @@ async def get_backup_config(
 async def update_backup_config(
     config: dict,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update backup configuration and write to .env file"""
@@ -757,7 +808,7 @@ def create_config_backup(filepath: str) -> dict:
 async def create_backup(
     backup_data: BackupCreate,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new backup to local disk and configured file shares"""
@@ -891,7 +942,7 @@ async def create_backup(
 async def download_backup(
     backup_id: int,
     password: Optional[str] = None,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Download a backup file, optionally encrypted with password."""
@@ -957,7 +1008,7 @@ async def restore_backup(
     password: Optional[str] = None,
     create_snapshot: bool = True,
     request: Request = None,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Restore database from uploaded backup file with automatic snapshot creation."""
@@ -1116,7 +1167,7 @@ async def restore_backup(
 
 @router.get("/system-info")
 async def get_system_info(
-    current_admin: User = Depends(get_current_admin_user)
+    current_admin: Principal = Depends(get_current_admin_user)
 ):
     """Get system information"""
     try:
@@ -1142,7 +1193,7 @@ async def get_system_info(
 
 @router.get("/version")
 async def get_version(
-    current_admin: User = Depends(get_current_admin_user)
+    current_admin: Principal = Depends(get_current_admin_user)
 ):
     """Get current application version and check for updates."""
     try:
@@ -1184,7 +1235,7 @@ async def get_version(
 
 @router.get("/releases")
 async def get_all_releases(
-    current_admin: User = Depends(get_current_admin_user)
+    current_admin: Principal = Depends(get_current_admin_user)
 ):
     """Get all available releases from GitHub."""
     try:
@@ -1234,7 +1285,7 @@ async def get_all_releases(
 async def trigger_update(
     update_request: UpdateRequest,
     request: Request,
-    current_admin: User = Depends(get_current_admin_user),
+    current_admin: Principal = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -1504,7 +1555,7 @@ fi
 
 @router.get("/update-status")
 async def get_update_status(
-    current_admin: User = Depends(get_current_admin_user)
+    current_admin: Principal = Depends(get_current_admin_user)
 ):
     """Get the status of the last update operation."""
     try:
@@ -3,8 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserLogin, UserResponse, Token
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.schemas import UserCreate, UserLogin, UserResponse, Token, RefreshTokenRequest
+from app.auth import (
+    get_password_hash_async, verify_password_async, create_access_token, access_token_claims,
+    get_current_user_record, invalidate_principal, revoke_tokens, token_versions,
+    ACCESS_TOKEN_EXPIRE_MINUTES
+)
+from app.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from app.photos import purge_orphaned_photos
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -28,7 +34,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -47,7 +53,7 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == user_data.username))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -64,22 +70,55 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     # Update last login time
     from datetime import datetime
     user.last_login = datetime.utcnow()
+    refresh_token = issue_refresh_token(db, user)
     await db.commit()
 
     # Create access token
-    access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    token_versions.set(user.id, user.token_version)
+    access_token = create_access_token(data=access_token_claims(user))
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request_data: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token"""
+    rotated = await rotate_refresh_token(db, request_data.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    claims, refresh_token = rotated
+    return {
+        "access_token": create_access_token(data=claims),
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
+@router.post("/logout")
+async def logout(request_data: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """Revoke a refresh token and every token rotated from the same login"""
+    await revoke_refresh_token(db, request_data.refresh_token)
+    return {"message": "Logged out successfully"}
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_record)):
     return current_user
 
 
 @router.put("/update-email")
 async def update_email(
     new_email: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: AsyncSession = Depends(get_db)
 ):
     # Check if email already exists
@@ -93,6 +132,7 @@ async def update_email(
 
     current_user.email = new_email
     await db.commit()
+    invalidate_principal(current_user.username)
     return {"message": "Email updated successfully"}
 
 
@@ -100,36 +140,52 @@ async def update_email(
 async def update_password(
     current_password: str,
     new_password: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: AsyncSession = Depends(get_db)
 ):
     # Verify current password
-    if not verify_password(current_password, current_user.hashed_password):
+    if not await verify_password_async(current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
 
     # Update password
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = await get_password_hash_async(new_password)
+    # Sign out every other session; this one continues with a new token
+    revoke_tokens(current_user)
+    refresh_token = issue_refresh_token(db, current_user)
     await db.commit()
-    return {"message": "Password updated successfully"}
+    invalidate_principal(current_user.username)
+    token_versions.set(current_user.id, current_user.token_version)
+    return {
+        "message": "Password updated successfully",
+        "access_token": create_access_token(data=access_token_claims(current_user)),
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
 
 
 @router.delete("/delete-account")
 async def delete_account(
     password: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: AsyncSession = Depends(get_db)
 ):
     # Verify password before deletion
-    if not verify_password(password, current_user.hashed_password):
+    if not await verify_password_async(password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password is incorrect"
         )
 
     # Delete user (cascade will handle family members)
+    username, user_id = current_user.username, current_user.id
     await db.delete(current_user)
+    await db.flush()
+    await purge_orphaned_photos(db)
     await db.commit()
+    invalidate_principal(username)
+    token_versions.forget(user_id)
     return {"message": "Account deleted successfully"}
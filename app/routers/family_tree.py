@@ -1,23 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, insert, func, literal, or_, any_, Integer, ColumnElement
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import aliased
+from typing import List, Dict, Optional, Union, AsyncIterator
+from pydantic import TypeAdapter
 import os
 import uuid
 import base64
 from pathlib import Path
-from app.database import get_db
-from app.models import User, FamilyMember
-from app.schemas import FamilyMemberCreate, FamilyMemberUpdate, FamilyMemberResponse, FamilyTreeNode
-from app.auth import get_current_user
+from app.database import get_db, async_session_maker
+from app.models import FamilyMember, FamilyTree, PhotoBlob, MemberTombstone
+from app.schemas import (
+    FamilyMemberCreate, FamilyMemberUpdate, FamilyMemberResponse,
+    FamilyMemberBulkCreate, FamilyMemberBulkUpdate,
+    FamilyTreeNode, FamilyTreeNodeLean, PhotoRef, NodePosition, RelativeNode, TreeChanges,
+    Relationship, RelationshipStep, MemberSearchResult
+)
+from app.auth import get_current_user, Principal
+from app.layout import get_tree_layout, compute_layout
+from app.search import prefix_tsquery, member_search_query, phonetic_keys_of_query, member_phonetic_query
+from app.phonetic import phonetic_keys
+from app.relationships import KinshipIndex, get_kinship_index, store_kinship_index, find_relationship
+from app.revisions import (
+    bump_tree_revision, stamp_members, add_tombstones, get_children, get_tree_revision, get_tree_version,
+    tree_version, make_etag, etag_matches, not_modified, REVALIDATE_CACHE_CONTROL
+)
+from app.tree_cache import tree_response_cache, invalidate_tree_responses
+from app.photos import (
+    PHOTO_CACHE_CONTROL, PHOTO_MIME_TYPE, PHOTO_VARIANT_SIZES, photo_url,
+    load_photo, store_processed_photo, store_base64_photo, release_photos
+)
 
 router = APIRouter(prefix="/api/family", tags=["Family Tree"])
 
+# Write-only schema fields that are stored as a photo blob rather than a column
+PHOTO_INPUT_FIELDS = {"profile_picture_data", "profile_picture_mime_type"}
+
+# Client-side reference fields of bulk creates, resolved to ids before insert
+BULK_REF_FIELDS = {"temp_id", "father_ref", "mother_ref"}
+
+# Upper bound on members per bulk create/update request
+MAX_BULK_MEMBERS = 1000
+
+# Upper bound on ancestor/descendant depth, which bounds the recursive queries
+MAX_LINEAGE_DEPTH = 50
+# Default generations above and below the member of a focused tree request
+FOCUS_GENERATIONS = 2
+
+# Serializers for cached tree response bodies
+TREE_NODES_ADAPTER = TypeAdapter(List[FamilyTreeNode])
+LEAN_TREE_NODES_ADAPTER = TypeAdapter(List[FamilyTreeNodeLean])
+
+# Rows fetched per round trip when streaming a tree as NDJSON
+TREE_STREAM_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Member listing page size (default once paging, and upper bound)
+MEMBER_PAGE_SIZE = 100
+MAX_MEMBER_PAGE_SIZE = 1000
+
+# Member search page size (default and upper bound)
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# Columns the member listing can project with ?fields=
+MEMBER_LIST_FIELDS = [
+    name for name in FamilyMemberResponse.model_fields if name not in PHOTO_INPUT_FIELDS
+]
+
 
 @router.post("/members", response_model=FamilyMemberResponse, status_code=status.HTTP_201_CREATED)
 async def create_family_member(
     member_data: FamilyMemberCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     # Validate parent IDs if provided
@@ -43,31 +100,362 @@ async def create_family_member(
 
     new_member = FamilyMember(
         user_id=current_user.id,
-        **member_data.model_dump()
+        **member_data.model_dump(exclude=PHOTO_INPUT_FIELDS)
     )
+    if member_data.profile_picture_data:
+        new_member.photo_hash = await store_base64_photo(db, member_data.profile_picture_data)
     db.add(new_member)
+    await db.flush()
+    await bump_tree_revision(db, new_member.tree_id)
+    await stamp_members(db, [new_member.id, new_member.father_id, new_member.mother_id])
     await db.commit()
+    invalidate_tree_responses(current_user.id, new_member.tree_id)
     await db.refresh(new_member)
 
     return new_member
 
 
-@router.get("/members", response_model=List[FamilyMemberResponse])
-async def get_all_family_members(
-    current_user: User = Depends(get_current_user),
+def _check_bulk_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="No members given")
+    if len(items) > MAX_BULK_MEMBERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_MEMBERS} members can be sent per request"
+        )
+
+
+async def _validate_references(db: AsyncSession, user_id: int, parent_ids, tree_ids):
+    """Check with one IN query each that referenced parents and trees belong to the user."""
+    parent_ids = {parent_id for parent_id in parent_ids if parent_id is not None}
+    if parent_ids:
+        result = await db.execute(
+            select(FamilyMember.id).where(
+                FamilyMember.id.in_(parent_ids),
+                FamilyMember.user_id == user_id
+            )
+        )
+        missing = parent_ids - set(result.scalars().all())
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Parent(s) not found: {', '.join(map(str, sorted(missing)))}"
+            )
+
+    tree_ids = {tree_id for tree_id in tree_ids if tree_id is not None}
+    if tree_ids:
+        result = await db.execute(
+            select(FamilyTree.id).where(
+                FamilyTree.id.in_(tree_ids),
+                FamilyTree.user_id == user_id
+            )
+        )
+        missing = tree_ids - set(result.scalars().all())
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Tree(s) not found: {', '.join(map(str, sorted(missing)))}"
+            )
+
+
+@router.post(
+    "/members/bulk",
+    response_model=List[FamilyMemberResponse],
+    status_code=status.HTTP_201_CREATED
+)
+async def bulk_create_family_members(
+    members_data: List[FamilyMemberBulkCreate],
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """
+    Create many members in one transaction. Members can reference parents
+    created in the same batch by setting temp_id on the parent and
+    father_ref/mother_ref on the child. Returns the members in request order.
+    """
+    _check_bulk_size(members_data)
+
+    batch_index = {}
+    for index, item in enumerate(members_data):
+        if item.temp_id is not None:
+            if item.temp_id in batch_index:
+                raise HTTPException(status_code=400, detail=f"Duplicate temp_id: {item.temp_id}")
+            batch_index[item.temp_id] = index
+
+    for item in members_data:
+        for ref, parent_id in ((item.father_ref, item.father_id), (item.mother_ref, item.mother_id)):
+            if ref is None:
+                continue
+            if parent_id is not None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Give either a parent id or a temp_id reference, not both"
+                )
+            if ref not in batch_index:
+                raise HTTPException(status_code=400, detail=f"Unknown temp_id reference: {ref}")
+            if ref == item.temp_id:
+                raise HTTPException(status_code=400, detail="A member cannot be its own parent")
+
+    await _validate_references(
+        db,
+        current_user.id,
+        [parent_id for item in members_data for parent_id in (item.father_id, item.mother_id)],
+        [item.tree_id for item in members_data]
+    )
+
+    # Reserve every id up front, so references inside the batch can be
+    # filled in and the whole batch goes out as one multi-row INSERT
     result = await db.execute(
-        select(FamilyMember).where(FamilyMember.user_id == current_user.id)
+        select(func.nextval(func.pg_get_serial_sequence(FamilyMember.__tablename__, "id")))
+        .select_from(func.generate_series(1, len(members_data)))
     )
-    members = result.scalars().all()
+    new_ids = result.scalars().all()
+
+    rows = []
+    for new_id, item in zip(new_ids, members_data):
+        row = item.model_dump(exclude=PHOTO_INPUT_FIELDS | BULK_REF_FIELDS)
+        row["id"] = new_id
+        row["user_id"] = current_user.id
+        # Multi-row inserts skip ORM flush hooks, which set these otherwise
+        row.update(phonetic_keys(item.first_name, item.last_name))
+        if item.father_ref is not None:
+            row["father_id"] = new_ids[batch_index[item.father_ref]]
+        if item.mother_ref is not None:
+            row["mother_id"] = new_ids[batch_index[item.mother_ref]]
+        row["photo_hash"] = (
+            await store_base64_photo(db, item.profile_picture_data)
+            if item.profile_picture_data else None
+        )
+        rows.append(row)
+
+    result = await db.execute(
+        insert(FamilyMember).returning(FamilyMember, sort_by_parameter_order=True),
+        rows
+    )
+    new_members = result.scalars().all()
+
+    tree_ids = {member.tree_id for member in new_members}
+    await bump_tree_revision(db, *tree_ids)
+    await stamp_members(
+        db,
+        [member_id for member in new_members for member_id in (member.id, member.father_id, member.mother_id)]
+    )
+    await db.commit()
+    invalidate_tree_responses(current_user.id, *tree_ids)
+
+    return new_members
+
+
+@router.patch("/members/bulk", response_model=List[FamilyMemberResponse])
+async def bulk_update_family_members(
+    members_data: List[FamilyMemberBulkUpdate],
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Update many members in one transaction. Only the fields given for a
+    member are changed. Returns the members in request order.
+    """
+    _check_bulk_size(members_data)
+    member_ids = [item.id for item in members_data]
+    if len(set(member_ids)) != len(member_ids):
+        raise HTTPException(status_code=400, detail="Each member can only be updated once per request")
+
+    result = await db.execute(
+        select(FamilyMember).where(
+            FamilyMember.id.in_(member_ids),
+            FamilyMember.user_id == current_user.id
+        )
+    )
+    members = {member.id: member for member in result.scalars().all()}
+    missing = set(member_ids) - set(members)
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Family member(s) not found: {', '.join(map(str, sorted(missing)))}"
+        )
+
+    updates = [
+        (members[item.id], item, item.model_dump(exclude_unset=True, exclude=PHOTO_INPUT_FIELDS | {"id"}))
+        for item in members_data
+    ]
+    # Members of this batch are already known to be the user's
+    await _validate_references(
+        db,
+        current_user.id,
+        [
+            update_data.get(field)
+            for _, _, update_data in updates
+            for field in ("father_id", "mother_id")
+            if update_data.get(field) not in members
+        ],
+        [update_data.get("tree_id") for _, _, update_data in updates]
+    )
+
+    tree_ids = set()
+    touched_ids = set()
+    moved = []
+    old_photo_hashes = []
+    for member, item, update_data in updates:
+        old_tree_id = member.tree_id
+        touched_ids.update((member.id, member.father_id, member.mother_id))
+        for field, value in update_data.items():
+            setattr(member, field, value)
+
+        if item.profile_picture_data:
+            old_photo_hashes.append(member.photo_hash)
+            member.photo_hash = await store_base64_photo(db, item.profile_picture_data)
+
+        touched_ids.update((member.father_id, member.mother_id))
+        tree_ids.update((old_tree_id, member.tree_id))
+        if old_tree_id != member.tree_id:
+            moved.append((old_tree_id, member.id))
+
+    # Children stay behind when a parent moves to another tree
+    children = await get_children(db, [member_id for _, member_id in moved])
+    tree_ids.update(tree_id for _, tree_id in children)
+    touched_ids.update(child_id for child_id, _ in children)
+
+    await db.flush()
+    await release_photos(db, old_photo_hashes)
+    await bump_tree_revision(db, *tree_ids)
+    await add_tombstones(db, moved)
+    await stamp_members(db, touched_ids)
+    await db.commit()
+    invalidate_tree_responses(current_user.id, *tree_ids)
+
+    result = await db.execute(
+        select(FamilyMember)
+        .where(FamilyMember.id.in_(member_ids))
+        .execution_options(populate_existing=True)
+    )
+    members = {member.id: member for member in result.scalars().all()}
+    return [members[member_id] for member_id in member_ids]
+
+
+def _parse_member_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated ?fields= list; id is always included."""
+    if not fields:
+        return MEMBER_LIST_FIELDS
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(MEMBER_LIST_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}"
+        )
+    return ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+
+
+@router.get(
+    "/members",
+    response_model=None,
+    responses={200: {"model": List[FamilyMemberResponse]}}
+)
+async def get_all_family_members(
+    response: Response,
+    tree_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_MEMBER_PAGE_SIZE),
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Members in id order. Without after_id or limit every member is returned,
+    as before paging existed. With either, pages of limit members (default
+    MEMBER_PAGE_SIZE) are returned: pass the X-Next-After-Id response header
+    back as after_id to fetch the next page; it is absent on the last page.
+    fields= limits the columns selected, e.g. fields=first_name,last_name.
+    """
+    columns = _parse_member_fields(fields)
+    query = select(*(getattr(FamilyMember, name) for name in columns)).where(
+        FamilyMember.user_id == current_user.id
+    )
+    if tree_id is not None:
+        query = query.where(FamilyMember.tree_id == tree_id)
+    query = query.order_by(FamilyMember.id)
+    if after_id is None and limit is None:
+        result = await db.execute(query)
+        return [dict(row._mapping) for row in result.all()]
+
+    if after_id is not None:
+        query = query.where(FamilyMember.id > after_id)
+    limit = limit or MEMBER_PAGE_SIZE
+    result = await db.execute(query.limit(limit))
+    members = [dict(row._mapping) for row in result.all()]
+
+    if len(members) == limit:
+        response.headers["X-Next-After-Id"] = str(members[-1]["id"])
     return members
 
 
+@router.get("/search", response_model=List[MemberSearchResult])
+async def search_family_members(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    tree_id: Optional[int] = None,
+    mode: str = Query("text", pattern="^(text|phonetic)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search members by name, nickname, places, occupation and bio, best
+    matches first. Names also match with typos. mode=phonetic instead
+    matches names by sound ("Schmidt" finds "Smith"). Pass the X-Next-Offset
+    response header back as offset for the next page.
+    """
+    if mode == "phonetic":
+        if not phonetic_keys_of_query(q):
+            raise HTTPException(status_code=400, detail="Search query must contain a name")
+        build_query = member_phonetic_query
+    else:
+        if prefix_tsquery(q) is None:
+            raise HTTPException(status_code=400, detail="Search query must contain a word")
+        build_query = member_search_query
+
+    query = build_query(
+        q, current_user.id, tree_id,
+        FamilyMember.id, FamilyMember.tree_id, FamilyMember.first_name, FamilyMember.middle_name,
+        FamilyMember.last_name, FamilyMember.nickname, FamilyMember.gender, FamilyMember.birth_date,
+        FamilyMember.death_date, FamilyMember.birth_place, FamilyMember.photo_hash
+    )
+    # One extra row tells whether there is a next page
+    result = await db.execute(query.offset(offset).limit(limit + 1))
+    rows = result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+
+    return [
+        MemberSearchResult(
+            id=row.id,
+            tree_id=row.tree_id,
+            first_name=row.first_name,
+            middle_name=row.middle_name,
+            last_name=row.last_name,
+            nickname=row.nickname,
+            gender=row.gender,
+            birth_date=row.birth_date,
+            death_date=row.death_date,
+            birth_place=row.birth_place,
+            photo=PhotoRef(
+                id=row.id,
+                hash=row.photo_hash,
+                url=photo_url(row.id, row.photo_hash, PHOTO_VARIANT_SIZES[0])
+            ) if row.photo_hash else None,
+            rank=row.rank
+        )
+        for row in rows
+    ]
+
+
 @router.get("/members/{member_id}", response_model=FamilyMemberResponse)
 async def get_family_member(
     member_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -86,7 +474,7 @@ async def get_family_member(
 async def update_family_member(
     member_id: int,
     member_data: FamilyMemberUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -100,11 +488,30 @@ async def update_family_member(
         raise HTTPException(status_code=404, detail="Family member not found")
 
     # Update only provided fields
-    update_data = member_data.model_dump(exclude_unset=True)
+    old_tree_id = member.tree_id
+    old_parent_ids = [member.father_id, member.mother_id]
+    update_data = member_data.model_dump(exclude_unset=True, exclude=PHOTO_INPUT_FIELDS)
     for field, value in update_data.items():
         setattr(member, field, value)
 
+    if member_data.profile_picture_data:
+        old_photo_hash = member.photo_hash
+        member.photo_hash = await store_base64_photo(db, member_data.profile_picture_data)
+        await db.flush()
+        await release_photos(db, [old_photo_hash])
+
+    # Children stay behind when a parent moves to another tree
+    children = await get_children(db, [member.id]) if old_tree_id != member.tree_id else []
+    child_tree_ids = [tree_id for _, tree_id in children]
+    await bump_tree_revision(db, old_tree_id, member.tree_id, *child_tree_ids)
+    if old_tree_id != member.tree_id:
+        await add_tombstones(db, [(old_tree_id, member.id)])
+    # Former and current parents' children lists may have changed too
+    await stamp_members(
+        db, [member.id, member.father_id, member.mother_id, *old_parent_ids, *(child_id for child_id, _ in children)]
+    )
     await db.commit()
+    invalidate_tree_responses(current_user.id, old_tree_id, member.tree_id, *child_tree_ids)
     await db.refresh(member)
     return member
 
@@ -112,7 +519,7 @@ async def update_family_member(
 @router.delete("/members/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_family_member(
     member_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -125,27 +532,24 @@ async def delete_family_member(
     if not member:
         raise HTTPException(status_code=404, detail="Family member not found")
 
+    photo_hash = member.photo_hash
+    tree_id = member.tree_id
+    parent_ids = [member.father_id, member.mother_id]
+    # Deleting the member clears its children's parent links
+    children = await get_children(db, [member_id])
+    child_tree_ids = [child_tree_id for _, child_tree_id in children]
     await db.delete(member)
+    await db.flush()
+    await release_photos(db, [photo_hash])
+    await bump_tree_revision(db, tree_id, *child_tree_ids)
+    await add_tombstones(db, [(tree_id, member_id)])
+    await stamp_members(db, [*parent_ids, *(child_id for child_id, _ in children)])
     await db.commit()
+    invalidate_tree_responses(current_user.id, tree_id, *child_tree_ids)
 
 
-@router.get("/tree", response_model=List[FamilyTreeNode])
-async def get_family_tree(
-    tree_id: int = None,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
-    # Build query based on tree_id
-    query = select(FamilyMember).where(FamilyMember.user_id == current_user.id)
-
-    if tree_id:
-        query = query.where(FamilyMember.tree_id == tree_id)
-
-    result = await db.execute(query)
-    members = result.scalars().all()
-
-    # Build tree structure with children relationships
-    tree_nodes = []
+def _build_children_map(members) -> Dict[int, List[int]]:
+    """Map each member id to the ids of its children within the loaded set."""
     member_children = {}
 
     for member in members:
@@ -158,39 +562,693 @@ async def get_family_tree(
             if member.id not in member_children[member.mother_id]:
                 member_children[member.mother_id].append(member.id)
 
-    for member in members:
-        # Convert base64 profile picture to data URL for frontend
-        photo_url = member.photo_url  # Fallback to old field
-        if member.profile_picture_data and member.profile_picture_mime_type:
-            photo_url = f"data:{member.profile_picture_mime_type};base64,{member.profile_picture_data}"
+    return member_children
+
+
+@router.get(
+    "/tree",
+    response_model=None,
+    responses={
+        200: {
+            "model": Union[List[FamilyTreeNode], List[FamilyTreeNodeLean]],
+            "content": {NDJSON_MEDIA_TYPE: {}}
+        }
+    }
+)
+async def get_family_tree(
+    request: Request,
+    tree_id: int = None,
+    lean: bool = False,
+    layout: bool = False,
+    stream: bool = False,
+    focus: Optional[int] = None,
+    up: int = Query(FOCUS_GENERATIONS, ge=0, le=MAX_LINEAGE_DEPTH),
+    down: int = Query(FOCUS_GENERATIONS, ge=0, le=MAX_LINEAGE_DEPTH),
+    siblings: bool = False,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the family tree as a flat list of nodes with children ids.
+
+    With focus=<member id> only the neighbourhood of that member is
+    returned: up generations of ancestors, down generations of descendants
+    (with the other parent of each descendant), and with siblings=true the
+    member's siblings. Nodes on the edge of the window carry hidden_parents
+    and hidden_children counts, so branches can be expanded on demand with
+    another focus request. The tree defaults to the focus member's tree.
+
+    With lean=true the response carries no image data: each node gets a
+    photo reference (member id + content hash) to be fetched from
+    /api/family/members/{id}/photo, which is cacheable by the browser.
+
+    With layout=true each node also gets its generation level and x/y
+    coordinates, computed server-side and cached per tree revision.
+
+    The response carries an ETag derived from the tree version; a matching
+    If-None-Match is answered with 304 before any member is loaded. Built
+    responses are cached in memory per tree version.
+
+    With stream=true (or Accept: application/x-ndjson) the nodes are sent as
+    newline-delimited JSON while they are read, one node per line, so memory
+    use stays flat however large the tree is. Streamed responses bypass the
+    response cache.
+    """
+    # Read the version before the members, so a layout, ETag or cached body
+    # is never stored under a newer version than the data it came from
+    stream = stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    headers = {"Cache-Control": REVALIDATE_CACHE_CONTROL, "Vary": "Accept"}
+    window = None
+    if focus is not None:
+        # A focused window is small; it is always sent as one JSON body
+        stream = False
+        window = (focus, up, down, siblings)
+        result = await db.execute(
+            select(FamilyMember.tree_id).where(
+                FamilyMember.id == focus,
+                FamilyMember.user_id == current_user.id
+            )
+        )
+        focus_tree_id = result.one_or_none()
+        if focus_tree_id is None or (tree_id and focus_tree_id[0] != tree_id):
+            raise HTTPException(status_code=404, detail="Family member not found")
+        tree_id = focus_tree_id[0]
+    if tree_id:
+        # Starting point for /tree/changes?since=
+        revision = await get_tree_revision(db, tree_id)
+        version = tree_version(tree_id, revision)
+        headers["X-Tree-Revision"] = str(revision)
+    else:
+        version = await get_tree_version(db, current_user.id)
+    etag_parts = [current_user.id, version, lean, layout, stream]
+    if window:
+        etag_parts.append(window)
+    etag = make_etag(*etag_parts)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers["ETag"] = etag
+
+    if stream:
+        return StreamingResponse(
+            _stream_family_tree(tree_id, lean, layout, version, current_user.id),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers
+        )
+
+    cache_key = (current_user.id, tree_id, version, (lean, layout, window))
+    body = tree_response_cache.get(cache_key)
+    if body is None:
+        if window:
+            body = await _build_focus_tree(tree_id, window, lean, layout, current_user, db)
+        else:
+            body = await _build_family_tree(tree_id, lean, layout, version, current_user, db)
+        tree_response_cache.put(cache_key, body)
 
-        tree_node = FamilyTreeNode(
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/tree/changes", response_model=TreeChanges)
+async def get_family_tree_changes(
+    tree_id: int,
+    since: int = Query(..., ge=0),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the members of a tree created, updated or removed after revision
+    since, as lean nodes plus the ids of removed members. Start from the
+    X-Tree-Revision header of /tree and pass the returned revision as since
+    on the next call.
+    """
+    result = await db.execute(
+        select(FamilyTree.revision).where(
+            FamilyTree.id == tree_id,
+            FamilyTree.user_id == current_user.id
+        )
+    )
+    revision = result.scalar_one_or_none()
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Tree not found")
+    if since > revision:
+        raise HTTPException(status_code=400, detail="since is ahead of the tree revision")
+
+    result = await db.execute(
+        select(FamilyMember).where(
+            FamilyMember.tree_id == tree_id,
+            FamilyMember.user_id == current_user.id,
+            FamilyMember.revision > since
+        )
+    )
+    members = result.scalars().all()
+
+    # Children lists of the changed members, looked up via the parent indexes
+    member_children: Dict[int, List[int]] = {member.id: [] for member in members}
+    if members:
+        # An import can change more members than a query may have parameters
+        changed_ids = _id_array(member_children)
+        result = await db.execute(
+            select(FamilyMember.id, FamilyMember.father_id, FamilyMember.mother_id).where(
+                FamilyMember.tree_id == tree_id,
+                or_(FamilyMember.father_id == any_(changed_ids), FamilyMember.mother_id == any_(changed_ids))
+            )
+        )
+        for child in result.all():
+            for parent_id in dict.fromkeys((child.father_id, child.mother_id)):
+                if parent_id in member_children:
+                    member_children[parent_id].append(child.id)
+
+    # A member removed and later re-added (moved back) is reported as current
+    result = await db.execute(
+        select(MemberTombstone.member_id).distinct().where(
+            MemberTombstone.tree_id == tree_id,
+            MemberTombstone.revision > since
+        )
+    )
+    deleted = [member_id for member_id in result.scalars().all() if member_id not in member_children]
+
+    return TreeChanges(
+        tree_id=tree_id,
+        since=since,
+        revision=revision,
+        members=[_lean_tree_node(member, member_children[member.id]) for member in members],
+        deleted=deleted
+    )
+
+
+async def _build_family_tree(
+    tree_id: Optional[int],
+    lean: bool,
+    layout: bool,
+    version: str,
+    current_user: Principal,
+    db: AsyncSession
+) -> bytes:
+    if lean:
+        tree_nodes = await _get_lean_family_tree(tree_id, current_user, db)
+    else:
+        tree_nodes = await _get_full_family_tree(tree_id, current_user, db)
+
+    if layout:
+        positions = get_tree_layout(
+            (current_user.id, tree_id),
+            version,
+            {node.id: (node.father_id, node.mother_id) for node in tree_nodes}
+        )
+        for node in tree_nodes:
+            if node.id in positions:
+                generation, x, y = positions[node.id]
+                node.position = NodePosition(generation=generation, x=x, y=y)
+
+    adapter = LEAN_TREE_NODES_ADAPTER if lean else TREE_NODES_ADAPTER
+    return adapter.dump_json(tree_nodes)
+
+
+def _id_array(ids) -> ColumnElement:
+    """ids as one array parameter, for = ANY(...) on any number of ids."""
+    return literal(sorted(ids), type_=ARRAY(Integer))
+
+
+async def _build_focus_tree(
+    tree_id: Optional[int],
+    window: tuple,
+    lean: bool,
+    layout: bool,
+    current_user: Principal,
+    db: AsyncSession
+) -> bytes:
+    """The nodes of a focus window, with hidden_parents/hidden_children counts."""
+    focus, up, down, siblings = window
+    user_id = current_user.id
+    window_ids = {focus}
+    for depth, ancestors in ((up, True), (down, False)):
+        if depth:
+            relatives = _lineage_depths(focus, user_id, depth, ancestors)
+            result = await db.execute(select(relatives.c.id))
+            window_ids.update(result.scalars().all())
+
+    if siblings:
+        parents = (
+            select(FamilyMember.father_id, FamilyMember.mother_id)
+            .where(FamilyMember.id == focus)
+            .subquery()
+        )
+        result = await db.execute(
+            select(FamilyMember.id).where(
+                FamilyMember.user_id == user_id,
+                FamilyMember.id != focus,
+                or_(
+                    FamilyMember.father_id == select(parents.c.father_id).scalar_subquery(),
+                    FamilyMember.mother_id == select(parents.c.mother_id).scalar_subquery()
+                )
+            )
+        )
+        window_ids.update(result.scalars().all())
+
+    async def load(ids) -> list:
+        """(member, photo bytes, mime type) rows; no photo columns when lean."""
+        result = await db.execute(
+            _tree_query(tree_id, user_id, lean).where(FamilyMember.id == any_(_id_array(ids)))
+        )
+        if lean:
+            return [(member, None, None) for member in result.scalars().all()]
+        return [tuple(row) for row in result.all()]
+
+    rows = await load(window_ids)
+    # Children in the window are drawn with both parents, so add the
+    # partners who married into it
+    partner_ids = {
+        parent_id
+        for member, _, _ in rows
+        if member.id != focus and (member.father_id in window_ids or member.mother_id in window_ids)
+        for parent_id in (member.father_id, member.mother_id)
+        if parent_id is not None and parent_id not in window_ids
+    }
+    if partner_ids:
+        rows += await load(partner_ids)
+    loaded_ids = {member.id for member, _, _ in rows}
+
+    # All children of the window, including the ones outside it
+    children_query = select(FamilyMember.id, FamilyMember.father_id, FamilyMember.mother_id).where(
+        FamilyMember.user_id == user_id,
+        or_(
+            FamilyMember.father_id == any_(_id_array(loaded_ids)),
+            FamilyMember.mother_id == any_(_id_array(loaded_ids))
+        )
+    )
+    if tree_id:
+        children_query = children_query.where(FamilyMember.tree_id == tree_id)
+    # Every loaded member gets an entry, so the window's edges can expand
+    member_children = {member_id: [] for member_id in loaded_ids}
+    for child_id, father_id, mother_id in (await db.execute(children_query)).all():
+        for parent_id in (father_id, mother_id):
+            if parent_id in member_children and child_id not in member_children[parent_id]:
+                member_children[parent_id].append(child_id)
+
+    nodes = []
+    for member, picture_bytes, mime_type in rows:
+        children = member_children.get(member.id, [])
+        if lean:
+            node = _lean_tree_node(member, children)
+        else:
+            node = _full_tree_node(member, picture_bytes, mime_type, children)
+        node.hidden_parents = sum(
+            1 for parent_id in (member.father_id, member.mother_id)
+            if parent_id is not None and parent_id not in loaded_ids
+        )
+        node.hidden_children = sum(1 for child_id in children if child_id not in loaded_ids)
+        nodes.append(node)
+
+    if layout:
+        # Parents outside the window are left out, so edge nodes become roots
+        positions = compute_layout({
+            node.id: tuple(
+                parent_id if parent_id in loaded_ids else None
+                for parent_id in (node.father_id, node.mother_id)
+            )
+            for node in nodes
+        }).positions
+        for node in nodes:
+            if node.id in positions:
+                generation, x, y = positions[node.id]
+                node.position = NodePosition(generation=generation, x=x, y=y)
+
+    adapter = LEAN_TREE_NODES_ADAPTER if lean else TREE_NODES_ADAPTER
+    return adapter.dump_json(nodes)
+
+
+def _tree_query(tree_id: Optional[int], user_id: int, lean: bool):
+    """Members of a tree (or all of a user's members), with photo bytes unless lean."""
+    if lean:
+        query = select(FamilyMember)
+    else:
+        query = (
+            select(FamilyMember, PhotoBlob.data, PhotoBlob.mime_type)
+            .outerjoin(PhotoBlob, FamilyMember.photo_hash == PhotoBlob.sha256)
+        )
+    query = query.where(FamilyMember.user_id == user_id)
+
+    if tree_id:
+        query = query.where(FamilyMember.tree_id == tree_id)
+    return query
+
+
+def _full_tree_node(member: FamilyMember, picture_bytes, mime_type, children: List[int]) -> FamilyTreeNode:
+    # Inline profile picture as a data URL for legacy clients
+    member_photo_url = member.photo_url  # Fallback to old field
+    picture_data = None
+    if picture_bytes is not None:
+        picture_data = base64.b64encode(picture_bytes).decode('utf-8')
+        member_photo_url = f"data:{mime_type};base64,{picture_data}"
+
+    return FamilyTreeNode(
+        id=member.id,
+        first_name=member.first_name,
+        last_name=member.last_name,
+        gender=member.gender,
+        birth_date=member.birth_date,
+        death_date=member.death_date,
+        birth_place=member.birth_place,
+        occupation=member.occupation,
+        bio=member.bio,
+        photo_url=member_photo_url,
+        profile_picture_data=picture_data,
+        profile_picture_mime_type=mime_type,
+        father_id=member.father_id,
+        mother_id=member.mother_id,
+        children=children
+    )
+
+
+def _lean_tree_node(member: FamilyMember, children: List[int]) -> FamilyTreeNodeLean:
+    photo_hash = member.photo_hash
+    return FamilyTreeNodeLean(
+        id=member.id,
+        first_name=member.first_name,
+        middle_name=member.middle_name,
+        last_name=member.last_name,
+        nickname=member.nickname,
+        gender=member.gender,
+        birth_date=member.birth_date,
+        death_date=member.death_date,
+        birth_place=member.birth_place,
+        location=member.location,
+        country=member.country,
+        occupation=member.occupation,
+        bio=member.bio,
+        photo_url=None if photo_hash else member.photo_url,
+        photo=PhotoRef(
             id=member.id,
-            first_name=member.first_name,
-            last_name=member.last_name,
-            gender=member.gender,
-            birth_date=member.birth_date,
-            death_date=member.death_date,
-            birth_place=member.birth_place,
-            occupation=member.occupation,
-            bio=member.bio,
-            photo_url=photo_url,
-            profile_picture_data=member.profile_picture_data,
-            profile_picture_mime_type=member.profile_picture_mime_type,
-            father_id=member.father_id,
-            mother_id=member.mother_id,
-            children=member_children.get(member.id, [])
-        )
-        tree_nodes.append(tree_node)
-
-    return tree_nodes
+            hash=photo_hash,
+            url=photo_url(member.id, photo_hash, PHOTO_VARIANT_SIZES[0])
+        ) if photo_hash else None,
+        social_media=member.social_media,
+        previous_partners=member.previous_partners,
+        father_id=member.father_id,
+        mother_id=member.mother_id,
+        children=children
+    )
+
+
+async def _get_full_family_tree(tree_id: int, current_user: Principal, db: AsyncSession):
+    result = await db.execute(_tree_query(tree_id, current_user.id, lean=False))
+    rows = result.all()
+
+    # Build tree structure with children relationships
+    member_children = _build_children_map([member for member, _, _ in rows])
+
+    return [
+        _full_tree_node(member, picture_bytes, mime_type, member_children.get(member.id, []))
+        for member, picture_bytes, mime_type in rows
+    ]
+
+
+async def _get_lean_family_tree(tree_id: int, current_user: Principal, db: AsyncSession):
+    result = await db.execute(_tree_query(tree_id, current_user.id, lean=True))
+    members = result.scalars().all()
+    member_children = _build_children_map(members)
+
+    return [_lean_tree_node(member, member_children.get(member.id, [])) for member in members]
+
+
+async def _stream_family_tree(
+    tree_id: Optional[int],
+    lean: bool,
+    layout: bool,
+    version: str,
+    user_id: int
+) -> AsyncIterator[bytes]:
+    """
+    Yield the tree as NDJSON, one node per line.
+
+    Only an id index (id, father_id, mother_id) is held for the whole tree;
+    members are read through a server-side cursor in batches and each node
+    is serialized and sent before the next batch is fetched.
+    """
+    # Runs after the endpoint has returned, so it needs its own session.
+    # REPEATABLE READ keeps the index pass and the node pass on one snapshot.
+    async with async_session_maker() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+        index_query = select(FamilyMember.id, FamilyMember.father_id, FamilyMember.mother_id).where(
+            FamilyMember.user_id == user_id
+        )
+        if tree_id:
+            index_query = index_query.where(FamilyMember.tree_id == tree_id)
+        index = (await db.execute(index_query)).all()
+        member_children = _build_children_map(index)
+        positions = get_tree_layout(
+            (user_id, tree_id),
+            version,
+            {row.id: (row.father_id, row.mother_id) for row in index}
+        ) if layout else {}
+        del index
+
+        query = _tree_query(tree_id, user_id, lean).execution_options(yield_per=TREE_STREAM_BATCH_SIZE)
+        if lean:
+            rows = await db.stream_scalars(query)
+        else:
+            rows = await db.stream(query)
+
+        async for row in rows:
+            if lean:
+                node = _lean_tree_node(row, member_children.get(row.id, []))
+            else:
+                member, picture_bytes, mime_type = row
+                node = _full_tree_node(member, picture_bytes, mime_type, member_children.get(member.id, []))
+            if node.id in positions:
+                generation, x, y = positions[node.id]
+                node.position = NodePosition(generation=generation, x=x, y=y)
+            yield node.model_dump_json().encode("utf-8") + b"\n"
+
+
+def _lineage_depths(member_id: int, user_id: int, depth: int, ancestors: bool):
+    """
+    Subquery (id, depth) walking up (parents) or down (children) from a
+    member in one WITH RECURSIVE query: each relative once, at the nearest
+    depth it is reached.
+    """
+    lineage = (
+        select(
+            FamilyMember.id,
+            FamilyMember.father_id,
+            FamilyMember.mother_id,
+            literal(0).label("depth")
+        )
+        .where(FamilyMember.id == member_id, FamilyMember.user_id == user_id)
+        .cte("lineage", recursive=True)
+    )
+
+    relative = aliased(FamilyMember)
+    if ancestors:
+        link = or_(relative.id == lineage.c.father_id, relative.id == lineage.c.mother_id)
+    else:
+        link = or_(relative.father_id == lineage.c.id, relative.mother_id == lineage.c.id)
+
+    # UNION (not UNION ALL) collapses relatives reached twice at the same
+    # depth, e.g. through cousin marriages, so the walk stays polynomial
+    lineage = lineage.union(
+        select(relative.id, relative.father_id, relative.mother_id, lineage.c.depth + 1)
+        .select_from(relative)
+        .join(lineage, link)
+        .where(lineage.c.depth < depth)
+    )
+
+    return (
+        select(lineage.c.id, func.min(lineage.c.depth).label("depth"))
+        .where(lineage.c.depth > 0)
+        .group_by(lineage.c.id)
+        .subquery()
+    )
+
+
+async def _get_lineage(
+    db: AsyncSession,
+    member_id: int,
+    user_id: int,
+    depth: int,
+    ancestors: bool
+) -> List[RelativeNode]:
+    """Ancestors or descendants of a member, nearest first."""
+    nearest = _lineage_depths(member_id, user_id, depth, ancestors)
+    result = await db.execute(
+        select(
+            FamilyMember.id, FamilyMember.first_name, FamilyMember.middle_name,
+            FamilyMember.last_name, FamilyMember.gender, FamilyMember.birth_date,
+            FamilyMember.death_date, FamilyMember.father_id, FamilyMember.mother_id,
+            FamilyMember.photo_hash, nearest.c.depth
+        )
+        .join(nearest, FamilyMember.id == nearest.c.id)
+        .where(FamilyMember.user_id == user_id)
+        .order_by(nearest.c.depth, FamilyMember.id)
+    )
+
+    relatives = []
+    for row in result.all():
+        relatives.append(RelativeNode(
+            id=row.id,
+            first_name=row.first_name,
+            middle_name=row.middle_name,
+            last_name=row.last_name,
+            gender=row.gender,
+            birth_date=row.birth_date,
+            death_date=row.death_date,
+            father_id=row.father_id,
+            mother_id=row.mother_id,
+            photo=PhotoRef(
+                id=row.id,
+                hash=row.photo_hash,
+                url=photo_url(row.id, row.photo_hash, PHOTO_VARIANT_SIZES[0])
+            ) if row.photo_hash else None,
+            depth=row.depth
+        ))
+    return relatives
+
+
+async def _ensure_member_exists(db: AsyncSession, member_id: int, user_id: int):
+    result = await db.execute(
+        select(FamilyMember.id).where(
+            FamilyMember.id == member_id,
+            FamilyMember.user_id == user_id
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Family member not found")
+
+
+@router.get("/members/{member_id}/ancestors", response_model=List[RelativeNode])
+async def get_member_ancestors(
+    member_id: int,
+    depth: int = Query(10, ge=1, le=MAX_LINEAGE_DEPTH),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a member's ancestors up to depth generations back (1 = parents)"""
+    await _ensure_member_exists(db, member_id, current_user.id)
+    return await _get_lineage(db, member_id, current_user.id, depth, ancestors=True)
+
+
+@router.get("/members/{member_id}/descendants", response_model=List[RelativeNode])
+async def get_member_descendants(
+    member_id: int,
+    depth: int = Query(10, ge=1, le=MAX_LINEAGE_DEPTH),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a member's descendants up to depth generations down (1 = children)"""
+    await _ensure_member_exists(db, member_id, current_user.id)
+    return await _get_lineage(db, member_id, current_user.id, depth, ancestors=False)
+
+
+async def _get_kinship_index(db: AsyncSession, user_id: int, tree_id: Optional[int]) -> KinshipIndex:
+    """Kinship index of a tree, rebuilt only when the tree's version changes."""
+    cache_key = (user_id, tree_id)
+    version = await get_tree_version(db, user_id, tree_id)
+    index = get_kinship_index(cache_key, version)
+    if index is None:
+        result = await db.execute(
+            select(FamilyMember.id, FamilyMember.father_id, FamilyMember.mother_id, FamilyMember.gender)
+            .where(FamilyMember.user_id == user_id, FamilyMember.tree_id == tree_id)
+        )
+        index = KinshipIndex(version, result.all())
+        store_kinship_index(cache_key, index)
+    return index
+
+
+@router.get("/relationship", response_model=Relationship)
+async def get_relationship(
+    a: int,
+    b: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """How member a is related to member b, with the path connecting them"""
+    result = await db.execute(
+        select(FamilyMember.id, FamilyMember.tree_id).where(
+            FamilyMember.id.in_([a, b]),
+            FamilyMember.user_id == current_user.id
+        )
+    )
+    tree_ids = dict(result.all())
+    if a not in tree_ids or b not in tree_ids:
+        raise HTTPException(status_code=404, detail="Family member not found")
+    if tree_ids[a] != tree_ids[b]:
+        raise HTTPException(status_code=400, detail="Members belong to different trees")
+
+    index = await _get_kinship_index(db, current_user.id, tree_ids[a])
+    found = find_relationship(index, a, b)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No relationship found")
+
+    path_ids = [member_id for member_id, _ in found["path"]]
+    result = await db.execute(
+        select(FamilyMember.id, FamilyMember.first_name, FamilyMember.last_name)
+        .where(FamilyMember.id.in_(path_ids))
+    )
+    names = {row.id: row for row in result.all()}
+    return Relationship(
+        a=a,
+        b=b,
+        relationship=found["relationship"],
+        blood=found["blood"],
+        common_ancestors=found["common_ancestors"],
+        path=[
+            RelationshipStep(
+                id=member_id,
+                first_name=names[member_id].first_name,
+                last_name=names[member_id].last_name,
+                link=link
+            )
+            for member_id, link in found["path"]
+        ]
+    )
+
+
+@router.get("/members/{member_id}/photo")
+async def get_member_photo(
+    member_id: int,
+    request: Request,
+    size: Optional[int] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Serve a member's profile picture as raw bytes with a content-hash ETag.
+
+    size selects a square WebP variant (see PHOTO_VARIANT_SIZES); omit it for
+    the full-size picture.
+    """
+    if size is not None and size not in PHOTO_VARIANT_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid size. Allowed sizes: {', '.join(map(str, PHOTO_VARIANT_SIZES))}"
+        )
+
+    result = await db.execute(
+        select(FamilyMember.photo_hash).where(
+            FamilyMember.id == member_id,
+            FamilyMember.user_id == current_user.id
+        )
+    )
+    photo_hash = result.scalar_one_or_none()
+    if not photo_hash:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    # The URL is versioned by hash (?v=...), so the bytes never change under it
+    etag = f'"{photo_hash}-{size}"' if size else f'"{photo_hash}"'
+    headers = {"ETag": etag, "Cache-Control": PHOTO_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    picture_bytes, mime_type = await load_photo(db, photo_hash, size)
+
+    return Response(content=picture_bytes, media_type=mime_type, headers=headers)
 
 
 @router.post("/members/{member_id}/upload-photo")
 async def upload_member_photo(
     member_id: int,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Upload a profile picture for a family member"""
@@ -223,24 +1281,24 @@ async def upload_member_photo(
     if file_size > 5 * 1024 * 1024:  # 5MB
         raise HTTPException(status_code=400, detail="File size exceeds 5MB limit")
 
-    # Convert image to base64 for database storage
-    base64_data = base64.b64encode(content).decode('utf-8')
-
-    # Store in database instead of file system
-    member.profile_picture_data = base64_data
-    member.profile_picture_mime_type = file.content_type
+    # Normalize (orientation, no EXIF, WebP + thumbnails) in the image pool,
+    # then store in the content-addressed photo store
+    old_photo_hash = member.photo_hash
+    member.photo_hash = await store_processed_photo(db, content)
 
     # Clear deprecated photo_url field
     member.photo_url = None
 
+    await db.flush()
+    await release_photos(db, [old_photo_hash])
+    await bump_tree_revision(db, member.tree_id)
+    await stamp_members(db, [member.id])
     await db.commit()
-    await db.refresh(member)
-
-    # Return data URL format for immediate use by frontend
-    data_url = f"data:{file.content_type};base64,{base64_data}"
+    invalidate_tree_responses(current_user.id, member.tree_id)
 
     return {
         "message": "Photo uploaded successfully",
-        "profile_picture_data": data_url,
-        "mime_type": file.content_type
+        "photo_hash": member.photo_hash,
+        "photo_url": photo_url(member.id, member.photo_hash, PHOTO_VARIANT_SIZES[0]),
+        "mime_type": PHOTO_MIME_TYPE
     }
@@ -1,25 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, update, func, and_, or_, desc
+from sqlalchemy.orm import aliased
 from typing import List
 from datetime import datetime
+import os
+import re
 import shutil
+import tempfile
 from pathlib import Path
 from app.database import get_db
-from app.models import User, FamilyTree, FamilyMember, TreeShare
+from app.models import User, FamilyTree, FamilyMember, TreeShare, ImportJob, DuplicateScanJob, DuplicateSuggestion, TreeStats
 from app.schemas import (
     FamilyTreeCreate, FamilyTreeUpdate, FamilyTreeResponse,
-    TreeShareCreate, TreeShareResponse
+    TreeShareCreate, TreeShareResponse, ImportJobResponse,
+    DuplicateScanJobResponse, DuplicateSuggestionResponse, DuplicateCandidate, TreeStatsResponse
 )
-from app.auth import get_current_user
+from app.auth import get_current_user, Principal
+from app.photos import release_photos
+from app.revisions import content_etag, etag_matches, set_etag, not_modified
+from app.tree_cache import invalidate_tree_responses
+from app.importer import run_gedcom_import
+from app.exporter import export_gedcom, export_json
+from app.tree_copy import copy_tree_members
+from app.duplicates import run_duplicate_scan
+from app.tree_stats import refresh_tree_stats
 
 router = APIRouter(prefix="/api/trees", tags=["Family Trees"])
 
+# Largest accepted import file, and the chunk size it is copied in
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 @router.get("/", response_model=List[FamilyTreeResponse])
 async def get_user_trees(
+    request: Request,
+    response: Response,
     include_shared: bool = True,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all family trees owned by or shared with the current user"""
@@ -78,13 +98,17 @@ async def get_user_trees(
             }
             trees_response.append(tree_dict)
 
+    etag = content_etag([current_user.id, trees_response])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return trees_response
 
 
 @router.post("/", response_model=FamilyTreeResponse, status_code=status.HTTP_201_CREATED)
 async def create_tree(
     tree_data: FamilyTreeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new family tree"""
@@ -135,7 +159,7 @@ async def create_tree(
 @router.get("/{tree_id}", response_model=FamilyTreeResponse)
 async def get_tree(
     tree_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific family tree"""
@@ -187,7 +211,7 @@ async def get_tree(
 async def update_tree(
     tree_id: int,
     tree_data: FamilyTreeUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update a family tree"""
@@ -249,7 +273,7 @@ async def update_tree(
 @router.delete("/{tree_id}")
 async def delete_tree(
     tree_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a family tree and all its members"""
@@ -282,8 +306,13 @@ async def delete_tree(
                 except Exception:
                     pass
 
+    photo_hashes = [member.photo_hash for member in members]
+
     await db.delete(tree)
+    await db.flush()
+    await release_photos(db, photo_hashes)
     await db.commit()
+    invalidate_tree_responses(current_user.id, tree_id)
 
     return {"message": "Tree deleted successfully"}
 
@@ -292,7 +321,7 @@ async def delete_tree(
 async def copy_tree(
     tree_id: int,
     new_name: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a copy of an existing family tree"""
@@ -332,66 +361,26 @@ async def copy_tree(
     db.add(new_tree)
     await db.flush()
 
-    # Copy all members
-    result = await db.execute(
-        select(FamilyMember).where(FamilyMember.tree_id == tree_id)
-    )
-    source_members = result.scalars().all()
-
-    # Map old IDs to new IDs
-    id_map = {}
-
-    for old_member in source_members:
-        new_member = FamilyMember(
-            user_id=current_user.id,
-            tree_id=new_tree.id,
-            first_name=old_member.first_name,
-            middle_name=old_member.middle_name,
-            last_name=old_member.last_name,
-            nickname=old_member.nickname,
-            gender=old_member.gender,
-            birth_date=old_member.birth_date,
-            death_date=old_member.death_date,
-            birth_place=old_member.birth_place,
-            location=old_member.location,
-            country=old_member.country,
-            occupation=old_member.occupation,
-            bio=old_member.bio,
-            social_media=old_member.social_media,
-            previous_partners=old_member.previous_partners,
-            # Photo will be copied below
-            # Parent relationships will be fixed after all members are created
-        )
-        db.add(new_member)
-        await db.flush()
-        id_map[old_member.id] = new_member.id
-
-        # Copy profile picture if exists
-        if old_member.photo_url:
-            old_path = Path(old_member.photo_url.lstrip('/'))
-            if old_path.exists():
-                new_filename = f"copy_{old_path.name}"
-                new_path = old_path.parent / new_filename
-                try:
-                    shutil.copy2(old_path, new_path)
-                    new_member.photo_url = f"/{new_path}"
-                except Exception:
-                    pass
-
-    # Fix parent relationships
-    for old_member in source_members:
-        new_member_id = id_map[old_member.id]
-        result = await db.execute(
-            select(FamilyMember).where(FamilyMember.id == new_member_id)
-        )
-        new_member = result.scalar_one()
-
-        if old_member.father_id and old_member.father_id in id_map:
-            new_member.father_id = id_map[old_member.father_id]
-        if old_member.mother_id and old_member.mother_id in id_map:
-            new_member.mother_id = id_map[old_member.mother_id]
+    # Copy all members in one INSERT ... SELECT; photo blobs are shared
+    member_count, legacy_photos = await copy_tree_members(db, tree_id, new_tree.id, current_user.id)
+
+    # Copy legacy profile picture files
+    for member_id, photo_url in legacy_photos:
+        old_path = Path(photo_url.lstrip('/'))
+        if old_path.exists():
+            new_path = old_path.parent / f"copy_{member_id}_{old_path.name}"
+            try:
+                shutil.copy2(old_path, new_path)
+                await db.execute(
+                    update(FamilyMember)
+                    .where(FamilyMember.id == member_id)
+                    .values(photo_url=f"/{new_path}")
+                )
+            except Exception:
+                pass
 
     await db.commit()
+    invalidate_tree_responses(current_user.id, new_tree.id)
     await db.refresh(new_tree)
 
     return {
@@ -401,7 +390,7 @@ async def copy_tree(
         'description': new_tree.description,
         'is_default': new_tree.is_default,
         'is_active': new_tree.is_active,
-        'member_count': len(source_members),
+        'member_count': member_count,
         'created_at': new_tree.created_at,
         'updated_at': new_tree.updated_at
     }
@@ -409,11 +398,287 @@ async def copy_tree(
 
 # Tree Sharing Endpoints
 
+@router.get("/{tree_id}/export")
+async def export_tree(
+    tree_id: int,
+    format: str = Query("gedcom", pattern="^(gedcom|json)$"),
+    include_photos: bool = False,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download a tree as GEDCOM or JSON. The file is streamed while members
+    are read, so large trees export in bounded memory.
+    """
+
+    # Check if user owns or has access to this tree
+    result = await db.execute(
+        select(FamilyTree).where(
+            and_(
+                FamilyTree.id == tree_id,
+                or_(
+                    FamilyTree.user_id == current_user.id,
+                    FamilyTree.id.in_(
+                        select(TreeShare.tree_id).where(
+                            and_(
+                                TreeShare.shared_with_user_id == current_user.id,
+                                TreeShare.is_accepted == True
+                            )
+                        )
+                    )
+                )
+            )
+        )
+    )
+    tree = result.scalar_one_or_none()
+
+    if not tree:
+        raise HTTPException(status_code=404, detail="Tree not found")
+
+    filename = re.sub(r"[^A-Za-z0-9_.-]+", "_", tree.name).strip("_") or f"tree_{tree.id}"
+    if format == "json":
+        content = export_json(tree, include_photos)
+        media_type = "application/json"
+        filename += ".json"
+    else:
+        content = export_gedcom(tree, include_photos)
+        media_type = "text/vnd.familysearch.gedcom; charset=utf-8"
+        filename += ".ged"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post(
+    "/{tree_id}/import",
+    response_model=ImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def import_gedcom(
+    tree_id: int,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Import a GEDCOM file into a tree as a background job. Poll
+    /api/trees/imports/{job_id} for progress.
+    """
+    result = await db.execute(
+        select(FamilyTree).where(
+            and_(
+                FamilyTree.id == tree_id,
+                FamilyTree.user_id == current_user.id
+            )
+        )
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Tree not found or you don't have permission")
+
+    # Copy the upload in chunks to a file the job owns (the upload itself is
+    # closed once this request ends); the job parses it record by record
+    total_bytes = 0
+    with tempfile.NamedTemporaryFile(prefix="import_", suffix=".ged", delete=False) as target:
+        path = target.name
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total_bytes += len(chunk)
+            if total_bytes > MAX_IMPORT_BYTES:
+                target.close()
+                os.remove(path)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File size exceeds {MAX_IMPORT_BYTES // (1024 * 1024)}MB limit"
+                )
+            target.write(chunk)
+
+    job = ImportJob(
+        user_id=current_user.id,
+        tree_id=tree_id,
+        format="gedcom",
+        filename=file.filename,
+        total_bytes=total_bytes
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    background_tasks.add_task(run_gedcom_import, job.id, path, tree_id, current_user.id)
+    return job
+
+
+@router.get("/imports/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status and progress of an import job"""
+    result = await db.execute(
+        select(ImportJob).where(
+            and_(
+                ImportJob.id == job_id,
+                ImportJob.user_id == current_user.id
+            )
+        )
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.get("/{tree_id}/stats", response_model=TreeStatsResponse)
+async def get_tree_stats(
+    tree_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get dashboard statistics of a tree. Stored statistics are served while
+    the tree is unchanged and recomputed on the first request after a change.
+    """
+    result = await db.execute(
+        select(FamilyTree.revision, TreeStats)
+        .outerjoin(TreeStats, TreeStats.tree_id == FamilyTree.id)
+        .where(
+            and_(
+                FamilyTree.id == tree_id,
+                or_(
+                    FamilyTree.user_id == current_user.id,
+                    FamilyTree.id.in_(
+                        select(TreeShare.tree_id).where(
+                            and_(
+                                TreeShare.shared_with_user_id == current_user.id,
+                                TreeShare.is_accepted == True
+                            )
+                        )
+                    )
+                )
+            )
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Tree not found")
+
+    revision, stats = row
+    if stats is None or stats.revision != revision:
+        stats = await refresh_tree_stats(tree_id)
+    return TreeStatsResponse(
+        tree_id=tree_id,
+        revision=stats.revision,
+        computed_at=stats.computed_at,
+        **stats.stats
+    )
+
+
+async def _get_owned_tree(db: AsyncSession, tree_id: int, user_id: int) -> FamilyTree:
+    result = await db.execute(
+        select(FamilyTree).where(
+            and_(
+                FamilyTree.id == tree_id,
+                FamilyTree.user_id == user_id
+            )
+        )
+    )
+    tree = result.scalar_one_or_none()
+    if not tree:
+        raise HTTPException(status_code=404, detail="Tree not found or you don't have permission")
+    return tree
+
+
+@router.post(
+    "/{tree_id}/duplicates/scan",
+    response_model=DuplicateScanJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def scan_tree_duplicates(
+    tree_id: int,
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Look for duplicate people in a tree as a background job. Only members
+    changed since the last scan are rescanned unless full=true. Poll
+    /api/trees/duplicate-scans/{job_id} for progress.
+    """
+    await _get_owned_tree(db, tree_id, current_user.id)
+
+    job = DuplicateScanJob(user_id=current_user.id, tree_id=tree_id, full=full)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    background_tasks.add_task(run_duplicate_scan, job.id, tree_id, full)
+    return job
+
+
+@router.get("/duplicate-scans/{job_id}", response_model=DuplicateScanJobResponse)
+async def get_duplicate_scan_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status of a duplicate scan"""
+    result = await db.execute(
+        select(DuplicateScanJob).where(
+            and_(
+                DuplicateScanJob.id == job_id,
+                DuplicateScanJob.user_id == current_user.id
+            )
+        )
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Duplicate scan not found")
+    return job
+
+
+@router.get("/{tree_id}/duplicates", response_model=List[DuplicateSuggestionResponse])
+async def get_tree_duplicates(
+    tree_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get suggested duplicate pairs of a tree from the last scans, most likely first"""
+    await _get_owned_tree(db, tree_id, current_user.id)
+
+    member = aliased(FamilyMember)
+    duplicate = aliased(FamilyMember)
+    result = await db.execute(
+        select(DuplicateSuggestion, member, duplicate)
+        .join(member, member.id == DuplicateSuggestion.member_id)
+        .join(duplicate, duplicate.id == DuplicateSuggestion.duplicate_id)
+        .where(DuplicateSuggestion.tree_id == tree_id)
+        .order_by(desc(DuplicateSuggestion.score), DuplicateSuggestion.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    return [
+        DuplicateSuggestionResponse(
+            id=suggestion.id,
+            score=suggestion.score,
+            reasons=suggestion.reasons or [],
+            member=DuplicateCandidate.model_validate(first),
+            duplicate=DuplicateCandidate.model_validate(second)
+        )
+        for suggestion, first, second in result.all()
+    ]
+
+
 @router.post("/{tree_id}/share", response_model=TreeShareResponse)
 async def share_tree(
     tree_id: int,
     share_data: TreeShareCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Share a family tree with another user"""
@@ -486,7 +751,7 @@ async def share_tree(
 
 @router.get("/shares/pending", response_model=List[TreeShareResponse])
 async def get_pending_shares(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all pending share invitations for the current user"""
@@ -524,7 +789,7 @@ async def get_pending_shares(
 @router.post("/shares/{share_id}/accept")
 async def accept_share(
     share_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Accept a tree share invitation"""
@@ -551,7 +816,7 @@ async def accept_share(
 @router.delete("/shares/{share_id}")
 async def remove_share(
     share_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Remove a tree share (owner can revoke, recipient can decline/leave)"""
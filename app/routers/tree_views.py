@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from app.database import get_db
-from app.models import TreeView, User
-from app.auth import get_current_user
+from app.models import TreeView
+from app.auth import get_current_user, Principal
+from app.revisions import content_etag, etag_matches, set_etag, not_modified
 
 router = APIRouter(prefix="/api/tree-views", tags=["tree_views"])
 
@@ -48,7 +49,9 @@ class TreeViewResponse(BaseModel):
 
 @router.get("/", response_model=List[TreeViewResponse])
 async def get_user_tree_views(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all tree views for the current user."""
@@ -57,14 +60,19 @@ async def get_user_tree_views(
         .where(TreeView.user_id == current_user.id)
         .order_by(TreeView.is_default.desc(), TreeView.created_at.desc())
     )
-    views = result.scalars().all()
+    views = [TreeViewResponse.model_validate(view) for view in result.scalars().all()]
+
+    etag = content_etag([current_user.id, views])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return views
 
 
 @router.get("/{view_id}", response_model=TreeViewResponse)
 async def get_tree_view(
     view_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific tree view."""
@@ -88,7 +96,7 @@ async def get_tree_view(
 @router.post("/", response_model=TreeViewResponse, status_code=status.HTTP_201_CREATED)
 async def create_tree_view(
     view_data: TreeViewCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new tree view."""
@@ -121,7 +129,7 @@ async def create_tree_view(
 async def update_tree_view(
     view_id: int,
     view_data: TreeViewUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update an existing tree view."""
@@ -170,7 +178,7 @@ async def update_tree_view(
 @router.delete("/{view_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_tree_view(
     view_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a tree view."""
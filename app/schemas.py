@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 
 
 class UserCreate(BaseModel):
@@ -31,6 +31,12 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # Seconds until the access token expires
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 class FamilyMemberBase(BaseModel):
@@ -47,7 +53,7 @@ class FamilyMemberBase(BaseModel):
     occupation: Optional[str] = None
     bio: Optional[str] = None
     photo_url: Optional[str] = None  # Deprecated - kept for backward compatibility
-    profile_picture_data: Optional[str] = None  # Base64-encoded image data
+    profile_picture_data: Optional[str] = None  # Base64-encoded image data (write-only, stored as a photo blob)
     profile_picture_mime_type: Optional[str] = None  # MIME type (e.g., 'image/jpeg')
     social_media: Optional[Dict[str, Any]] = None
     previous_partners: Optional[str] = None
@@ -83,9 +89,20 @@ class FamilyMemberUpdate(BaseModel):
     mother_id: Optional[int] = None
 
 
+class FamilyMemberBulkCreate(FamilyMemberCreate):
+    temp_id: Optional[str] = None  # Client-side id other members of the batch can reference
+    father_ref: Optional[str] = None  # temp_id of the father within the batch
+    mother_ref: Optional[str] = None  # temp_id of the mother within the batch
+
+
+class FamilyMemberBulkUpdate(FamilyMemberUpdate):
+    id: int
+
+
 class FamilyMemberResponse(FamilyMemberBase):
     id: int
     user_id: int
+    photo_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -93,6 +110,12 @@ class FamilyMemberResponse(FamilyMemberBase):
         from_attributes = True
 
 
+class NodePosition(BaseModel):
+    generation: int
+    x: float
+    y: float
+
+
 class FamilyTreeNode(BaseModel):
     id: int
     first_name: str
@@ -115,10 +138,103 @@ class FamilyTreeNode(BaseModel):
     father_id: Optional[int] = None
     mother_id: Optional[int] = None
     children: List[int] = []
+    position: Optional[NodePosition] = None  # Only with layout=true
+    hidden_parents: Optional[int] = None  # Only with focus=: parents outside the window
+    hidden_children: Optional[int] = None  # Only with focus=: children outside the window
 
     class Config:
         from_attributes = True
 
+
+class PhotoRef(BaseModel):
+    id: int
+    hash: str
+    url: str  # Smallest (avatar-sized) variant
+
+
+class RelativeNode(BaseModel):
+    """Ancestor or descendant of a member, depth generations away."""
+    id: int
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    gender: Optional[str] = None
+    birth_date: Optional[date] = None
+    death_date: Optional[date] = None
+    father_id: Optional[int] = None
+    mother_id: Optional[int] = None
+    photo: Optional[PhotoRef] = None
+    depth: int
+
+
+class MemberSearchResult(BaseModel):
+    """Member matching a search, best matches first."""
+    id: int
+    tree_id: Optional[int] = None
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    nickname: Optional[str] = None
+    gender: Optional[str] = None
+    birth_date: Optional[date] = None
+    death_date: Optional[date] = None
+    birth_place: Optional[str] = None
+    photo: Optional[PhotoRef] = None
+    rank: float
+
+
+class RelationshipStep(BaseModel):
+    """One member on the path connecting two relatives."""
+    id: int
+    first_name: str
+    last_name: str
+    link: Optional[str] = None  # How this member relates to the previous step: parent, child or partner
+
+
+class Relationship(BaseModel):
+    """What member a is to member b ("a is b's ...")."""
+    a: int
+    b: int
+    relationship: str
+    blood: bool  # False for relationships by marriage
+    common_ancestors: List[int] = []
+    path: List[RelationshipStep]
+
+
+class FamilyTreeNodeLean(BaseModel):
+    """Tree node without inline image data; photos are fetched via PhotoRef."""
+    id: int
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    nickname: Optional[str] = None
+    gender: Optional[str] = None
+    birth_date: Optional[date] = None
+    death_date: Optional[date] = None
+    birth_place: Optional[str] = None
+    location: Optional[str] = None
+    country: Optional[str] = None
+    occupation: Optional[str] = None
+    bio: Optional[str] = None
+    photo_url: Optional[str] = None  # Deprecated file path only, never a data URL
+    photo: Optional[PhotoRef] = None
+    social_media: Optional[Dict[str, Any]] = None
+    previous_partners: Optional[str] = None
+    father_id: Optional[int] = None
+    mother_id: Optional[int] = None
+    children: List[int] = []
+    position: Optional[NodePosition] = None  # Only with layout=true
+    hidden_parents: Optional[int] = None  # Only with focus=: parents outside the window
+    hidden_children: Optional[int] = None  # Only with focus=: children outside the window
+
+
+class TreeChanges(BaseModel):
+    tree_id: int
+    since: int
+    revision: int  # Pass as since= on the next call
+    members: List[FamilyTreeNodeLean]  # Created or updated (incl. parents whose children changed)
+    deleted: List[int]  # Ids of members deleted or moved to another tree
+
 # Admin Schemas
 class AdminUserCreate(BaseModel):
     username: str
@@ -182,6 +298,30 @@ class BackupResponse(BaseModel):
         from_attributes = True
 
 
+class CacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class HashStats(BaseModel):
+    workers: int
+    queue_limit: int
+    queue_depth: int
+    in_progress: int
+    completed: int
+    failed: int
+    rejected: int
+    hash_ms_p50: float
+    hash_ms_p99: float
+    total_ms_p50: float
+    total_ms_p99: float
+
+
 class DashboardStats(BaseModel):
     total_users: int
     active_users: int
@@ -246,6 +386,84 @@ class FamilyTreeResponse(FamilyTreeBase):
 
 
 # Tree Share Schemas
+class ImportJobResponse(BaseModel):
+    id: int
+    tree_id: int
+    format: str
+    filename: Optional[str] = None
+    status: str
+    total_bytes: int
+    processed_bytes: int
+    members_imported: int
+    members_linked: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DuplicateScanJobResponse(BaseModel):
+    id: int
+    tree_id: int
+    full: bool
+    status: str
+    members_scanned: int
+    pairs_compared: int
+    suggestions_found: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DuplicateCandidate(BaseModel):
+    id: int
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    birth_date: Optional[date] = None
+    death_date: Optional[date] = None
+    birth_place: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DuplicateSuggestionResponse(BaseModel):
+    """Two members that probably describe the same person."""
+    id: int
+    score: float  # 0..1
+    reasons: List[str] = []
+    member: DuplicateCandidate
+    duplicate: DuplicateCandidate
+
+
+class StatCount(BaseModel):
+    value: Optional[Union[int, str]] = None
+    count: int
+
+
+class TreeStatsResponse(BaseModel):
+    """Dashboard statistics of a tree, as of revision."""
+    tree_id: int
+    revision: int
+    computed_at: datetime
+    member_count: int
+    generation_count: int
+    members_per_generation: List[StatCount]  # value: generation, 0 = members without parents
+    gender: List[StatCount]
+    lifespans: List[StatCount]  # value: lifespan decade in years (0, 10, 20, ...)
+    average_lifespan: Optional[float] = None
+    birth_decades: List[StatCount]  # value: e.g. 1920
+    top_surnames: List[StatCount]
+    top_countries: List[StatCount]
+
+
 class TreeShareCreate(BaseModel):
     tree_id: int
     shared_with_username: str
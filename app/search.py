@@ -0,0 +1,85 @@
+"""
+Member search queries.
+
+Text mode:
+
+Full-text matching runs against the generated family_members.search_vector
+column (GIN-indexed): every word of the query must match, as a prefix, a
+word in a member's names, places, occupation or bio. Names are also matched
+by trigram word similarity against search_name, so misspelled names
+("Jonh Smyth") still find the member. Both conditions are index scans that
+PostgreSQL combines with a bitmap OR.
+
+Phonetic mode compares Soundex keys of the query words with the stored keys
+of first and last names (app/phonetic.py), so spelling variants match
+through a B-tree lookup.
+"""
+
+import re
+from typing import Optional
+from sqlalchemy import select, func, or_, and_, case, desc, literal, literal_column
+from app.models import FamilyMember
+from app.phonetic import soundex
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Text search configuration of search_vector (no stemming: mostly names)
+_TS_CONFIG = literal_column("'simple'::regconfig")
+
+
+def prefix_tsquery(q: str) -> Optional[str]:
+    """to_tsquery text requiring every word of q as a prefix, or None if q has no words."""
+    words = _WORD_RE.findall(q.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def member_search_query(q: str, user_id: int, tree_id: Optional[int], *columns):
+    """
+    SELECT of the given columns plus a "rank" column for members matching
+    q, best match first. The caller adds LIMIT/OFFSET.
+    """
+    tsquery = func.to_tsquery(_TS_CONFIG, prefix_tsquery(q))
+    name = " ".join(_WORD_RE.findall(q.lower()))
+    rank = func.greatest(
+        func.ts_rank(FamilyMember.search_vector, tsquery),
+        func.word_similarity(name, FamilyMember.search_name)
+    ).label("rank")
+
+    query = select(*columns, rank).where(
+        FamilyMember.user_id == user_id,
+        or_(
+            FamilyMember.search_vector.op("@@")(tsquery),
+            # search_name %> name: word similarity above pg_trgm.word_similarity_threshold
+            FamilyMember.search_name.op("%>")(name)
+        )
+    )
+    if tree_id is not None:
+        query = query.where(FamilyMember.tree_id == tree_id)
+    return query.order_by(desc(rank), FamilyMember.id)
+
+
+def phonetic_keys_of_query(q: str):
+    """Soundex keys of the words of q that have one."""
+    return [key for key in map(soundex, _WORD_RE.findall(q)) if key]
+
+
+def member_phonetic_query(q: str, user_id: int, tree_id: Optional[int], *columns):
+    """
+    Like member_search_query, by Soundex key. A single word matches first or
+    last names (last names ranked first); with more words the first one
+    must sound like the first name and the last one like the last name.
+    """
+    keys = phonetic_keys_of_query(q)
+    if len(keys) == 1:
+        match = or_(FamilyMember.last_name_soundex == keys[0], FamilyMember.first_name_soundex == keys[0])
+        rank = case((FamilyMember.last_name_soundex == keys[0], 1.0), else_=0.5).label("rank")
+    else:
+        match = and_(FamilyMember.first_name_soundex == keys[0], FamilyMember.last_name_soundex == keys[-1])
+        rank = literal(1.0).label("rank")
+
+    query = select(*columns, rank).where(FamilyMember.user_id == user_id, match)
+    if tree_id is not None:
+        query = query.where(FamilyMember.tree_id == tree_id)
+    return query.order_by(desc(rank), FamilyMember.last_name, FamilyMember.first_name, FamilyMember.id)
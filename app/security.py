@@ -12,8 +12,8 @@ import re
 import secrets
 import hashlib
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from collections import defaultdict
+from typing import Optional, Any
+from collections import OrderedDict
 from fastapi import Request, HTTPException, status
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
@@ -41,6 +41,8 @@ RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
 RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
 LOGIN_RATE_LIMIT = int(os.getenv("LOGIN_RATE_LIMIT", "5"))
 LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", "300"))  # 5 minutes
+# Clients tracked at once; the least recently seen are forgotten beyond this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
 
 # File Upload Security
 # OWASP ASVS 12.1.1-3, NIST SP 800-53 SI-10
@@ -123,15 +125,44 @@ class PasswordValidator:
         return True
 
 
+class _RateWindow:
+    """Sliding-window counter state of one client: constant size."""
+
+    __slots__ = ("start", "count", "previous", "window")
+
+    def __init__(self, start: float, window: int):
+        self.start = start  # Start of the current fixed window
+        self.count = 0  # Requests in the current window
+        self.previous = 0  # Requests in the window before it
+        self.window = window
+
+
 class RateLimiter:
     """
     Rate limiting implementation for brute force protection.
     NIST SP 800-53 SC-5, OWASP ASVS 2.2.1
+
+    Sliding-window counter: the request count of the previous fixed window,
+    weighted by how much of it still overlaps the sliding window, plus the
+    count of the current one. Each client costs two counters, clients idle
+    for two windows are dropped, and at most max_keys clients are tracked
+    (least recently seen first out). A tracked client takes about 180 bytes,
+    a little more than a one-entry timestamp list; what the counter bounds
+    is the number of clients, not their size.
     """
 
-    def __init__(self):
-        self.requests: Dict[str, list[float]] = defaultdict(list)
-        self.login_attempts: Dict[str, list[float]] = defaultdict(list)
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # Least recently seen first
+        self._windows: "OrderedDict[str, _RateWindow]" = OrderedDict()
+
+    def _evict(self, now: float):
+        windows = self._windows
+        while windows:
+            oldest = next(iter(windows.values()))
+            if len(windows) <= self.max_keys and now - oldest.start < 2 * oldest.window:
+                break
+            windows.popitem(last=False)
 
     def check_rate_limit(self, identifier: str, limit: int = RATE_LIMIT_REQUESTS,
                         window: int = RATE_LIMIT_WINDOW_SECONDS) -> bool:
@@ -149,22 +180,27 @@ class RateLimiter:
         if not RATE_LIMIT_ENABLED:
             return True
 
-        current_time = time.time()
-        cutoff_time = current_time - window
-
-        # Clean old requests
-        self.requests[identifier] = [
-            req_time for req_time in self.requests[identifier]
-            if req_time > cutoff_time
-        ]
-
-        # Check limit
-        if len(self.requests[identifier]) >= limit:
-            return False
-
-        # Add current request
-        self.requests[identifier].append(current_time)
-        return True
+        current_time = time.monotonic()
+        state = self._windows.get(identifier)
+        if state is None:
+            state = self._windows[identifier] = _RateWindow(current_time, window)
+        else:
+            self._windows.move_to_end(identifier)
+
+        elapsed = current_time - state.start
+        if elapsed >= window:
+            # Roll over; after more than one idle window nothing carries over
+            state.previous = state.count if elapsed < 2 * window else 0
+            state.count = 0
+            state.start += window * int(elapsed // window)
+            elapsed = current_time - state.start
+
+        estimate = state.previous * (1 - elapsed / window) + state.count
+        allowed = estimate < limit
+        if allowed:
+            state.count += 1
+        self._evict(current_time)
+        return allowed
 
     def check_login_rate_limit(self, identifier: str) -> bool:
         """
@@ -178,9 +214,7 @@ class RateLimiter:
 
     def reset_login_attempts(self, identifier: str):
         """Reset login attempts after successful authentication."""
-        key = f"login_{identifier}"
-        if key in self.requests:
-            self.requests[key] = []
+        self._windows.pop(f"login_{identifier}", None)
 
 
 # Global rate limiter instance
@@ -0,0 +1,101 @@
+"""
+In-process cache of serialized family tree responses.
+
+Building a tree response means loading every member, mapping children and
+instantiating a node per member. The finished JSON body is kept here, keyed
+by (user, tree_id, tree version, variant), so repeated loads of an unchanged
+tree are served straight from memory.
+
+The cache is bounded by the total size of the cached bodies and evicts the
+least recently used entries first. Because keys include the tree version, a
+write never makes a stale body reachable; writes still invalidate the
+affected entries explicitly so the memory is released right away.
+
+Each worker process has its own cache.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+# Upper bound on the total size of cached response bodies
+TREE_CACHE_MAX_BYTES = int(os.getenv("TREE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# (user_id, tree_id, version, variant)
+CacheKey = Tuple[int, Optional[int], str, Hashable]
+
+
+class ResponseCache:
+    """LRU cache of response bodies, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: CacheKey, body: bytes):
+        # A body larger than the whole budget would only flush everything else
+        if len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = body
+        self.current_bytes += len(body)
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= len(evicted)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int, tree_ids: Iterable[Optional[int]] = ()):
+        """
+        Drop the given trees' entries, and the user's all-trees (tree_id=None)
+        entries, which include the members of every tree.
+        """
+        tree_ids = {tree_id for tree_id in tree_ids if tree_id is not None}
+        stale = [
+            key for key in self._entries
+            if key[1] in tree_ids or (key[0] == user_id and key[1] is None)
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: CacheKey):
+        body = self._entries.pop(key, None)
+        if body is not None:
+            self.current_bytes -= len(body)
+
+
+tree_response_cache = ResponseCache(TREE_CACHE_MAX_BYTES)
+
+
+def invalidate_tree_responses(user_id: int, *tree_ids: Optional[int]):
+    """Release cached responses made stale by a write to the given trees."""
+    tree_response_cache.invalidate(user_id, tree_ids)
@@ -0,0 +1,73 @@
+"""
+Set-based copy of a tree's members.
+
+Copying runs as one INSERT ... SELECT on the database server instead of a
+flush per member: new ids are drawn from the sequence into an old -> new
+mapping, and parent ids are remapped through that mapping while inserting.
+Photos are content-addressed, so copies share the original's blobs.
+"""
+
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import FamilyMember
+
+# Columns that are set for the copy rather than taken from the source row
+_REMAPPED_COLUMNS = {
+    "id", "user_id", "tree_id", "father_id", "mother_id", "revision", "created_at", "updated_at",
+}
+_COPIED_COLUMNS = [
+    column.name for column in FamilyMember.__table__.columns
+    if column.name not in _REMAPPED_COLUMNS and column.computed is None
+]
+
+_COPY_MEMBERS = text(f"""
+    WITH source AS (
+        SELECT * FROM family_members WHERE tree_id = :source_tree_id
+    ), mapping AS MATERIALIZED (
+        SELECT id AS old_id, nextval(pg_get_serial_sequence('family_members', 'id')) AS new_id
+        FROM source
+    ), inserted AS (
+        INSERT INTO family_members (
+            id, user_id, tree_id, father_id, mother_id, revision, created_at, updated_at,
+            {", ".join(_COPIED_COLUMNS)}
+        )
+        SELECT
+            m.new_id, :user_id, :target_tree_id, fm.new_id, mm.new_id, 0, now(), now(),
+            {", ".join(f"s.{name}" for name in _COPIED_COLUMNS)}
+        FROM source s
+        JOIN mapping m ON m.old_id = s.id
+        LEFT JOIN mapping fm ON fm.old_id = s.father_id
+        LEFT JOIN mapping mm ON mm.old_id = s.mother_id
+        RETURNING id, photo_url
+    )
+    SELECT
+        count(*),
+        array_agg(id) FILTER (WHERE photo_url IS NOT NULL),
+        array_agg(photo_url) FILTER (WHERE photo_url IS NOT NULL)
+    FROM inserted
+""")
+
+
+async def copy_tree_members(
+    db: AsyncSession,
+    source_tree_id: int,
+    target_tree_id: int,
+    user_id: int
+) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Copy every member of source_tree_id into target_tree_id, owned by
+    user_id, in one statement. Parent links inside the source tree point to
+    the copies; links to members of other trees are dropped.
+
+    Returns the number of copied members and (new id, photo_url) of copies
+    that still use the deprecated photo_url field, whose files callers may
+    want to duplicate.
+    """
+    result = await db.execute(_COPY_MEMBERS, {
+        "source_tree_id": source_tree_id,
+        "target_tree_id": target_tree_id,
+        "user_id": user_id,
+    })
+    copied, member_ids, photo_urls = result.one()
+    return copied, list(zip(member_ids or [], photo_urls or []))
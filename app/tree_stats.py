@@ -0,0 +1,127 @@
+"""
+Per-tree statistics for the tree dashboard.
+
+Statistics are computed with SQL aggregates (generations by a recursive
+query over parent links) on one snapshot, and stored in tree_stats together
+with the tree revision they describe. Reads are a single-row lookup; the
+first read after a write sees an older revision and recomputes.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Tuple
+from sqlalchemy import select, func, text, extract, cast, Integer
+from sqlalchemy.dialects.postgresql import insert
+from app.database import async_session_maker
+from app.models import FamilyMember, FamilyTree, TreeStats
+
+# Entries in top-N lists (surnames, countries)
+STATS_TOP_N = 10
+# Deepest generation numbered; guards against parent cycles
+MAX_GENERATIONS = 500
+
+# Longest line of descent from a root (a member without parents in the
+# tree). UNION drops duplicate (member, generation) rows, so pedigree
+# collapse does not multiply the work.
+_GENERATION_COUNTS = text("""
+    WITH RECURSIVE generations AS (
+        SELECT m.id, 0 AS generation
+        FROM family_members m
+        WHERE m.tree_id = :tree_id
+          AND NOT EXISTS (
+              SELECT 1 FROM family_members p
+              WHERE p.id IN (m.father_id, m.mother_id) AND p.tree_id = :tree_id
+          )
+        UNION
+        SELECT c.id, g.generation + 1
+        FROM generations g
+        JOIN family_members c ON c.father_id = g.id OR c.mother_id = g.id
+        WHERE c.tree_id = :tree_id AND g.generation < :max_generations
+    ), numbered AS (
+        SELECT id, max(generation) AS generation FROM generations GROUP BY id
+    )
+    SELECT generation, count(*) FROM numbered GROUP BY generation ORDER BY generation
+""")
+
+
+def _counts(rows) -> list:
+    return [{"value": value, "count": count} for value, count in rows]
+
+
+async def compute_tree_stats(tree_id: int) -> Tuple[int, Dict[str, Any]]:
+    """(tree revision, statistics) of a tree, read from one snapshot."""
+    async with async_session_maker() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        in_tree = FamilyMember.tree_id == tree_id
+
+        revision = await db.scalar(select(FamilyTree.revision).where(FamilyTree.id == tree_id)) or 0
+        member_count = await db.scalar(select(func.count(FamilyMember.id)).where(in_tree))
+
+        result = await db.execute(_GENERATION_COUNTS, {"tree_id": tree_id, "max_generations": MAX_GENERATIONS})
+        generations = _counts(result.all())
+
+        # Expressions with parameters are grouped by label: each use would
+        # otherwise get its own bind parameter and no longer match
+        gender = func.coalesce(FamilyMember.gender, "Unknown").label("gender_name")
+        result = await db.execute(
+            select(gender, func.count()).where(in_tree).group_by("gender_name").order_by(func.count().desc())
+        )
+        genders = _counts(result.all())
+
+        age = extract("year", func.age(FamilyMember.death_date, FamilyMember.birth_date))
+        has_lifespan = (
+            in_tree,
+            FamilyMember.birth_date.isnot(None),
+            FamilyMember.death_date.isnot(None),
+            FamilyMember.death_date >= FamilyMember.birth_date,
+        )
+        lifespan_bucket = ((cast(age, Integer) // 10) * 10).label("lifespan")
+        result = await db.execute(
+            select(lifespan_bucket, func.count()).where(*has_lifespan)
+            .group_by("lifespan").order_by("lifespan")
+        )
+        lifespans = _counts(result.all())
+        average_lifespan = await db.scalar(select(func.avg(age)).where(*has_lifespan))
+
+        decade = ((cast(extract("year", FamilyMember.birth_date), Integer) // 10) * 10).label("decade")
+        result = await db.execute(
+            select(decade, func.count()).where(in_tree, FamilyMember.birth_date.isnot(None))
+            .group_by("decade").order_by("decade")
+        )
+        birth_decades = _counts(result.all())
+
+        top = {}
+        for name, column in (("top_surnames", FamilyMember.last_name), ("top_countries", FamilyMember.country)):
+            result = await db.execute(
+                select(column, func.count()).where(in_tree, column.isnot(None), column != "")
+                .group_by(column).order_by(func.count().desc(), column).limit(STATS_TOP_N)
+            )
+            top[name] = _counts(result.all())
+
+    return revision, {
+        "member_count": member_count,
+        "generation_count": len(generations),
+        "members_per_generation": generations,
+        "gender": genders,
+        "lifespans": lifespans,
+        "average_lifespan": round(float(average_lifespan), 1) if average_lifespan is not None else None,
+        "birth_decades": birth_decades,
+        **top,
+    }
+
+
+async def refresh_tree_stats(tree_id: int) -> TreeStats:
+    """Recompute a tree's statistics and store them."""
+    revision, stats = await compute_tree_stats(tree_id)
+    values = {"tree_id": tree_id, "revision": revision, "stats": stats, "computed_at": datetime.utcnow()}
+    async with async_session_maker() as db:
+        statement = insert(TreeStats).values(**values)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TreeStats.tree_id],
+                set_={key: value for key, value in values.items() if key != "tree_id"},
+                # A concurrent refresh may already have stored a newer revision
+                where=TreeStats.revision <= statement.excluded.revision
+            )
+        )
+        await db.commit()
+    return TreeStats(**values)
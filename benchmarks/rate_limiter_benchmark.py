@@ -0,0 +1,102 @@
+"""
+Benchmark: the timestamp-list rate limiter vs. the sliding-window counter.
+
+Sends requests from N distinct client IPs (one request each, as a scan
+would) and then a burst from a single client, through both limiters, and
+prints the time per check and the memory the limiter holds afterwards.
+No database is needed.
+
+Usage:
+    python benchmarks/rate_limiter_benchmark.py --clients 100000
+
+Results on one CPU, 100k clients (the scan column is the per-check cost of
+the distinct-IP scan, burst the cost for the single hot client):
+
+    limiter                 scan        holds               burst
+    timestamp lists         1.8-2.9 us  14.3 MiB            23-41 us
+    sliding-window counter  2.6-3.3 us  17.1 MiB            1.5-1.7 us
+                                        (1.8 MiB at --max-keys 10000)
+
+Per client the counter holds a little more than a one-entry timestamp list,
+mostly for the LRU order; its memory is bounded by max_keys and idle
+eviction, not smaller per key.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.security import RateLimiter  # noqa: E402
+
+
+class LegacyRateLimiter:
+    """The previous RateLimiter: a list of request timestamps per client."""
+
+    def __init__(self):
+        self.requests = defaultdict(list)
+
+    def check_rate_limit(self, identifier: str, limit: int = 100, window: int = 60) -> bool:
+        current_time = time.time()
+        cutoff_time = current_time - window
+        self.requests[identifier] = [
+            req_time for req_time in self.requests[identifier]
+            if req_time > cutoff_time
+        ]
+        if len(self.requests[identifier]) >= limit:
+            return False
+        self.requests[identifier].append(current_time)
+        return True
+
+
+def client_ips(count: int):
+    return [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(count)]
+
+
+def run(label: str, make_limiter, ips, burst: int, limit: int):
+    limiter = make_limiter()
+    gc.collect()
+    started = time.perf_counter()
+    for ip in ips:
+        limiter.check_rate_limit(ip, limit, 60)
+    scan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    allowed = sum(limiter.check_rate_limit("192.0.2.1", limit, 60) for _ in range(burst))
+    single = time.perf_counter() - started
+
+    # Memory is measured on a second run: tracing slows down every allocation
+    del limiter
+    gc.collect()
+    tracemalloc.start()
+    limiter = make_limiter()
+    for ip in ips:
+        limiter.check_rate_limit(ip, limit, 60)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"  {label:<22} scan {scan / len(ips) * 1e6:6.2f} us/check  "
+          f"holds {held / 1024 / 1024:7.1f} MiB  "
+          f"burst {single / burst * 1e6:6.2f} us/check ({allowed} allowed)")
+
+
+def main(clients: int, burst: int, limit: int, max_keys: int):
+    ips = client_ips(clients)
+    print(f"{clients} distinct clients, then {burst} requests from one client (limit {limit}/60s)")
+    run("timestamp lists", LegacyRateLimiter, ips, burst, limit)
+    run("sliding-window counter", lambda: RateLimiter(max_keys=max_keys), ips, burst, limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--burst", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--max-keys", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.clients, args.burst, args.limit, args.max_keys)
@@ -0,0 +1,80 @@
+-- Migration 010: Content-Addressed Photo Store
+-- Moves profile pictures out of family_members (base64 TEXT) into a binary
+-- photo_blobs table keyed by SHA-256. Identical pictures are stored once and
+-- shared by every member (and copied tree) that references them.
+
+-- Create photo_blobs table
+CREATE TABLE IF NOT EXISTS photo_blobs (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    data BYTEA NOT NULL,
+    mime_type VARCHAR(50) NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add photo_hash reference to family_members table
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS photo_hash VARCHAR(64) REFERENCES photo_blobs(sha256);
+CREATE INDEX IF NOT EXISTS idx_family_members_photo_hash ON family_members(photo_hash);
+
+-- Convert existing base64 pictures in batches of 500, committing after each
+-- batch so large installations never hold one huge transaction
+DO $$
+DECLARE
+    converted INTEGER;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'family_members' AND column_name = 'profile_picture_data'
+    ) THEN
+        RETURN;
+    END IF;
+
+    LOOP
+        WITH batch AS (
+            SELECT id,
+                   decode(profile_picture_data, 'base64') AS data,
+                   COALESCE(profile_picture_mime_type, 'application/octet-stream') AS mime_type
+            FROM family_members
+            WHERE profile_picture_data IS NOT NULL
+              AND photo_hash IS NULL
+              AND profile_picture_data ~ '^[A-Za-z0-9+/=[:space:]]+$'
+            ORDER BY id
+            LIMIT 500
+        ), blobs AS (
+            INSERT INTO photo_blobs (sha256, data, mime_type, size)
+            SELECT DISTINCT ON (encode(sha256(data), 'hex'))
+                   encode(sha256(data), 'hex'), data, mime_type, length(data)
+            FROM batch
+            ON CONFLICT (sha256) DO NOTHING
+        )
+        UPDATE family_members fm
+        SET photo_hash = encode(sha256(batch.data), 'hex')
+        FROM batch
+        WHERE fm.id = batch.id;
+
+        GET DIAGNOSTICS converted = ROW_COUNT;
+        EXIT WHEN converted = 0;
+        RAISE NOTICE 'Converted % profile pictures', converted;
+        COMMIT;
+    END LOOP;
+END $$;
+
+-- Drop the old base64 columns, but only once every valid picture has been
+-- converted (rows with undecodable data keep the columns in place for review)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'family_members' AND column_name = 'profile_picture_data'
+    ) AND NOT EXISTS (
+        SELECT 1 FROM family_members
+        WHERE profile_picture_data IS NOT NULL AND photo_hash IS NULL
+    ) THEN
+        ALTER TABLE family_members DROP COLUMN profile_picture_data;
+        ALTER TABLE family_members DROP COLUMN IF EXISTS profile_picture_mime_type;
+    END IF;
+END $$;
+
+-- Add comments
+COMMENT ON TABLE photo_blobs IS 'Content-addressed profile picture bytes, shared across members';
+COMMENT ON COLUMN family_members.photo_hash IS 'SHA-256 of the profile picture in photo_blobs';
@@ -0,0 +1,18 @@
+-- Migration 011: Photo Variants
+-- Stores resized WebP renditions (48px and 160px squares) of each photo blob.
+-- Pictures uploaded before this migration get their variants rendered on
+-- first request, so no backfill is needed here.
+
+-- Create photo_variants table
+CREATE TABLE IF NOT EXISTS photo_variants (
+    photo_hash VARCHAR(64) NOT NULL REFERENCES photo_blobs(sha256) ON DELETE CASCADE,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    mime_type VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (photo_hash, size)
+);
+
+-- Add comments
+COMMENT ON TABLE photo_variants IS 'Resized renditions of photo_blobs, keyed by the original hash';
+COMMENT ON COLUMN photo_variants.size IS 'Square edge length in pixels';
@@ -0,0 +1,7 @@
+-- Migration 012: Tree Revision Counter
+-- Adds a revision counter to family_trees that is bumped on every member
+-- change, used to version cached layouts and tree responses.
+
+ALTER TABLE family_trees ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN family_trees.revision IS 'Incremented whenever the tree''s members change';
@@ -0,0 +1,7 @@
+-- Migration 013: Parent Indexes
+-- Indexes family_members.father_id and mother_id so descendant lookups
+-- (recursive lineage queries, child lookups) no longer scan the table.
+-- CONCURRENTLY avoids blocking writes while large tables are indexed.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_father_id ON family_members(father_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_mother_id ON family_members(mother_id);
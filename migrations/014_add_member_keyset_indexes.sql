@@ -0,0 +1,7 @@
+-- Migration 014: Member Listing Indexes
+-- Composite indexes backing keyset pagination of /api/family/members, which
+-- filters by owner or tree and walks id order (WHERE id > :after_id).
+-- CONCURRENTLY avoids blocking writes while large tables are indexed.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_user_id_id ON family_members(user_id, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_tree_id_id ON family_members(tree_id, id);
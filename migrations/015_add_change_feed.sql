@@ -0,0 +1,21 @@
+-- Migration 015: Tree Change Feed
+-- Stamps each member with the tree revision of its last change and keeps
+-- tombstones for removed members, so clients can fetch only what changed
+-- since a revision (/api/family/tree/changes).
+
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS member_tombstones (
+    id SERIAL PRIMARY KEY,
+    tree_id INTEGER NOT NULL REFERENCES family_trees(id) ON DELETE CASCADE,
+    member_id INTEGER NOT NULL,
+    revision INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_tree_id_revision ON family_members(tree_id, revision);
+CREATE INDEX IF NOT EXISTS idx_member_tombstones_tree_id_revision ON member_tombstones(tree_id, revision);
+
+-- Add comments
+COMMENT ON COLUMN family_members.revision IS 'Tree revision at which the member last changed';
+COMMENT ON TABLE member_tombstones IS 'Members removed from a tree, by tree revision';
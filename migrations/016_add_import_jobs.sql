@@ -0,0 +1,23 @@
+-- Migration 016: Import Jobs
+-- Tracks background GEDCOM imports into a family tree and their progress.
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tree_id INTEGER NOT NULL REFERENCES family_trees(id) ON DELETE CASCADE,
+    format VARCHAR(20) NOT NULL DEFAULT 'gedcom',
+    filename VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    processed_bytes INTEGER NOT NULL DEFAULT 0,
+    members_imported INTEGER NOT NULL DEFAULT 0,
+    members_linked INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_import_jobs_user_id ON import_jobs(user_id);
+
+-- Add comments
+COMMENT ON TABLE import_jobs IS 'Background file imports (GEDCOM) and their progress';
@@ -0,0 +1,32 @@
+-- Migration 017: Member Search
+-- Full-text search over member names, places, occupation and bio
+-- (/api/family/search). search_vector is a generated tsvector column kept
+-- up to date by PostgreSQL on every write and indexed with GIN; search_name
+-- holds the lower-cased full name with a trigram index for typo-tolerant
+-- name matching. Adding the generated columns rewrites family_members once.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple',
+        coalesce(first_name, '') || ' ' || coalesce(middle_name, '') || ' ' ||
+        coalesce(last_name, '') || ' ' || coalesce(nickname, '')), 'A') ||
+    setweight(to_tsvector('simple',
+        coalesce(birth_place, '') || ' ' || coalesce(location, '') || ' ' ||
+        coalesce(occupation, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(bio, '')), 'C')
+) STORED;
+
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS search_name text GENERATED ALWAYS AS (
+    lower(
+        coalesce(first_name, '') || ' ' || coalesce(middle_name || ' ', '') ||
+        coalesce(last_name, '') || coalesce(' ' || nickname, '')
+    )
+) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_search_vector ON family_members USING gin(search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_search_name ON family_members USING gin(search_name gin_trgm_ops);
+
+-- Add comments
+COMMENT ON COLUMN family_members.search_vector IS 'Weighted full-text document: names (A), places and occupation (B), bio (C)';
+COMMENT ON COLUMN family_members.search_name IS 'Lower-cased full name and nickname, trigram-indexed for fuzzy matching';
@@ -0,0 +1,18 @@
+-- Migration 018: Phonetic Name Keys
+-- Soundex keys of first and last names, so spelling variants (Schmidt,
+-- Schmitt, Smith) are found with an index lookup (/api/family/search
+-- mode=phonetic). New and edited members get keys on write; existing rows
+-- are filled in by the admin phonetic backfill job.
+-- CONCURRENTLY avoids blocking writes while large tables are indexed.
+
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS first_name_soundex VARCHAR(4);
+ALTER TABLE family_members ADD COLUMN IF NOT EXISTS last_name_soundex VARCHAR(4);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_user_id_last_name_soundex
+    ON family_members(user_id, last_name_soundex, first_name_soundex);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_family_members_user_id_first_name_soundex
+    ON family_members(user_id, first_name_soundex);
+
+-- Add comments
+COMMENT ON COLUMN family_members.first_name_soundex IS 'Soundex key of first_name';
+COMMENT ON COLUMN family_members.last_name_soundex IS 'Soundex key of last_name';
@@ -0,0 +1,38 @@
+-- Migration 019: Duplicate Detection
+-- Background duplicate-person scans per tree and the ranked pairs of
+-- members they suggest merging.
+
+CREATE TABLE IF NOT EXISTS duplicate_scan_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tree_id INTEGER NOT NULL REFERENCES family_trees(id) ON DELETE CASCADE,
+    "full" BOOLEAN NOT NULL DEFAULT FALSE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    members_scanned INTEGER NOT NULL DEFAULT 0,
+    pairs_compared INTEGER NOT NULL DEFAULT 0,
+    suggestions_found INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS duplicate_suggestions (
+    id SERIAL PRIMARY KEY,
+    tree_id INTEGER NOT NULL REFERENCES family_trees(id) ON DELETE CASCADE,
+    member_id INTEGER NOT NULL REFERENCES family_members(id) ON DELETE CASCADE,
+    duplicate_id INTEGER NOT NULL REFERENCES family_members(id) ON DELETE CASCADE,
+    score DOUBLE PRECISION NOT NULL,
+    reasons JSON,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_duplicate_suggestions_pair UNIQUE (member_id, duplicate_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_duplicate_scan_jobs_user_id ON duplicate_scan_jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_duplicate_scan_jobs_tree_id ON duplicate_scan_jobs(tree_id);
+CREATE INDEX IF NOT EXISTS idx_duplicate_suggestions_tree_id_score ON duplicate_suggestions(tree_id, score);
+CREATE INDEX IF NOT EXISTS idx_duplicate_suggestions_duplicate_id ON duplicate_suggestions(duplicate_id);
+
+-- Add comments
+COMMENT ON TABLE duplicate_scan_jobs IS 'Background duplicate-person scans of a tree';
+COMMENT ON TABLE duplicate_suggestions IS 'Member pairs that probably describe the same person, with a 0..1 score';
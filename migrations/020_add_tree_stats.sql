@@ -0,0 +1,14 @@
+-- Migration 020: Tree Statistics
+-- Materialized per-tree statistics (/api/trees/{tree_id}/stats), stored
+-- with the tree revision they were computed at and recomputed on the first
+-- read after the tree changes.
+
+CREATE TABLE IF NOT EXISTS tree_stats (
+    tree_id INTEGER PRIMARY KEY REFERENCES family_trees(id) ON DELETE CASCADE,
+    revision INTEGER NOT NULL,
+    stats JSON NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add comments
+COMMENT ON TABLE tree_stats IS 'Per-tree statistics as of tree_stats.revision';
@@ -0,0 +1,9 @@
+-- Migration 021: Token Versions
+-- Access tokens carry the user's token_version. Bumping it (password
+-- change, deactivation, admin role change) revokes every token issued
+-- before, without a per-request users lookup.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+-- Add comments
+COMMENT ON COLUMN users.token_version IS 'Version embedded in access tokens; bumped to revoke them';
@@ -0,0 +1,23 @@
+-- Migration 022: Refresh Tokens
+-- Rotating refresh tokens (/api/auth/refresh). Only a SHA-256 hash of each
+-- token is stored. Renewing revokes the presented token; presenting a
+-- revoked token again revokes its whole family (every token descended from
+-- the same login).
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    family_id VARCHAR(32) NOT NULL,
+    token_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_id ON refresh_tokens(user_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family_id ON refresh_tokens(family_id);
+
+-- Add comments
+COMMENT ON TABLE refresh_tokens IS 'Issued refresh tokens, stored as hashes';
+COMMENT ON COLUMN refresh_tokens.family_id IS 'jti of the login token this token was rotated from';
+COMMENT ON COLUMN refresh_tokens.revoked_at IS 'Set when the token was rotated, reused or signed out';
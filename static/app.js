@@ -1,5 +1,7 @@
 // Global state
 let authToken = localStorage.getItem('authToken');
+let refreshToken = localStorage.getItem('refreshToken');
+let refreshTimer = null;
 let currentUser = null;
 let familyMembers = [];
 let currentMemberId = null;
@@ -12,14 +14,126 @@ let familyTrees = [];
 const API_BASE = '';
 
 // Initialize app
-document.addEventListener('DOMContentLoaded', () => {
+document.addEventListener('DOMContentLoaded', async () => {
     if (authToken) {
+        scheduleRefresh();
+        loadUser();
+    } else if (refreshToken && await refreshSession()) {
         loadUser();
     } else {
         showAuthContainer();
     }
 });
 
+// Other tabs share the tokens: follow their renewals and sign-outs
+window.addEventListener('storage', (event) => {
+    if (event.key !== null && event.key !== 'authToken' && event.key !== 'refreshToken') {
+        return;
+    }
+    authToken = localStorage.getItem('authToken');
+    refreshToken = localStorage.getItem('refreshToken');
+    if (!authToken && !refreshToken && currentUser) {
+        clearTimeout(refreshTimer);
+        currentUser = null;
+        showAuthContainer();
+    } else {
+        scheduleRefresh();
+    }
+});
+
+// Expiry of a JWT in milliseconds since the epoch, or null
+function tokenExpiry(token) {
+    try {
+        const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+        return JSON.parse(atob(payload)).exp * 1000;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Renew the access token after 70-80% of its remaining lifetime; the jitter
+// keeps tabs sharing a token from renewing at the same moment
+function scheduleRefresh() {
+    clearTimeout(refreshTimer);
+    const expiry = authToken && tokenExpiry(authToken);
+    if (refreshToken && expiry) {
+        const delay = (expiry - Date.now()) * (0.7 + Math.random() * 0.1);
+        refreshTimer = setTimeout(refreshSession, Math.max(0, delay));
+    }
+}
+
+// Store the tokens of a login or renewal
+function storeSession(data) {
+    authToken = data.access_token;
+    localStorage.setItem('authToken', authToken);
+    if (data.refresh_token) {
+        refreshToken = data.refresh_token;
+        localStorage.setItem('refreshToken', refreshToken);
+    }
+    scheduleRefresh();
+}
+
+let pendingRefresh = null;
+
+/**
+ * Exchange the refresh token for new tokens; false if it is no longer valid.
+ * Renewals are serialized across tabs: a refresh token is single-use, and
+ * presenting one that another tab already rotated signs every tab out.
+ */
+function refreshSession() {
+    if (!pendingRefresh) {
+        const staleToken = authToken;
+        const renew = () => renewSession(staleToken);
+        pendingRefresh = (navigator.locks ? navigator.locks.request('refresh-session', renew) : renew())
+            .finally(() => { pendingRefresh = null; });
+    }
+    return pendingRefresh;
+}
+
+async function renewSession(staleToken) {
+    // Another tab may have renewed while this one waited for the lock
+    authToken = localStorage.getItem('authToken');
+    refreshToken = localStorage.getItem('refreshToken');
+    if (authToken && authToken !== staleToken) {
+        scheduleRefresh();
+        return true;
+    }
+    if (!refreshToken) {
+        return false;
+    }
+    try {
+        const response = await fetch(`${API_BASE}/api/auth/refresh`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        if (!response.ok) {
+            refreshToken = null;
+            localStorage.removeItem('refreshToken');
+            return false;
+        }
+        storeSession(await response.json());
+        return true;
+    } catch (error) {
+        return false;
+    }
+}
+
+// fetch with the access token, renewed and retried once if it was rejected
+async function authFetch(url, options = {}) {
+    const send = () => fetch(url, {
+        ...options,
+        headers: { ...options.headers, 'Authorization': `Bearer ${authToken}` },
+    });
+    let response = await send();
+    if (response.status === 401 && await refreshSession()) {
+        response = await send();
+    }
+    return response;
+}
+
 // Authentication Functions
 function showLogin() {
     document.getElementById('login-form').style.display = 'block';
@@ -54,9 +168,7 @@ async function handleLogin(event) {
             throw new Error(error.detail || 'Login failed');
         }
 
-        const data = await response.json();
-        authToken = data.access_token;
-        localStorage.setItem('authToken', authToken);
+        storeSession(await response.json());
         await loadUser();
     } catch (error) {
         document.getElementById('login-error').textContent = error.message;
@@ -96,9 +208,7 @@ async function handleRegister(event) {
             throw new Error('Registration successful but login failed. Please login manually.');
         }
 
-        const loginData = await loginResponse.json();
-        authToken = loginData.access_token;
-        localStorage.setItem('authToken', authToken);
+        storeSession(await loginResponse.json());
         await loadUser();
     } catch (error) {
         document.getElementById('register-error').textContent = error.message;
@@ -107,12 +217,7 @@ async function handleRegister(event) {
 
 async function loadUser() {
     try {
-        const response = await fetch(`${API_BASE}/api/auth/me`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
-        });
-
+        const response = await authFetch(`${API_BASE}/api/auth/me`);
         if (!response.ok) {
             throw new Error('Failed to load user');
         }
@@ -129,9 +234,21 @@ async function loadUser() {
 }
 
 function logout() {
+    if (refreshToken) {
+        fetch(`${API_BASE}/api/auth/logout`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+        }).catch(() => {});
+    }
+    clearTimeout(refreshTimer);
     authToken = null;
+    refreshToken = null;
     currentUser = null;
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
     showAuthContainer();
 }
 
@@ -149,20 +266,17 @@ function showAppContainer() {
 async function loadFamilyTree() {
     try {
         const url = currentTreeId
-            ? `${API_BASE}/api/family/tree?tree_id=${currentTreeId}`
-            : `${API_BASE}/api/family/tree`;
+            ? `${API_BASE}/api/family/tree?lean=true&layout=true&tree_id=${currentTreeId}`
+            : `${API_BASE}/api/family/tree?lean=true&layout=true`;
 
-        const response = await fetch(url, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
-        });
+        const response = await authFetch(url);
 
         if (!response.ok) {
             throw new Error('Failed to load family tree');
         }
 
         familyMembers = await response.json();
+        await loadMemberPhotos(familyMembers);
         console.log('Loaded family members:', familyMembers);
         console.log('Photo URLs:', familyMembers.map(m => ({ name: `${m.first_name} ${m.last_name}`, photo_url: m.photo_url })));
         updateFamilySummary();
@@ -173,6 +287,38 @@ async function loadFamilyTree() {
     }
 }
 
+// Object URLs of fetched photos, keyed by their hash-versioned URL
+const photoObjectUrls = new Map();
+
+/**
+ * Fetch a photo once and return an object URL for it.
+ * Photo URLs are versioned by content hash, so the browser cache answers
+ * repeat loads and unchanged photos are only fetched once per session.
+ */
+async function fetchPhotoObjectUrl(url) {
+    if (!photoObjectUrls.has(url)) {
+        try {
+            const response = await authFetch(`${API_BASE}${url}`);
+            if (!response.ok) return null;
+            photoObjectUrls.set(url, URL.createObjectURL(await response.blob()));
+        } catch (error) {
+            console.error(`Failed to load photo ${url}:`, error);
+            return null;
+        }
+    }
+    return photoObjectUrls.get(url);
+}
+
+/**
+ * Resolve lean-tree photo references into photo_url values.
+ * The tree only needs avatar-sized images, so the smallest variant is used.
+ */
+async function loadMemberPhotos(members) {
+    await Promise.all(members.filter(m => m.photo).map(async member => {
+        member.photo_url = await fetchPhotoObjectUrl(member.photo.url);
+    }));
+}
+
 function renderFamilyTree() {
     const svg = d3.select('#tree-svg');
     svg.selectAll('*').remove();
@@ -190,11 +336,12 @@ function renderFamilyTree() {
     const width = document.getElementById('tree-svg').clientWidth;
 
     // Build partner relationships (people who have children together)
+    const membersById = new Map(familyMembers.map(m => [m.id, m]));
     const partnerPairs = new Map(); // Map of person ID to their partners
     familyMembers.forEach(member => {
         if (member.father_id && member.mother_id) {
-            const father = familyMembers.find(m => m.id === member.father_id);
-            const mother = familyMembers.find(m => m.id === member.mother_id);
+            const father = membersById.get(member.father_id);
+            const mother = membersById.get(member.mother_id);
             if (father && mother) {
                 if (!partnerPairs.has(father.id)) partnerPairs.set(father.id, new Set());
                 if (!partnerPairs.has(mother.id)) partnerPairs.set(mother.id, new Set());
@@ -210,217 +357,238 @@ function renderFamilyTree() {
     // Generation 2 = Children
     // Generation 3 = Grandchildren (youngest, at bottom)
     const generationLevels = new Map();
-    const processed = new Set();
+    const serverLayout = familyMembers.every(m => m.position);
 
-    function calculateGeneration(member, level = 0) {
-        if (processed.has(member.id)) return;
-        processed.add(member.id);
+    // Root members (those without parents - these are the oldest generation at the top)
+    const rootMembers = familyMembers.filter(m => !m.father_id && !m.mother_id);
 
-        const currentLevel = generationLevels.get(member.id) || 0;
-        generationLevels.set(member.id, Math.max(currentLevel, level));
+    if (serverLayout) {
+        // Generations come precomputed with the server-side layout
+        familyMembers.forEach(m => generationLevels.set(m.id, m.position.generation));
+    } else {
+        const processed = new Set();
 
-        // Process children (they go one level deeper/lower)
-        familyMembers.forEach(child => {
-            if (child.father_id === member.id || child.mother_id === member.id) {
-                calculateGeneration(child, level + 1);
-            }
-        });
-    }
+        function calculateGeneration(member, level = 0) {
+            if (processed.has(member.id)) return;
+            processed.add(member.id);
 
-    // Start from root members (those without parents - these are the oldest generation at the top)
-    const rootMembers = familyMembers.filter(m => !m.father_id && !m.mother_id);
-    if (rootMembers.length > 0) {
-        rootMembers.forEach(root => calculateGeneration(root, 0));
-    } else {
-        // If no clear roots, find the oldest generation and start from there
-        familyMembers.forEach(member => {
-            if (!generationLevels.has(member.id)) {
-                calculateGeneration(member, 0);
-            }
-        });
+            const currentLevel = generationLevels.get(member.id) || 0;
+            generationLevels.set(member.id, Math.max(currentLevel, level));
+
+            // Process children (they go one level deeper/lower)
+            familyMembers.forEach(child => {
+                if (child.father_id === member.id || child.mother_id === member.id) {
+                    calculateGeneration(child, level + 1);
+                }
+            });
+        }
+
+        // Start from root members
+        if (rootMembers.length > 0) {
+            rootMembers.forEach(root => calculateGeneration(root, 0));
+        } else {
+            // If no clear roots, find the oldest generation and start from there
+            familyMembers.forEach(member => {
+                if (!generationLevels.has(member.id)) {
+                    calculateGeneration(member, 0);
+                }
+            });
+        }
     }
 
     // Calculate dynamic height based on number of generations
     const generationGap = 180; // Vertical gap between generations (increased for better spacing)
-    const maxGeneration = Math.max(...Array.from(generationLevels.values()), 0);
+    let maxGeneration = 0;
+    generationLevels.forEach(level => { maxGeneration = Math.max(maxGeneration, level); });
     const height = Math.max(600, (maxGeneration + 2) * generationGap + 150);
 
     // Update SVG height dynamically
     svg.attr('height', height);
 
-    // Create a hierarchical structure
-    let actualRoots = rootMembers.length > 0 ? rootMembers : familyMembers;
-    const globalProcessedChildren = new Set();
-
-    // Create a virtual root to hold all root members
-    const treeData = {
-        id: 'virtual-root',
-        first_name: '',
-        last_name: '',
-        isVirtual: true,
-        children: actualRoots.map(rootMember => buildTreeHierarchy(rootMember, new Set(), globalProcessedChildren))
-    };
+    let allNodes;
+    let linkData;
 
-    const treeLayout = d3.tree().size([width - 100, height - 200]);
-    const root = d3.hierarchy(treeData);
-    treeLayout(root);
+    if (serverLayout) {
+        // Draw the precomputed positions; no client-side layout needed
+        allNodes = buildServerLayoutNodes(width);
+        linkData = buildServerLayoutLinks(allNodes);
+    } else {
+        // Create a hierarchical structure
+        let actualRoots = rootMembers.length > 0 ? rootMembers : familyMembers;
+        const globalProcessedChildren = new Set();
+
+        // Create a virtual root to hold all root members
+        const treeData = {
+            id: 'virtual-root',
+            first_name: '',
+            last_name: '',
+            isVirtual: true,
+            children: actualRoots.map(rootMember => buildTreeHierarchy(rootMember, new Set(), globalProcessedChildren))
+        };
 
-    // Get all nodes (exclude virtual root)
-    const allNodes = root.descendants().filter(d => !d.data.isVirtual);
+        const treeLayout = d3.tree().size([width - 100, height - 200]);
+        const root = d3.hierarchy(treeData);
+        treeLayout(root);
 
-    // Group nodes by generation level and apply generation-based layout
-    const generations = new Map();
+        // Get all nodes (exclude virtual root)
+        allNodes = root.descendants().filter(d => !d.data.isVirtual);
 
-    allNodes.forEach(node => {
-        const generation = generationLevels.get(node.data.id) || 0;
-        if (!generations.has(generation)) {
-            generations.set(generation, []);
-        }
-        generations.get(generation).push(node);
-        node.generation = generation;
-    });
+        // Group nodes by generation level and apply generation-based layout
+        const generations = new Map();
 
-    // Apply saved node positions if available, otherwise use generation-based layout
-    const hasAnySavedPositions = allNodes.some(node => currentNodePositions[node.data.id]);
+        allNodes.forEach(node => {
+            const generation = generationLevels.get(node.data.id) || 0;
+            if (!generations.has(generation)) {
+                generations.set(generation, []);
+            }
+            generations.get(generation).push(node);
+            node.generation = generation;
+        });
 
-    if (!hasAnySavedPositions) {
-        // Apply clean generation-based layout for initial view using bottom-up approach
-        const sortedGenerations = Array.from(generations.keys()).sort((a, b) => a - b);
-        const nodeSpacing = 250; // Minimum horizontal spacing between family groups (increased)
-        const siblingSpacing = 200; // Spacing between siblings (increased)
-        const partnerSpacing = 150; // Spacing between partners (increased)
+        // Apply saved node positions if available, otherwise use generation-based layout
+        const hasAnySavedPositions = allNodes.some(node => currentNodePositions[node.data.id]);
 
-        // Process generations from bottom to top (children first, then parents)
-        const reversedGenerations = [...sortedGenerations].reverse();
+        if (!hasAnySavedPositions) {
+            // Apply clean generation-based layout for initial view using bottom-up approach
+            const sortedGenerations = Array.from(generations.keys()).sort((a, b) => a - b);
+            const nodeSpacing = 250; // Minimum horizontal spacing between family groups (increased)
+            const siblingSpacing = 200; // Spacing between siblings (increased)
+            const partnerSpacing = 150; // Spacing between partners (increased)
 
-        reversedGenerations.forEach(gen => {
-            const nodesInGen = generations.get(gen);
-            const positioned = new Set();
+            // Process generations from bottom to top (children first, then parents)
+            const reversedGenerations = [...sortedGenerations].reverse();
 
-            // Group nodes by their parent pairs
-            const familyGroups = new Map(); // key: parent pair string, value: array of nodes
+            reversedGenerations.forEach(gen => {
+                const nodesInGen = generations.get(gen);
+                const positioned = new Set();
 
-            nodesInGen.forEach(node => {
-                const fatherId = node.data.father_id || 'none';
-                const motherId = node.data.mother_id || 'none';
-                const parentKey = [fatherId, motherId].sort().join('-');
+                // Group nodes by their parent pairs
+                const familyGroups = new Map(); // key: parent pair string, value: array of nodes
 
-                if (!familyGroups.has(parentKey)) {
-                    familyGroups.set(parentKey, []);
-                }
-                familyGroups.get(parentKey).push(node);
-            });
+                nodesInGen.forEach(node => {
+                    const fatherId = node.data.father_id || 'none';
+                    const motherId = node.data.mother_id || 'none';
+                    const parentKey = [fatherId, motherId].sort().join('-');
 
-            // Calculate positions for each family group
-            let currentX = 200; // Start position (increased margin)
-
-            Array.from(familyGroups.values()).forEach(familyGroup => {
-                // Check if these nodes are parents (have children)
-                const haveChildren = familyGroup.some(node =>
-                    allNodes.some(n => n.data.father_id === node.data.id || n.data.mother_id === node.data.id)
-                );
-
-                if (haveChildren) {
-                    // These are parents - position them above their children
-                    familyGroup.forEach(node => {
-                        // Find their children
-                        const children = allNodes.filter(n =>
-                            n.data.father_id === node.data.id || n.data.mother_id === node.data.id
-                        );
-
-                        if (children.length > 0 && children[0].x !== undefined) {
-                            // Position above children's center
-                            const childXPositions = children.map(c => c.x).filter(x => x !== undefined);
-                            const childCenterX = childXPositions.reduce((a, b) => a + b, 0) / childXPositions.length;
-
-                            // Check if this person has a partner
-                            if (partnerPairs.has(node.data.id)) {
-                                const partners = Array.from(partnerPairs.get(node.data.id));
-                                const partnerInGroup = familyGroup.find(n =>
-                                    partners.includes(n.data.id) && !positioned.has(n.data.id)
-                                );
-
-                                if (partnerInGroup) {
-                                    // Position partners on either side of children's center
-                                    node.x = childCenterX - partnerSpacing / 2;
-                                    partnerInGroup.x = childCenterX + partnerSpacing / 2;
-                                    positioned.add(partnerInGroup.data.id);
+                    if (!familyGroups.has(parentKey)) {
+                        familyGroups.set(parentKey, []);
+                    }
+                    familyGroups.get(parentKey).push(node);
+                });
+
+                // Calculate positions for each family group
+                let currentX = 200; // Start position (increased margin)
+
+                Array.from(familyGroups.values()).forEach(familyGroup => {
+                    // Check if these nodes are parents (have children)
+                    const haveChildren = familyGroup.some(node =>
+                        allNodes.some(n => n.data.father_id === node.data.id || n.data.mother_id === node.data.id)
+                    );
+
+                    if (haveChildren) {
+                        // These are parents - position them above their children
+                        familyGroup.forEach(node => {
+                            // Find their children
+                            const children = allNodes.filter(n =>
+                                n.data.father_id === node.data.id || n.data.mother_id === node.data.id
+                            );
+
+                            if (children.length > 0 && children[0].x !== undefined) {
+                                // Position above children's center
+                                const childXPositions = children.map(c => c.x).filter(x => x !== undefined);
+                                const childCenterX = childXPositions.reduce((a, b) => a + b, 0) / childXPositions.length;
+
+                                // Check if this person has a partner
+                                if (partnerPairs.has(node.data.id)) {
+                                    const partners = Array.from(partnerPairs.get(node.data.id));
+                                    const partnerInGroup = familyGroup.find(n =>
+                                        partners.includes(n.data.id) && !positioned.has(n.data.id)
+                                    );
+
+                                    if (partnerInGroup) {
+                                        // Position partners on either side of children's center
+                                        node.x = childCenterX - partnerSpacing / 2;
+                                        partnerInGroup.x = childCenterX + partnerSpacing / 2;
+                                        positioned.add(partnerInGroup.data.id);
+                                    } else {
+                                        node.x = childCenterX;
+                                    }
                                 } else {
                                     node.x = childCenterX;
                                 }
                             } else {
-                                node.x = childCenterX;
-                            }
-                        } else {
-                            // No positioned children yet, use sequential positioning
-                            node.x = currentX;
-                            currentX += siblingSpacing;
-                        }
-
-                        node.y = 80 + (gen * generationGap);
-                        positioned.add(node.data.id);
-                    });
-                } else {
-                    // These are leaf nodes (no children) - position them sequentially
-                    familyGroup.forEach((node) => {
-                        if (!positioned.has(node.data.id)) {
-                            // Check if this person has a partner in the same family group
-                            if (partnerPairs.has(node.data.id)) {
-                                const partners = Array.from(partnerPairs.get(node.data.id));
-                                const partnerInGroup = familyGroup.find(n =>
-                                    partners.includes(n.data.id) && !positioned.has(n.data.id)
-                                );
-
-                                if (partnerInGroup) {
-                                    // Position partners together
-                                    node.x = currentX;
-                                    partnerInGroup.x = currentX + partnerSpacing;
-                                    currentX += partnerSpacing + siblingSpacing;
-                                    positioned.add(partnerInGroup.data.id);
-                                } else {
-                                    node.x = currentX;
-                                    currentX += siblingSpacing;
-                                }
-                            } else {
+                                // No positioned children yet, use sequential positioning
                                 node.x = currentX;
                                 currentX += siblingSpacing;
                             }
 
                             node.y = 80 + (gen * generationGap);
                             positioned.add(node.data.id);
-                        }
-                    });
-                }
+                        });
+                    } else {
+                        // These are leaf nodes (no children) - position them sequentially
+                        familyGroup.forEach((node) => {
+                            if (!positioned.has(node.data.id)) {
+                                // Check if this person has a partner in the same family group
+                                if (partnerPairs.has(node.data.id)) {
+                                    const partners = Array.from(partnerPairs.get(node.data.id));
+                                    const partnerInGroup = familyGroup.find(n =>
+                                        partners.includes(n.data.id) && !positioned.has(n.data.id)
+                                    );
+
+                                    if (partnerInGroup) {
+                                        // Position partners together
+                                        node.x = currentX;
+                                        partnerInGroup.x = currentX + partnerSpacing;
+                                        currentX += partnerSpacing + siblingSpacing;
+                                        positioned.add(partnerInGroup.data.id);
+                                    } else {
+                                        node.x = currentX;
+                                        currentX += siblingSpacing;
+                                    }
+                                } else {
+                                    node.x = currentX;
+                                    currentX += siblingSpacing;
+                                }
+
+                                node.y = 80 + (gen * generationGap);
+                                positioned.add(node.data.id);
+                            }
+                        });
+                    }
 
-                // Add spacing before next family group
-                currentX += nodeSpacing;
+                    // Add spacing before next family group
+                    currentX += nodeSpacing;
+                });
             });
-        });
 
-        // Adjust positions to center the entire tree
-        if (allNodes.length > 0) {
-            const minX = Math.min(...allNodes.map(n => n.x));
-            const maxX = Math.max(...allNodes.map(n => n.x));
-            const treeWidth = maxX - minX;
-            const offset = (width - treeWidth) / 2 - minX;
+            // Adjust positions to center the entire tree
+            if (allNodes.length > 0) {
+                const minX = Math.min(...allNodes.map(n => n.x));
+                const maxX = Math.max(...allNodes.map(n => n.x));
+                const treeWidth = maxX - minX;
+                const offset = (width - treeWidth) / 2 - minX;
 
+                allNodes.forEach(node => {
+                    node.x += offset;
+                });
+            }
+        } else {
+            // Apply saved positions, but still align to generation Y coordinates
             allNodes.forEach(node => {
-                node.x += offset;
+                const savedPos = currentNodePositions[node.data.id];
+                if (savedPos) {
+                    node.x = savedPos.x;
+                    node.y = savedPos.y;
+                } else {
+                    // For unsaved positions, align to generation level
+                    const generation = generationLevels.get(node.data.id) || 0;
+                    node.y = 80 + (generation * generationGap);
+                }
             });
         }
-    } else {
-        // Apply saved positions, but still align to generation Y coordinates
-        allNodes.forEach(node => {
-            const savedPos = currentNodePositions[node.data.id];
-            if (savedPos) {
-                node.x = savedPos.x;
-                node.y = savedPos.y;
-            } else {
-                // For unsaved positions, align to generation level
-                const generation = generationLevels.get(node.data.id) || 0;
-                node.y = 80 + (generation * generationGap);
-            }
-        });
+
+        linkData = root.links().filter(d => !d.source.data.isVirtual);
     }
 
     // Create a container group for zoom/pan
@@ -444,10 +612,9 @@ function renderFamilyTree() {
     svg.call(zoom.transform, initialTransform);
 
     const g = container.append('g');
+    const nodesById = new Map(allNodes.map(n => [n.data.id, n]));
 
     // Draw links - custom link generator to handle parent pairs
-    const linkData = root.links().filter(d => !d.source.data.isVirtual);
-
     // Function to generate link path
     function generateLinkPath(d) {
         const child = d.target;
@@ -455,8 +622,8 @@ function renderFamilyTree() {
 
         // Check if child has both parents
         if (childData.father_id && childData.mother_id) {
-            const fatherNode = allNodes.find(n => n.data.id === childData.father_id);
-            const motherNode = allNodes.find(n => n.data.id === childData.mother_id);
+            const fatherNode = nodesById.get(childData.father_id);
+            const motherNode = nodesById.get(childData.mother_id);
 
             if (fatherNode && motherNode) {
                 // Calculate midpoint between parents
@@ -495,7 +662,7 @@ function renderFamilyTree() {
                 const pairKey = [node.data.id, partnerId].sort().join('-');
                 if (!drawnPartners.has(pairKey)) {
                     drawnPartners.add(pairKey);
-                    const partnerNode = allNodes.find(n => n.data.id === partnerId);
+                    const partnerNode = nodesById.get(partnerId);
                     if (partnerNode) {
                         const link = g.append('line')
                             .attr('class', 'partner-link')
@@ -638,6 +805,59 @@ function renderFamilyTree() {
     attachNodeHoverListeners();
 }
 
+/**
+ * Nodes positioned by the server-side layout (layout=true), shaped like the
+ * d3 hierarchy nodes renderFamilyTree draws
+ */
+function buildServerLayoutNodes(width) {
+    const allNodes = familyMembers.map(member => ({
+        data: member,
+        x: member.position.x,
+        y: member.position.y,
+        generation: member.position.generation,
+    }));
+
+    const hasAnySavedPositions = allNodes.some(node => currentNodePositions[node.data.id]);
+    if (hasAnySavedPositions) {
+        allNodes.forEach(node => {
+            const savedPos = currentNodePositions[node.data.id];
+            if (savedPos) {
+                node.x = savedPos.x;
+                node.y = savedPos.y;
+            }
+        });
+    } else {
+        // Center the tree horizontally
+        let minX = Infinity;
+        let maxX = -Infinity;
+        allNodes.forEach(node => {
+            minX = Math.min(minX, node.x);
+            maxX = Math.max(maxX, node.x);
+        });
+        const offset = (width - (maxX - minX)) / 2 - minX;
+        allNodes.forEach(node => {
+            node.x += offset;
+        });
+    }
+
+    return allNodes;
+}
+
+/**
+ * Parent-to-child links for server-positioned nodes
+ */
+function buildServerLayoutLinks(allNodes) {
+    const nodesById = new Map(allNodes.map(node => [node.data.id, node]));
+    const links = [];
+    allNodes.forEach(node => {
+        const parent = nodesById.get(node.data.father_id) || nodesById.get(node.data.mother_id);
+        if (parent) {
+            links.push({ source: parent, target: node });
+        }
+    });
+    return links;
+}
+
 function buildTreeHierarchy(member, processedMembers = new Set(), globalProcessedChildren = new Set()) {
     // Avoid infinite loops
     if (processedMembers.has(member.id)) {
@@ -725,13 +945,18 @@ async function showMemberDetails(memberId) {
         (m.father_id || m.mother_id) // At least one parent in common
     );
 
+    // The details panel shows a larger picture than the tree avatar
+    const detailPhotoUrl = member.photo
+        ? (await fetchPhotoObjectUrl(`/api/family/members/${member.photo.id}/photo?v=${member.photo.hash}&size=160`)) || member.photo_url
+        : member.photo_url;
+
     console.log('Member details:', member);
-    console.log('Photo URL:', member.photo_url);
+    console.log('Photo URL:', detailPhotoUrl);
 
     detailsDiv.innerHTML = `
-        ${member.photo_url ? `
+        ${detailPhotoUrl ? `
         <div class="detail-item" style="text-align: center;">
-            <img src="${member.photo_url}" style="width: 150px; height: 150px; border-radius: 50%; object-fit: cover; border: 3px solid ${member.gender === 'Male' ? '#3498db' : member.gender === 'Female' ? '#e91e63' : '#764ba2'};" alt="Profile Picture">
+            <img src="${detailPhotoUrl}" style="width: 150px; height: 150px; border-radius: 50%; object-fit: cover; border: 3px solid ${member.gender === 'Male' ? '#3498db' : member.gender === 'Female' ? '#e91e63' : '#764ba2'};" alt="Profile Picture">
         </div>` : ''}
         <div class="detail-item">
             <label>Name</label>
@@ -941,10 +1166,9 @@ async function handleMemberSubmit(event) {
 
         const method = currentMemberId ? 'PUT' : 'POST';
 
-        const response = await fetch(url, {
+        const response = await authFetch(url, {
             method,
             headers: {
-                'Authorization': `Bearer ${authToken}`,
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify(memberData),
@@ -963,11 +1187,8 @@ async function handleMemberSubmit(event) {
             const formData = new FormData();
             formData.append('file', fileInput.files[0]);
 
-            const uploadResponse = await fetch(`${API_BASE}/api/family/members/${savedMember.id}/upload-photo`, {
+            const uploadResponse = await authFetch(`${API_BASE}/api/family/members/${savedMember.id}/upload-photo`, {
                 method: 'POST',
-                headers: {
-                    'Authorization': `Bearer ${authToken}`,
-                },
                 body: formData,
             });
 
@@ -991,11 +1212,8 @@ async function deleteMember(memberId) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/family/members/${memberId}`, {
+        const response = await authFetch(`${API_BASE}/api/family/members/${memberId}`, {
             method: 'DELETE',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -1057,11 +1275,8 @@ async function updateEmail(event) {
     errorDiv.textContent = '';
 
     try {
-        const response = await fetch(`${API_BASE}/api/auth/update-email?new_email=${encodeURIComponent(newEmail)}`, {
+        const response = await authFetch(`${API_BASE}/api/auth/update-email?new_email=${encodeURIComponent(newEmail)}`, {
             method: 'PUT',
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
         });
 
         if (!response.ok) {
@@ -1090,11 +1305,8 @@ async function updatePassword(event) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/auth/update-password?current_password=${encodeURIComponent(currentPassword)}&new_password=${encodeURIComponent(newPassword)}`, {
+        const response = await authFetch(`${API_BASE}/api/auth/update-password?current_password=${encodeURIComponent(currentPassword)}&new_password=${encodeURIComponent(newPassword)}`, {
             method: 'PUT',
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
         });
 
         if (!response.ok) {
@@ -1102,6 +1314,9 @@ async function updatePassword(event) {
             throw new Error(error.detail || 'Failed to update password');
         }
 
+        // Changing the password revokes earlier tokens; continue with the new ones
+        storeSession(await response.json());
+
         alert('Password updated successfully!');
         document.getElementById('current-password').value = '';
         document.getElementById('new-password').value = '';
@@ -1122,11 +1337,8 @@ async function deleteAccount(event) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/auth/delete-account?password=${encodeURIComponent(password)}`, {
+        const response = await authFetch(`${API_BASE}/api/auth/delete-account?password=${encodeURIComponent(password)}`, {
             method: 'DELETE',
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
         });
 
         if (!response.ok) {
@@ -1194,11 +1406,7 @@ let currentNodePositions = {};
 
 async function loadTreeViews() {
     try {
-        const response = await fetch(`${API_BASE}/api/tree-views/`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
+        const response = await authFetch(`${API_BASE}/api/tree-views/`);
 
         if (response.ok) {
             treeViews = await response.json();
@@ -1234,11 +1442,7 @@ async function switchTreeView(viewId) {
         currentNodePositions = {};
     } else {
         try {
-            const response = await fetch(`${API_BASE}/api/tree-views/${viewId}`, {
-                headers: {
-                    'Authorization': `Bearer ${authToken}`
-                }
-            });
+            const response = await authFetch(`${API_BASE}/api/tree-views/${viewId}`);
 
             if (response.ok) {
                 currentTreeView = await response.json();
@@ -1375,11 +1579,10 @@ async function createView() {
         // Generate thumbnail
         const thumbnail = await generateThumbnail();
 
-        const response = await fetch(`${API_BASE}/api/tree-views/`, {
+        const response = await authFetch(`${API_BASE}/api/tree-views/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}`
             },
             body: JSON.stringify({
                 name,
@@ -1414,11 +1617,10 @@ async function saveCurrentView() {
         // Generate thumbnail
         const thumbnail = await generateThumbnail();
 
-        const response = await fetch(`${API_BASE}/api/tree-views/${currentTreeView.id}`, {
+        const response = await authFetch(`${API_BASE}/api/tree-views/${currentTreeView.id}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}`
             },
             body: JSON.stringify({
                 node_positions: currentNodePositions,
@@ -1472,11 +1674,10 @@ function loadViewsList() {
 
 async function setDefaultView(viewId) {
     try {
-        const response = await fetch(`${API_BASE}/api/tree-views/${viewId}`, {
+        const response = await authFetch(`${API_BASE}/api/tree-views/${viewId}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}`
             },
             body: JSON.stringify({
                 is_default: true
@@ -1501,11 +1702,8 @@ async function deleteView(viewId) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/tree-views/${viewId}`, {
+        const response = await authFetch(`${API_BASE}/api/tree-views/${viewId}`, {
             method: 'DELETE',
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
         });
 
         if (!response.ok) {
@@ -2409,11 +2607,7 @@ document.addEventListener('DOMContentLoaded', function() {
  */
 async function loadFamilyTrees() {
     try {
-        const response = await fetch(`${API_BASE}/api/trees/`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
-        });
+        const response = await authFetch(`${API_BASE}/api/trees/`);
 
         if (!response.ok) {
             throw new Error('Failed to load family trees');
@@ -2517,10 +2711,9 @@ async function createTree() {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/`, {
+        const response = await authFetch(`${API_BASE}/api/trees/`, {
             method: 'POST',
             headers: {
-                'Authorization': `Bearer ${authToken}`,
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
@@ -2648,11 +2841,8 @@ async function saveCurrentTreeAs() {
     if (!newName || !newName.trim()) return;
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/${currentTreeId}/copy?new_name=${encodeURIComponent(newName.trim())}`, {
+        const response = await authFetch(`${API_BASE}/api/trees/${currentTreeId}/copy?new_name=${encodeURIComponent(newName.trim())}`, {
             method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -2687,11 +2877,8 @@ async function copyTree(treeId) {
     if (!newName || !newName.trim()) return;
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/${treeId}/copy?new_name=${encodeURIComponent(newName.trim())}`, {
+        const response = await authFetch(`${API_BASE}/api/trees/${treeId}/copy?new_name=${encodeURIComponent(newName.trim())}`, {
             method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -2719,11 +2906,8 @@ async function deleteTree(treeId) {
     if (!confirm(confirmMessage)) return;
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/${treeId}`, {
+        const response = await authFetch(`${API_BASE}/api/trees/${treeId}`, {
             method: 'DELETE',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -2784,10 +2968,9 @@ async function shareTree(event) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/${treeId}/share`, {
+        const response = await authFetch(`${API_BASE}/api/trees/${treeId}/share`, {
             method: 'POST',
             headers: {
-                'Authorization': `Bearer ${authToken}`,
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
@@ -2814,11 +2997,7 @@ async function shareTree(event) {
  */
 async function loadPendingSharesCount() {
     try {
-        const response = await fetch(`${API_BASE}/api/trees/shares/pending`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
-        });
+        const response = await authFetch(`${API_BASE}/api/trees/shares/pending`);
 
         if (!response.ok) return;
 
@@ -2861,11 +3040,7 @@ async function loadPendingSharesList() {
     container.innerHTML = '<p>Loading pending shares...</p>';
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/shares/pending`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
-        });
+        const response = await authFetch(`${API_BASE}/api/trees/shares/pending`);
 
         if (!response.ok) {
             throw new Error('Failed to load pending shares');
@@ -2916,11 +3091,8 @@ async function loadPendingSharesList() {
  */
 async function acceptShare(shareId) {
     try {
-        const response = await fetch(`${API_BASE}/api/trees/shares/${shareId}/accept`, {
+        const response = await authFetch(`${API_BASE}/api/trees/shares/${shareId}/accept`, {
             method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -2944,11 +3116,8 @@ async function declineShare(shareId) {
     if (!confirm('Are you sure you want to decline this invitation?')) return;
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/shares/${shareId}`, {
+        const response = await authFetch(`${API_BASE}/api/trees/shares/${shareId}`, {
             method: 'DELETE',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-            },
         });
 
         if (!response.ok) {
@@ -3016,10 +3185,9 @@ async function renameTree(event) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/api/trees/${treeId}`, {
+        const response = await authFetch(`${API_BASE}/api/trees/${treeId}`, {
             method: 'PUT',
             headers: {
-                'Authorization': `Bearer ${authToken}`,
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
@@ -0,0 +1,52 @@
+"""
+Focused tree windows, tested against a running server.
+
+Set TEST_BASE_URL (e.g. http://127.0.0.1:8000) to run them; rate limiting
+should be off, as each test registers its own user.
+"""
+
+import os
+import uuid
+
+import pytest
+import requests
+
+BASE_URL = os.getenv("TEST_BASE_URL", "").rstrip("/")
+
+pytestmark = pytest.mark.skipif(not BASE_URL, reason="TEST_BASE_URL is not set")
+
+
+@pytest.fixture
+def headers():
+    username = f"test_{uuid.uuid4().hex[:8]}"
+    password = f"Test-{uuid.uuid4().hex}"
+    response = requests.post(f"{BASE_URL}/api/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": password
+    })
+    assert response.status_code == 201
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def add_member(headers, **fields) -> int:
+    response = requests.post(f"{BASE_URL}/api/family/members", json={"last_name": "Test", **fields}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_focus_member_without_ancestors_lists_its_children(headers):
+    parent = add_member(headers, first_name="Parent")
+    child = add_member(headers, first_name="Child", father_id=parent)
+    grandchild = add_member(headers, first_name="Grandchild", father_id=child)
+
+    response = requests.get(f"{BASE_URL}/api/family/tree",
+                            params={"focus": parent, "up": 0, "down": 1, "lean": "true"}, headers=headers)
+    assert response.status_code == 200
+    nodes = {node["id"]: node for node in response.json()}
+
+    assert set(nodes) == {parent, child}
+    assert nodes[parent]["children"] == [child]
+    assert nodes[parent]["hidden_children"] == 0
+    assert nodes[child]["children"] == [grandchild]
+    assert nodes[child]["hidden_children"] == 1